@@ -0,0 +1,409 @@
+"""Offline benchmarks of the per-frame hot paths.
+
+Runs without a webcam, display or keyboard access: landmarks are synthetic
+(or loaded from a landmark recording or a .npy file of shape (frames, 33, 4)),
+key events go to the RecordingBackend, and the frame-to-key run replaces the
+camera and the MediaPipe model with a fake camera replaying those landmarks.
+With --footage, a video file or image directory is also run through the
+whole pipeline including MediaPipe, as fast as detection keeps up.
+
+Usage:
+    python benchmarks/bench_hot_paths.py [--sizes 10,100,1000] [--output results.json]
+
+Results are printed as JSON; times are in microseconds unless a key says ms.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QCoreApplication, QThread, QTimer
+
+from modules.camera import CameraThread
+from modules.frame_mailbox import CapturedFrame, FrameMailbox
+from modules.frame_sources import ImageDirectorySource, VideoFileSource
+from modules.keyboard_mapper import KeyboardMapper
+from modules.landmark_recording import LandmarkRecording, EXTENSION as RECORDING_EXTENSION
+from modules.landmarks import LandmarkFrame, NUM_LANDMARKS, LANDMARK_FIELDS, VISIBILITY
+from modules.latency_trace import tracer, DELIVERY, SIGNATURE, MATCHING
+from modules.output_backends import RecordingBackend
+from modules.pose_detector import PoseDetector
+from modules.pose_worker import PoseInferenceThread
+from modules.pose_signature import SLOT_LANDMARKS, LEFT_SHOULDER, RIGHT_SHOULDER
+from modules.settings import DEFAULT_SETTINGS
+
+# (x, y) of a person standing upright in the middle of the image, per MediaPipe landmark
+_STANDING = np.array([
+    (0.50, 0.20), (0.51, 0.19), (0.52, 0.19), (0.53, 0.19), (0.49, 0.19), (0.48, 0.19),
+    (0.47, 0.19), (0.54, 0.20), (0.46, 0.20), (0.51, 0.22), (0.49, 0.22),
+    (0.58, 0.35), (0.42, 0.35), (0.62, 0.47), (0.38, 0.47), (0.64, 0.58), (0.36, 0.58),
+    (0.65, 0.61), (0.35, 0.61), (0.65, 0.61), (0.35, 0.61), (0.64, 0.60), (0.36, 0.60),
+    (0.55, 0.62), (0.45, 0.62), (0.55, 0.78), (0.45, 0.78), (0.55, 0.93), (0.45, 0.93),
+    (0.56, 0.95), (0.44, 0.95), (0.56, 0.96), (0.44, 0.96)
+], dtype=np.float32)
+
+# Shoulder, elbow, wrist and hand landmarks of each arm
+_ARMS = ((11, 13, 15, (17, 19, 21)), (12, 14, 16, (18, 20, 22)))
+_ARM_SEGMENT = 0.12
+
+
+def random_pose(rng):
+    """(33, 4) landmark array of the standing pose with randomly raised arms"""
+    data = np.zeros((NUM_LANDMARKS, LANDMARK_FIELDS), dtype=np.float32)
+    data[:, :2] = _STANDING
+    data[:, VISIBILITY] = 0.99
+    for shoulder, elbow, wrist, hand in _ARMS:
+        upper, lower = rng.uniform(0, 2 * np.pi, 2)
+        data[elbow, :2] = data[shoulder, :2] + _ARM_SEGMENT * np.array((np.cos(upper), np.sin(upper)))
+        data[wrist, :2] = data[elbow, :2] + _ARM_SEGMENT * np.array((np.cos(lower), np.sin(lower)))
+        data[list(hand), :2] = data[wrist, :2] + rng.normal(0, 0.01, (3, 2))
+    return data
+
+
+def recorded_frames(poses, count, rng, hold=10):
+    """Landmark frames of someone holding each pose for hold frames, with tracking jitter"""
+    frames = np.empty((count, NUM_LANDMARKS, LANDMARK_FIELDS), dtype=np.float32)
+    for i in range(count):
+        frames[i] = poses[(i // hold) % len(poses)]
+    frames[:, :, :2] += rng.normal(0, 0.003, (count, NUM_LANDMARKS, 2)).astype(np.float32)
+    return frames
+
+
+def summarize(samples_ns):
+    """Percentiles of per-call times (ns) in microseconds"""
+    samples = np.asarray(samples_ns, dtype=np.float64) / 1000.0
+    p50, p95, p99 = np.percentile(samples, (50, 95, 99))
+    return {
+        "n": len(samples),
+        "mean_us": round(float(samples.mean()), 3),
+        "p50_us": round(float(p50), 3),
+        "p95_us": round(float(p95), 3),
+        "p99_us": round(float(p99), 3),
+        "max_us": round(float(samples.max()), 3)
+    }
+
+
+def build_library(size, detector, rng):
+    """pose_map of size poses with distinct random arm positions, each tapping a key"""
+    keys = "abcdefghijklmnopqrstuvwxyz0123456789"
+    pose_map = {}
+    for i in range(size):
+        signature = None
+        while signature is None:
+            signature = detector.get_current_pose_signature(LandmarkFrame(random_pose(rng)))
+        pose_map[str(i)] = {
+            "name": f"pose {i}",
+            "signature": signature,
+            "key_combo": keys[i % len(keys)],
+            "threshold": 0.9,
+            "recognition_speed": 0,
+            "immediate_release": True,
+            "sustained_duration": 0,
+            "exit_threshold": None,
+            "dwell_frames": 1,
+            "dwell_ms": 0,
+            "macro": "",
+            "macro_gap_ms": 16,
+            "image_path": None
+        }
+    return pose_map
+
+
+def create_mapper(poses_dir, pose_map=None):
+    matching = DEFAULT_SETTINGS["matching"]
+    mapper = KeyboardMapper(poses_dir, RecordingBackend(), matching["index_min_poses"], matching["index_candidates"])
+    if pose_map is not None:
+        mapper.pose_map = pose_map
+        mapper.save_poses()
+        mapper.load_poses()
+    return mapper
+
+
+def bench_signature(detector, frames):
+    landmark_frames = [LandmarkFrame(data) for data in frames]
+    samples = []
+    for landmarks in landmark_frames:
+        start = time.perf_counter_ns()
+        detector.get_current_pose_signature(landmarks)
+        samples.append(time.perf_counter_ns() - start)
+    return summarize(samples)
+
+
+def bench_library(size, detector, frames, rng, repeat):
+    """compare_poses, check_pose and save/load against a library of size poses"""
+    pose_map = build_library(size, detector, rng)
+    signatures = [detector.get_current_pose_signature(LandmarkFrame(data)) for data in frames]
+    # Someone striking some of the saved poses in turn, so check_pose does press keys
+    targets = [_pose_from(pose_map[str(i)]["signature"]) for i in range(min(size, 8))]
+    hits = [detector.get_current_pose_signature(LandmarkFrame(data))
+            for data in recorded_frames(targets, len(frames), rng)]
+    result = {"poses": size}
+
+    # compare_poses is called once per saved pose, so one frame costs size calls
+    saved = [pose_data["signature"] for pose_data in pose_map.values()]
+    samples = []
+    for signature in signatures[:max(1, len(signatures) * 10 // size)]:
+        start = time.perf_counter_ns()
+        for other in saved:
+            detector.compare_poses(signature, other)
+        samples.append(time.perf_counter_ns() - start)
+    result["compare_poses_per_frame"] = summarize(samples)
+    result["compare_poses_per_call_mean_us"] = round(result["compare_poses_per_frame"]["mean_us"] / size, 4)
+
+    with tempfile.TemporaryDirectory() as poses_dir:
+        mapper = create_mapper(poses_dir, pose_map)
+        try:
+            samples = []
+            now = time.perf_counter()
+            for signature in hits:
+                now += 1 / 30
+                start = time.perf_counter_ns()
+                mapper.check_pose(detector, signature, now)
+                samples.append(time.perf_counter_ns() - start)
+            result["check_pose"] = summarize(samples)
+            mapper.release_all_keys()
+
+            save_samples, load_samples = [], []
+            for _ in range(repeat):
+                start = time.perf_counter_ns()
+                mapper.save_poses()
+                save_samples.append(time.perf_counter_ns() - start)
+                start = time.perf_counter_ns()
+                mapper.load_poses()
+                load_samples.append(time.perf_counter_ns() - start)
+            result["save_poses"] = summarize(save_samples)
+            result["load_poses"] = summarize(load_samples)
+            result["poses_json_bytes"] = os.path.getsize(os.path.join(poses_dir, "poses.json"))
+        finally:
+            mapper.shutdown()
+    result["check_pose_keys_pressed"] = sum(1 for _, action, _ in mapper.backend.take_events() if action == "press")
+    return result
+
+
+def _pose_from(signature):
+    """Landmark array that reproduces a signature's arm slots on the standing pose
+
+    Signatures are relative to the shoulder center and width, so the points
+    are mapped back with the standing pose's shoulders.
+    """
+    data = np.zeros((NUM_LANDMARKS, LANDMARK_FIELDS), dtype=np.float32)
+    data[:, :2] = _STANDING
+    data[:, VISIBILITY] = 0.99
+    center = (_STANDING[LEFT_SHOULDER] + _STANDING[RIGHT_SHOULDER]) / 2
+    width = float(np.hypot(*(_STANDING[LEFT_SHOULDER] - _STANDING[RIGHT_SHOULDER])))
+    data[SLOT_LANDMARKS, :2] = signature.points * width + center
+    return data
+
+
+class FakeCamera(QThread):
+    """Posts blank frames into a FrameMailbox at a fixed rate, like CameraThread
+
+    With fps 0 it goes as fast as inference keeps up: like CameraThread with
+    an unpaced source, it waits for each frame to be taken instead of
+    replacing it.
+    """
+
+    def __init__(self, mailbox, count, fps, shape=(480, 640, 3)):
+        super().__init__()
+        self.mailbox = mailbox
+        self.count = count
+        self.interval = 1.0 / fps if fps else 0.0
+        self.image = np.zeros(shape, dtype=np.uint8)
+        self.frames_captured = 0
+
+    def run(self):
+        next_frame = time.perf_counter()
+        for seq in range(1, self.count + 1):
+            if self.interval:
+                next_frame += self.interval
+                time.sleep(max(0.0, next_frame - time.perf_counter()))
+            self.frames_captured = seq
+            self.mailbox.put(CapturedFrame(self.image, seq, time.perf_counter()))
+            if not self.interval:
+                self.mailbox.wait_taken()
+
+
+class ReplayInference(QThread):
+    """Stands in for PoseInferenceThread: publishes recorded landmarks instead of running the model"""
+
+    def __init__(self, pose_detector, mailbox, frames):
+        super().__init__()
+        self.pose_detector = pose_detector
+        self.mailbox = mailbox
+        self.frames = frames
+        self.running = False
+
+    def run(self):
+        self.running = True
+        while self.running:
+            captured = self.mailbox.get(timeout=0.1)
+            if captured is None:
+                continue
+            landmarks = self.frames[(captured.seq - 1) % len(self.frames)]
+            self.pose_detector.process_landmark_array(captured.image, landmarks, captured.seq, captured.timestamp)
+
+    def stop(self):
+        self.running = False
+        self.mailbox.close()
+        self.wait()
+
+
+def run_pipeline(app, camera, inference, detector, mapper):
+    """Run camera and inference threads until the camera ends, matching on this (GUI) thread
+
+    Returns the elapsed time and the traced stage latencies (ms).
+    """
+    tracer.configure(True)
+    tracer.clear()
+
+    # Same work as MainWindow.on_pose_detected/check_current_pose
+    def on_pose_detected(landmarks):
+        start = time.perf_counter()
+        tracer.record(landmarks.seq, DELIVERY, (start - landmarks.timestamp) * 1000.0)
+        signature = detector.get_current_pose_signature(landmarks)
+        tracer.record(landmarks.seq, SIGNATURE, (time.perf_counter() - start) * 1000.0)
+        start = time.perf_counter()
+        mapper.check_pose(detector, signature, start, landmarks)
+        tracer.record(landmarks.seq, MATCHING, (time.perf_counter() - start) * 1000.0)
+
+    detector.pose_detected.connect(on_pose_detected)
+
+    finished = []
+
+    def check_done():
+        if camera.isFinished():
+            finished.append(time.perf_counter())
+            # Let the last frame through inference and matching
+            QTimer.singleShot(200, app.quit)
+        else:
+            QTimer.singleShot(10, check_done)
+
+    started = time.perf_counter()
+    inference.start()
+    camera.start()
+    QTimer.singleShot(10, check_done)
+    app.exec_()
+    elapsed = finished[0] - started
+
+    inference.stop()
+    detector.pose_detected.disconnect(on_pose_detected)
+    stats = {stage: {key: round(value, 4) if isinstance(value, float) else value for key, value in values.items()}
+             for stage, values in tracer.stats().items()}
+    tracer.configure(False)
+    return {
+        "frames_captured": camera.frames_captured,
+        "frames_dropped": camera.mailbox.frames_dropped,
+        "elapsed_s": round(elapsed, 3),
+        "stages_ms": stats
+    }
+
+
+def keys_pressed(mapper):
+    return sum(1 for _, action, _ in mapper.backend.take_events() if action == "press")
+
+
+def bench_frame_to_key(app, detector, size, frames, rng, fps):
+    """Camera frame to injected key through the app's threads, traced per stage (ms)"""
+    pose_map = build_library(size, detector, rng)
+    targets = [_pose_from(pose_map[str(i)]["signature"]) for i in range(min(size, 8))]
+    # Alternate saved poses with random ones so poses are entered (and keys tapped) repeatedly
+    performance = recorded_frames([pose for target in targets for pose in (target, random_pose(rng))],
+                                  len(frames), rng)
+
+    with tempfile.TemporaryDirectory() as poses_dir:
+        mapper = create_mapper(poses_dir, pose_map)
+        mailbox = FrameMailbox()
+        camera = FakeCamera(mailbox, len(frames), fps)
+        inference = ReplayInference(detector, mailbox, performance)
+        result = {"poses": size, "fps": fps}
+        result.update(run_pipeline(app, camera, inference, detector, mapper))
+        mapper.shutdown()
+    result["keys_pressed"] = keys_pressed(mapper)
+    return result
+
+
+def bench_footage(app, path, size, rng):
+    """The full pipeline, MediaPipe included, on a video file or image directory at full speed"""
+    if os.path.isdir(path):
+        source = ImageDirectorySource(path, realtime=False)
+    else:
+        source = VideoFileSource(path, realtime=False)
+    detector = PoseDetector()
+    detector.draw_landmarks = False
+    pose_map = build_library(size, detector, rng)
+
+    with tempfile.TemporaryDirectory() as poses_dir:
+        mapper = create_mapper(poses_dir, pose_map)
+        camera = CameraThread(source)
+        inference = PoseInferenceThread(detector, camera.mailbox)
+        result = {"source": path, "poses": size}
+        result.update(run_pipeline(app, camera, inference, detector, mapper))
+        mapper.shutdown()
+    detector.close()
+    result["processed_fps"] = round(result["frames_captured"] / result["elapsed_s"], 2) if result["elapsed_s"] else 0.0
+    result["keys_pressed"] = keys_pressed(mapper)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,1000", help="Library sizes, comma-separated")
+    parser.add_argument("--frames", type=int, default=600, help="Landmark frames per workload")
+    parser.add_argument("--landmarks", help="Landmark recording (.lmrec) or .npy file of shape (frames, 33, 4)")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions of save/load")
+    parser.add_argument("--fps", type=float, default=60.0, help="Fake camera rate (0 = as fast as possible)")
+    parser.add_argument("--path-poses", type=int, default=100, help="Library size of the frame-to-key run")
+    parser.add_argument("--footage", help="Video file or image directory to also run through MediaPipe")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    app = QCoreApplication(sys.argv)
+    rng = np.random.default_rng(args.seed)
+    detector = PoseDetector(load_model=False)
+    detector.draw_landmarks = False
+
+    if args.landmarks and args.landmarks.endswith(RECORDING_EXTENSION):
+        frames = np.array(LandmarkRecording(args.landmarks).landmarks)
+    elif args.landmarks:
+        frames = np.load(args.landmarks).astype(np.float32, copy=False)
+    else:
+        frames = recorded_frames([random_pose(rng) for _ in range(20)], args.frames, rng)
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "frames": len(frames),
+            "landmarks": args.landmarks or "synthetic",
+            "seed": args.seed
+        },
+        "signature": bench_signature(detector, frames),
+        "library": [bench_library(int(size), detector, frames, rng, args.repeat)
+                    for size in args.sizes.split(",")],
+        "frame_to_key": bench_frame_to_key(app, detector, args.path_poses, frames, rng, args.fps)
+    }
+    if args.footage:
+        results["footage"] = bench_footage(app, args.footage, args.path_poses, rng)
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,8 @@ import tensorflow as tf
 from PyQt5.QtWidgets import QApplication, QLabel, QVBoxLayout, QWidget
 from PyQt5.QtGui import QFont, QPixmap
 from PyQt5.QtCore import Qt, QTimer
+from modules.log import configure_logging
+from modules.settings import load_settings
 from ui.main_window import MainWindow
 
 # Suppress TensorFlow warnings and logging
@@ -60,6 +62,8 @@ class SplashScreen(QWidget):
         self.move(frame_gm.topLeft())
 
 def main():
+    configure_logging(load_settings()["logging"])
+    
     # Create poses directory if it doesn't exist
     if not os.path.exists("poses"):
         os.makedirs("poses")
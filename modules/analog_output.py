@@ -0,0 +1,165 @@
+import threading
+
+import numpy as np
+
+from modules.landmarks import X, Y, VISIBILITY
+from modules.pose_signature import LEFT_SHOULDER, RIGHT_SHOULDER, VISIBILITY_THRESHOLD
+
+LEFT_WRIST = 15
+RIGHT_WRIST = 16
+LEFT_HIP = 23
+RIGHT_HIP = 24
+
+# Output targets of an axis
+MOUSE_X = "mouse_x"
+MOUSE_Y = "mouse_y"
+SCROLL_X = "scroll_x"
+SCROLL_Y = "scroll_y"
+TARGETS = (MOUSE_X, MOUSE_Y, SCROLL_X, SCROLL_Y)
+
+# Frames further apart than this (e.g. after the pose was lost) don't move anything
+MAX_FRAME_GAP = 0.1
+
+
+def _landmark_offset(landmark, field):
+    """Source: a landmark's offset from the shoulder center, in shoulder widths"""
+    def source(data, center, width):
+        if data[landmark, VISIBILITY] < VISIBILITY_THRESHOLD:
+            return None
+        return (data[landmark, field] - center[field]) / width
+    return source
+
+
+def _torso_lean(data, center, width):
+    """Source: horizontal offset of the shoulder center from the hip center, in shoulder widths"""
+    if min(data[LEFT_HIP, VISIBILITY], data[RIGHT_HIP, VISIBILITY]) < VISIBILITY_THRESHOLD:
+        return None
+    hip_x = (data[LEFT_HIP, X] + data[RIGHT_HIP, X]) * 0.5
+    return (center[X] - hip_x) / width
+
+
+# Landmark-derived quantities an axis can follow
+SOURCES = {
+    'left_wrist_x': _landmark_offset(LEFT_WRIST, X),
+    'left_wrist_y': _landmark_offset(LEFT_WRIST, Y),
+    'right_wrist_x': _landmark_offset(RIGHT_WRIST, X),
+    'right_wrist_y': _landmark_offset(RIGHT_WRIST, Y),
+    'torso_lean': _torso_lean,
+}
+
+
+class AnalogAxis:
+    """One landmark quantity mapped to a relative motion target.
+
+    The source value minus center goes through a deadzone (values inside it
+    give no motion, the rest is rescaled to start at 0) and a power curve,
+    and is then multiplied by gain to give a speed in pixels (or scroll
+    steps) per second.
+    """
+
+    __slots__ = ('source_name', 'source', 'target', 'center', 'deadzone', 'gain', 'curve')
+
+    def __init__(self, source, target, center=0.0, deadzone=0.1, gain=1000.0, curve=1.5):
+        if source not in SOURCES:
+            raise ValueError(f"Unknown analog source '{source}' (choose from {', '.join(SOURCES)})")
+        if target not in TARGETS:
+            raise ValueError(f"Unknown analog target '{target}' (choose from {', '.join(TARGETS)})")
+        self.source_name = source
+        self.source = SOURCES[source]
+        self.target = TARGETS.index(target)
+        self.center = float(center)
+        self.deadzone = float(deadzone)
+        self.gain = float(gain)
+        self.curve = float(curve)
+
+    @classmethod
+    def from_settings(cls, axis_settings):
+        return cls(**axis_settings)
+
+    def speed(self, value):
+        """Output speed (units per second) for a source value"""
+        offset = value - self.center
+        magnitude = abs(offset) - self.deadzone
+        if magnitude <= 0.0:
+            return 0.0
+        return np.copysign(self.gain * magnitude ** self.curve, offset)
+
+
+class AnalogMapper:
+    """Turns every landmark frame into relative mouse / scroll motion.
+
+    update() is registered as a PoseDetector landmark listener, so it runs on
+    the inference thread right after a frame is published, without a trip
+    through the GUI event loop. Motion is integrated over the time between
+    frames (so speed does not depend on the camera rate), fractional pixels
+    are carried over to the next frame, and the result is queued on the
+    KeyDispatcher, which hands it to the output backend. set_enabled() and
+    reset() come from the GUI thread, so the state update() integrates is
+    guarded by a lock.
+    """
+
+    def __init__(self, dispatcher, axes):
+        self.dispatcher = dispatcher
+        self.axes = list(axes)
+        self._lock = threading.Lock()
+        self.enabled = False
+        self._last_timestamp = None
+        self._remainder = np.zeros(len(TARGETS), dtype=np.float64)
+        self._motion = np.zeros(len(TARGETS), dtype=np.float64)
+
+    @classmethod
+    def from_settings(cls, dispatcher, analog_settings):
+        return cls(dispatcher, [AnalogAxis.from_settings(axis) for axis in analog_settings["axes"]])
+
+    def set_enabled(self, enabled):
+        with self._lock:
+            self.enabled = enabled
+            self._reset()
+
+    def reset(self):
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self._last_timestamp = None
+        self._remainder[:] = 0.0
+
+    def update(self, landmarks):
+        """Move according to a LandmarkFrame (None when the pose was lost)"""
+        with self._lock:
+            self._update(landmarks)
+
+    def _update(self, landmarks):
+        if landmarks is None or not self.enabled:
+            self._reset()
+            return
+
+        previous, self._last_timestamp = self._last_timestamp, landmarks.timestamp
+        if previous is None:
+            return
+        dt = landmarks.timestamp - previous
+        if dt <= 0.0 or dt > MAX_FRAME_GAP:
+            return
+
+        data = landmarks.data
+        if min(data[LEFT_SHOULDER, VISIBILITY], data[RIGHT_SHOULDER, VISIBILITY]) < VISIBILITY_THRESHOLD:
+            return
+        center = (data[LEFT_SHOULDER, :2] + data[RIGHT_SHOULDER, :2]) * 0.5
+        width = float(np.hypot(*(data[LEFT_SHOULDER, :2] - data[RIGHT_SHOULDER, :2])))
+        if width < 1e-6:
+            return
+
+        motion = self._motion
+        motion[:] = self._remainder
+        for axis in self.axes:
+            value = axis.source(data, center, width)
+            if value is not None:
+                motion[axis.target] += axis.speed(value) * dt
+
+        steps = np.trunc(motion)
+        self._remainder[:] = motion - steps
+        dx, dy, scroll_x, scroll_y = (int(step) for step in steps)
+        if dx or dy:
+            self.dispatcher.move_mouse(dx, dy)
+        if scroll_x or scroll_y:
+            self.dispatcher.scroll(scroll_x, scroll_y)
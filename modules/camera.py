@@ -1,39 +1,57 @@
-import cv2
+import logging
+import time
+
 import numpy as np
 from PyQt5.QtCore import QThread, pyqtSignal, Qt
-from PyQt5.QtGui import QImage
+
+from modules.frame_mailbox import CapturedFrame, FrameMailbox
+from modules.frame_sources import CameraSource
+
+logger = logging.getLogger(__name__)
 
 class CameraThread(QThread):
-    frame_ready = pyqtSignal(QImage)
-    raw_frame_ready = pyqtSignal(np.ndarray)
+    # Emitted when a frame lands in an empty mailbox; the consumer takes the latest frame
+    frame_available = pyqtSignal()
+    # Emitted when a finite source (video file, image directory) has no frames left
+    source_finished = pyqtSignal()
     
-    def __init__(self, camera_id=0):
+    def __init__(self, source=None, mailbox=None):
         super().__init__()
-        self.camera_id = camera_id
+        # Live camera 0 unless another FrameSource is given
+        self.source = source if source is not None else CameraSource(0)
+        self.mailbox = mailbox if mailbox is not None else FrameMailbox()
         self.running = False
+        self.frames_captured = 0
         
     def run(self):
         self.running = True
-        cap = cv2.VideoCapture(self.camera_id)
+        if not self.source.open():
+            self.source.close()
+            return
         
         while self.running:
-            ret, frame = cap.read()
-            if not ret:
+            frame = self.source.read()
+            if frame is None:
+                if self.source.exhausted:
+                    logger.info("Frame source finished after %d frames", self.frames_captured)
+                    self.source_finished.emit()
+                    break
                 continue
+            # Stamp the frame for latency tracing
+            self.frames_captured += 1
+            captured = CapturedFrame(frame, self.frames_captured, time.perf_counter())
                 
-            # Emit the raw frame for pose detection
-            self.raw_frame_ready.emit(frame)
-            
-            # Convert BGR to RGB - this is the critical part for color correction
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            # Hand the raw frame to pose detection, replacing any frame not yet processed
+            # The display gets the frame from the pose detector, already converted once
+            if self.mailbox.put(captured):
+                self.frame_available.emit()
             
-            # Create QImage
-            h, w, ch = rgb_frame.shape
-            bytes_per_line = ch * w
-            qt_image = QImage(rgb_frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
-            self.frame_ready.emit(qt_image)
+            # Unpaced file sources go as fast as detection keeps up, without dropping frames
+            if not self.source.realtime:
+                while self.running and not self.mailbox.wait_taken(0.1):
+                    pass
             
-        cap.release()
+        self.source.close()
 
     def stop(self):
         self.running = False
@@ -0,0 +1,116 @@
+import threading
+
+import numpy as np
+
+
+class CapturedFrame:
+    """A camera image stamped with its sequence number and perf_counter capture time"""
+
+    __slots__ = ('image', 'seq', 'timestamp')
+
+    def __init__(self, image, seq, timestamp):
+        self.image = image
+        self.seq = seq
+        self.timestamp = timestamp
+
+
+class FrameMailbox:
+    """Single-slot, latest-frame-wins handoff between the camera and the pose detector.
+
+    The producer never blocks: a frame that has not been consumed yet is simply
+    replaced by the newer one and counted as dropped. This keeps the
+    capture-to-landmark latency at one frame no matter how slow inference is.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._taken = threading.Condition(self._lock)
+        self._frame = None
+        self._closed = False
+        self.frames_posted = 0
+        self.frames_dropped = 0
+
+    def put(self, frame):
+        """Store a frame, replacing any unconsumed one.
+
+        Returns True if the slot was empty, i.e. the consumer needs to be notified.
+        """
+        with self._lock:
+            was_empty = self._frame is None
+            if not was_empty:
+                self.frames_dropped += 1
+            self._frame = frame
+            self.frames_posted += 1
+            self._not_empty.notify()
+        return was_empty
+
+    def take(self):
+        """Return the pending frame without waiting, or None if there is none"""
+        with self._lock:
+            frame = self._frame
+            self._frame = None
+            self._taken.notify_all()
+        return frame
+
+    def get(self, timeout=None):
+        """Wait for a frame and return it, or None on timeout or after close()"""
+        with self._lock:
+            if self._frame is None and not self._closed:
+                self._not_empty.wait(timeout)
+            frame = self._frame
+            self._frame = None
+            self._taken.notify_all()
+        return frame
+
+    def wait_taken(self, timeout=None):
+        """Wait until the pending frame has been consumed; returns False on timeout
+
+        Lets an unpaced producer (e.g. a video file) go as fast as the consumer
+        without frames being dropped.
+        """
+        with self._lock:
+            if self._frame is not None:
+                self._taken.wait(timeout)
+            return self._frame is None
+
+    def clear(self):
+        """Discard any pending frame"""
+        with self._lock:
+            self._frame = None
+            self._taken.notify_all()
+
+    def close(self):
+        """Wake up any waiting consumer"""
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+
+    def reopen(self):
+        with self._lock:
+            self._closed = False
+
+    @property
+    def pending(self):
+        return 1 if self._frame is not None else 0
+
+
+class FrameBufferPool:
+    """Round-robin set of preallocated image buffers, for cv2 dst= outputs.
+
+    A buffer is reallocated only when the requested shape changes. It is
+    handed out again after size more acquisitions, so a consumer on another
+    thread must be done with it by then; the display copies each frame into
+    a pixmap as soon as it arrives.
+    """
+
+    def __init__(self, size=4):
+        self._buffers = [None] * size
+        self._next = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        buffer = self._buffers[self._next]
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = self._buffers[self._next] = np.empty(shape, dtype=dtype)
+        self._next = (self._next + 1) % len(self._buffers)
+        return buffer
@@ -0,0 +1,283 @@
+import logging
+import os
+import time
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+
+
+class FrameSource:
+    """Where CameraThread gets its BGR frames from.
+
+    read() returns the next frame, or None if there is none right now;
+    exhausted turns True once a finite source has nothing left. Paced
+    sources sleep in read() so frames come at their recorded rate. With
+    realtime False they return frames as fast as they are asked for, and
+    CameraThread then waits for each frame to be taken instead of letting
+    the mailbox drop it.
+    """
+
+    name = None
+    realtime = True
+
+    def __init__(self):
+        self.exhausted = False
+        self.mode = None  # Negotiated capture mode of live cameras
+
+    def open(self):
+        """Open the source; returns False if it cannot be used"""
+        raise NotImplementedError
+
+    def read(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def fourcc_name(code):
+    """Four-character name of an OpenCV FOURCC code (e.g. "MJPG")"""
+    code = int(code)
+    return "".join(chr((code >> 8 * i) & 0xFF) for i in range(4)).strip("\x00") or "?"
+
+
+class CameraSource(FrameSource):
+    """Live capture from a camera device
+
+    width, height, fps, fourcc (e.g. "MJPG") and buffer_size are requested
+    from the driver when set. A requested mode that delivers no frames is
+    dropped for the next fallback: the same mode without the fourcc, then
+    the driver's defaults. The mode the camera actually runs in, including
+    the measured frame rate, is logged and kept in mode.
+    """
+
+    name = "camera"
+    # Frames read when the camera is opened to check and time the mode
+    PROBE_FRAMES = 5
+    PROBE_TIMEOUT = 2.0
+
+    def __init__(self, device=0, width=None, height=None, fps=None, fourcc=None, buffer_size=None):
+        super().__init__()
+        self.device = device
+        self.requested = {"width": width, "height": height, "fps": fps, "fourcc": fourcc,
+                          "buffer_size": buffer_size}
+        self._cap = None
+
+    def open(self):
+        for candidate in self._candidates():
+            cap = cv2.VideoCapture(self.device)
+            if not cap.isOpened():
+                logger.error("Cannot open camera %s", self.device)
+                return False
+            self._configure(cap, candidate)
+            measured_fps = self._probe(cap)
+            if measured_fps is not None:
+                self._cap = cap
+                self.mode = self._read_mode(cap, measured_fps)
+                logger.info("Camera %s: %dx%d %s at %.1f fps (driver reports %.1f), buffer %s; requested %s",
+                            self.device, self.mode["width"], self.mode["height"], self.mode["fourcc"],
+                            self.mode["measured_fps"], self.mode["fps"], self.mode["buffer_size"],
+                            self._describe(self.requested))
+                return True
+            logger.warning("Camera %s delivers no frames with %s, trying the next mode",
+                           self.device, self._describe(candidate))
+            cap.release()
+        logger.error("Camera %s delivers no frames in any mode", self.device)
+        return False
+
+    def _candidates(self):
+        """Requested mode first, then progressively closer to the driver defaults"""
+        requested = self.requested
+        candidates = [requested]
+        if requested["fourcc"]:
+            candidates.append(dict(requested, fourcc=None))
+        defaults = {"width": None, "height": None, "fps": None, "fourcc": None,
+                    "buffer_size": requested["buffer_size"]}
+        if defaults not in candidates:
+            candidates.append(defaults)
+        return candidates
+
+    @staticmethod
+    def _configure(cap, mode):
+        # V4L2 only accepts a new pixel format before the frame size is set
+        if mode["fourcc"]:
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*mode["fourcc"]))
+        if mode["width"]:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, mode["width"])
+        if mode["height"]:
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, mode["height"])
+        if mode["fps"]:
+            cap.set(cv2.CAP_PROP_FPS, mode["fps"])
+        # Fewer driver buffers means fresher frames; not every backend supports it
+        if mode["buffer_size"]:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, mode["buffer_size"])
+
+    def _probe(self, cap):
+        """Read a few frames; returns the measured frame rate, or None if no frames come"""
+        deadline = time.perf_counter() + self.PROBE_TIMEOUT
+        times = []
+        while len(times) < self.PROBE_FRAMES and time.perf_counter() < deadline:
+            ret, _ = cap.read()
+            if ret:
+                times.append(time.perf_counter())
+        if not times:
+            return None
+        if len(times) < 2:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    @staticmethod
+    def _read_mode(cap, measured_fps):
+        return {
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": cap.get(cv2.CAP_PROP_FPS),
+            "fourcc": fourcc_name(cap.get(cv2.CAP_PROP_FOURCC)),
+            "buffer_size": int(cap.get(cv2.CAP_PROP_BUFFERSIZE)),
+            "measured_fps": measured_fps
+        }
+
+    @staticmethod
+    def _describe(mode):
+        size = f"{mode['width'] or '?'}x{mode['height'] or '?'}" if mode["width"] or mode["height"] else "default size"
+        parts = [size, mode["fourcc"] or "default format"]
+        if mode["fps"]:
+            parts.append(f"{mode['fps']} fps")
+        if mode["buffer_size"]:
+            parts.append(f"buffer {mode['buffer_size']}")
+        return ", ".join(parts)
+
+    def read(self):
+        ret, frame = self._cap.read()
+        return frame if ret else None
+
+    def close(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+
+class _PacedSource(FrameSource):
+    """Finite source that can replay at a fixed frame rate and loop"""
+
+    def __init__(self, fps, realtime=True, loop=False):
+        super().__init__()
+        self.fps = fps
+        self.realtime = realtime
+        self.loop = loop
+        self._next_due = None
+
+    def _pace(self):
+        """Sleep until the next frame is due at fps"""
+        if not self.realtime or not self.fps:
+            return
+        now = time.perf_counter()
+        if self._next_due is None:
+            self._next_due = now
+        elif self._next_due > now:
+            time.sleep(self._next_due - now)
+        else:
+            # Running late (e.g. a slow decode); don't try to catch up with a burst
+            self._next_due = now
+        self._next_due += 1.0 / self.fps
+
+
+class VideoFileSource(_PacedSource):
+    """Frames of a video file, at the file's frame rate or as fast as possible"""
+
+    name = "video"
+
+    def __init__(self, path, realtime=True, loop=False, fps=None):
+        super().__init__(fps, realtime, loop)
+        self.path = path
+        self._cap = None
+
+    def open(self):
+        self._cap = cv2.VideoCapture(self.path)
+        if not self._cap.isOpened():
+            logger.error("Cannot open video file %s", self.path)
+            return False
+        if not self.fps:
+            self.fps = self._cap.get(cv2.CAP_PROP_FPS) or 30.0
+        logger.info("Playing %s at %.1f fps%s", self.path, self.fps, "" if self.realtime else " (unpaced)")
+        return True
+
+    def read(self):
+        ret, frame = self._cap.read()
+        if not ret and self.loop:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self._cap.read()
+        if not ret:
+            self.exhausted = True
+            return None
+        self._pace()
+        return frame
+
+    def close(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+
+class ImageDirectorySource(_PacedSource):
+    """Image files of a directory in name order, e.g. frames exported from a recording"""
+
+    name = "images"
+
+    def __init__(self, path, fps=30.0, realtime=True, loop=False):
+        super().__init__(fps, realtime, loop)
+        self.path = path
+        self._files = []
+        self._index = 0
+
+    def open(self):
+        if not os.path.isdir(self.path):
+            logger.error("Image directory %s does not exist", self.path)
+            return False
+        self._files = sorted(
+            os.path.join(self.path, name) for name in os.listdir(self.path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if not self._files:
+            logger.error("No images found in %s", self.path)
+            return False
+        logger.info("Playing %d images from %s at %.1f fps%s", len(self._files), self.path, self.fps,
+                    "" if self.realtime else " (unpaced)")
+        return True
+
+    def read(self):
+        while True:
+            if self._index >= len(self._files):
+                if not self.loop:
+                    self.exhausted = True
+                    return None
+                self._index = 0
+            path = self._files[self._index]
+            self._index += 1
+            frame = cv2.imread(path)
+            if frame is not None:
+                self._pace()
+                return frame
+            logger.warning("Skipping unreadable image %s", path)
+
+
+SOURCES = (CameraSource.name, VideoFileSource.name, ImageDirectorySource.name)
+
+
+def create_frame_source(camera_settings):
+    """Create the frame source described by the "camera" settings; raises ValueError if invalid"""
+    source = camera_settings["source"]
+    if source == CameraSource.name:
+        return CameraSource(camera_settings["device"], camera_settings["width"], camera_settings["height"],
+                            camera_settings["fps"], camera_settings["fourcc"], camera_settings["buffer_size"])
+    if not camera_settings.get("path"):
+        raise ValueError(f"Frame source '{source}' needs a path")
+    if source == VideoFileSource.name:
+        return VideoFileSource(camera_settings["path"], camera_settings["realtime"], camera_settings["loop"])
+    if source == ImageDirectorySource.name:
+        return ImageDirectorySource(camera_settings["path"], camera_settings["fps"],
+                                    camera_settings["realtime"], camera_settings["loop"])
+    raise ValueError(f"Unknown frame source '{source}' (choose from {', '.join(SOURCES)})")
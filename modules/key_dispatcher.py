@@ -0,0 +1,256 @@
+import collections
+import heapq
+import logging
+import threading
+import time
+
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from modules.latency_trace import tracer, OUTPUT, TOTAL
+
+logger = logging.getLogger(__name__)
+
+PRESS_KEY = "press"
+RELEASE_KEY = "release"
+MOVE_MOUSE = "move"
+SCROLL = "scroll"
+_SCHEDULE = "schedule"
+
+# Scheduled events are waited for with a blocking wait until this close to
+# their deadline, then by spinning, since the wait can oversleep by ~1 ms
+SPIN_MARGIN = 0.001
+
+
+class _StatsRing:
+    """Fixed-size ring of recent samples (ms) with percentile summaries"""
+
+    def __init__(self, size):
+        self._samples = np.zeros(size, dtype=np.float64)
+        self.count = 0
+
+    def record(self, value):
+        self._samples[self.count % len(self._samples)] = value
+        self.count += 1
+
+    def stats(self):
+        samples = self._samples[:min(self.count, len(self._samples))]
+        if len(samples) == 0:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": float(samples.mean()),
+            "p50": float(np.percentile(samples, 50)),
+            "p99": float(np.percentile(samples, 99)),
+            "max": float(samples.max())
+        }
+
+
+class ScheduledEvents:
+    """Handle for key events scheduled with KeyDispatcher.schedule()"""
+
+    __slots__ = ('deadline', 'events', 'cancelled', 'fired', '_dispatcher')
+
+    def __init__(self, dispatcher, deadline, events):
+        self.deadline = deadline  # perf_counter time
+        self.events = events      # [(PRESS_KEY or RELEASE_KEY, key)]
+        self.cancelled = False
+        self.fired = False
+        self._dispatcher = dispatcher
+
+    def cancel(self):
+        """Cancel in O(1) (the heap entry is left as a tombstone)
+        
+        Safe to call from any thread. Returns True if the events had not
+        been injected yet; they then never will be. False means the
+        dispatcher has taken them to inject, or they were already cancelled.
+        """
+        dispatcher = self._dispatcher
+        with dispatcher._timer_lock:
+            if self.cancelled or self.fired:
+                return False
+            self.cancelled = True
+            dispatcher._tombstones += 1
+        return True
+
+
+class KeyDispatcher(QThread):
+    """Injects key events into an OutputBackend on its own thread.
+
+    Keys are already resolved for the backend by compile_key_combo. Producers
+    call press()/release(), which only append to a deque (atomic
+    in CPython, no lock) and wake the thread, so a slow X server round trip
+    never delays frame processing. The enqueue-to-injection latency of every
+    event is recorded and reported through key_injected.
+
+    schedule() queues events for a later perf_counter time. They are kept in
+    a heap owned by this thread, which sleeps until just before the earliest
+    deadline and spins the rest of the way, so they fire within a fraction of
+    a millisecond of it.
+
+    clock replaces time.perf_counter for every timestamp and deadline, so
+    tests can drive a dispatcher that is not started with poll() under a
+    fake clock and get the same timings on every run.
+    """
+
+    key_injected = pyqtSignal(str, str, float)  # action, key, latency in ms
+
+    def __init__(self, backend, history=1024, clock=time.perf_counter):
+        super().__init__()
+        self.backend = backend
+        self.clock = clock
+        self.running = False
+        self._events = collections.deque()
+        self._wakeup = threading.Event()
+        self._latencies = _StatsRing(history)
+        # Pointer motion comes every frame while analog output is on; it gets its
+        # own ring so it does not crowd key events out of latency_stats()
+        self._motion_latencies = _StatsRing(history)
+        self._lateness = _StatsRing(history)  # How late scheduled events fired
+        self._timers = []  # Heap of (deadline, counter, ScheduledEvents)
+        self._timer_counter = 0
+        # Guards the cancelled/fired flags of scheduled events and the tombstone
+        # count: cancel() runs on the producer's thread, firing on this one
+        self._timer_lock = threading.Lock()
+        self._tombstones = 0
+
+    def press(self, key, origin=None):
+        """Queue a key press; origin is the LandmarkFrame that caused it, for latency tracing"""
+        self._post(PRESS_KEY, key, origin)
+
+    def release(self, key, origin=None):
+        self._post(RELEASE_KEY, key, origin)
+
+    def move_mouse(self, dx, dy):
+        """Queue a relative pointer motion in pixels"""
+        self._post(MOVE_MOUSE, (dx, dy))
+
+    def scroll(self, dx, dy):
+        """Queue a scroll by whole steps"""
+        self._post(SCROLL, (dx, dy))
+
+    def schedule(self, delay, events):
+        """Inject [(action, key)] delay seconds from now; returns a cancellable handle"""
+        return self.schedule_at(self.clock() + delay, events)
+
+    def schedule_at(self, deadline, events):
+        """Inject [(action, key)] at a perf_counter time; returns a cancellable handle"""
+        scheduled = ScheduledEvents(self, deadline, events)
+        self._post(_SCHEDULE, scheduled)
+        return scheduled
+
+    def _post(self, action, key, origin=None):
+        self._events.append((action, key, self.clock(), origin))
+        self._wakeup.set()
+
+    def run(self):
+        self.running = True
+        while self.running:
+            timeout = 0.1
+            if self._timers:
+                timeout = min(timeout, self._timers[0][0] - self.clock() - SPIN_MARGIN)
+            if timeout > 0:
+                self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            self.poll()
+        # Deliver whatever was queued before stopping (e.g. final releases)
+        self._drain()
+
+    def poll(self):
+        """Inject queued events and scheduled events that are due, without waiting"""
+        self._drain()
+        self._fire_due()
+
+    def _drain(self):
+        while self._events:
+            action, key, enqueued, origin = self._events.popleft()
+            if action == _SCHEDULE:
+                heapq.heappush(self._timers, (key.deadline, self._timer_counter, key))
+                self._timer_counter += 1
+                continue
+            if self._inject(action, key):
+                injected = self.clock()
+                latency_ms = (injected - enqueued) * 1000.0
+                is_key = action == PRESS_KEY or action == RELEASE_KEY
+                (self._latencies if is_key else self._motion_latencies).record(latency_ms)
+                if origin is not None:
+                    tracer.record(origin.seq, OUTPUT, latency_ms)
+                    tracer.record(origin.seq, TOTAL, (injected - origin.capture_time) * 1000.0)
+                if is_key:
+                    self.key_injected.emit(action, str(key), latency_ms)
+
+    def _inject(self, action, key):
+        try:
+            if action == PRESS_KEY:
+                self.backend.press(key)
+            elif action == RELEASE_KEY:
+                self.backend.release(key)
+            elif action == MOVE_MOUSE:
+                self.backend.move_mouse(*key)
+            else:
+                self.backend.scroll(*key)
+            return True
+        except Exception as e:
+            logger.error("Error injecting %s '%s': %s", action, key, e)
+            return False
+
+    def _fire_due(self):
+        """Inject every scheduled event that is due, spinning through the last SPIN_MARGIN"""
+        if self._tombstones > 64 and self._tombstones > len(self._timers) // 2:
+            with self._timer_lock:
+                self._timers = [timer for timer in self._timers if not timer[2].cancelled]
+                self._tombstones = 0
+            heapq.heapify(self._timers)
+
+        while self._timers:
+            deadline, _, scheduled = self._timers[0]
+            if scheduled.cancelled:
+                heapq.heappop(self._timers)
+                with self._timer_lock:
+                    self._tombstones = max(0, self._tombstones - 1)
+                continue
+            now = self.clock()
+            if deadline - now > SPIN_MARGIN:
+                return
+            if now < deadline:
+                # Keep serving immediate events while waiting out the deadline
+                self._drain()
+                continue
+
+            heapq.heappop(self._timers)
+            # Claim the events; a cancel() that lost the race returns False
+            with self._timer_lock:
+                if scheduled.cancelled:
+                    self._tombstones = max(0, self._tombstones - 1)
+                    continue
+                scheduled.fired = True
+            lateness_ms = (now - deadline) * 1000.0
+            self._lateness.record(lateness_ms)
+            for action, key in scheduled.events:
+                if self._inject(action, key):
+                    self.key_injected.emit(action, str(key), (self.clock() - deadline) * 1000.0)
+
+    def latency_stats(self):
+        """Enqueue-to-injection latency (ms) over the most recent key events"""
+        return self._latencies.stats()
+
+    def motion_stats(self):
+        """Enqueue-to-injection latency (ms) over the most recent mouse moves and scrolls"""
+        return self._motion_latencies.stats()
+
+    def timer_stats(self):
+        """How late (ms) the most recent scheduled events fired after their deadline"""
+        return self._lateness.stats()
+
+    @property
+    def queue_depth(self):
+        return len(self._events)
+
+    @property
+    def scheduled_count(self):
+        return len(self._timers) - self._tombstones
+
+    def stop(self):
+        self.running = False
+        self._wakeup.set()
+        self.wait()
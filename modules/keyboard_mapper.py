@@ -1,23 +1,53 @@
-from pynput.keyboard import Controller, Key
-from PyQt5.QtCore import QObject, pyqtSignal, QTimer
+from PyQt5.QtCore import QObject, pyqtSignal
 import json
+import logging
 import os
 import time
 
+from modules.key_dispatcher import KeyDispatcher, PRESS_KEY, RELEASE_KEY
+from modules.output_backends import PynputBackend, check_key_name
+from modules.pose_matcher import PoseMatcher
+from modules.pose_signature import PoseSignature
+from modules.pose_state import PoseStateTracker, PRESS
+
+logger = logging.getLogger(__name__)
+
 class KeyboardMapper(QObject):
     key_triggered = pyqtSignal(str)
     
-    def __init__(self, poses_dir="poses"):
+    def __init__(self, poses_dir="poses", backend=None, index_min_poses=None, index_candidates=32):
         super().__init__()
-        self.keyboard = Controller()
+        # Where key events go (pynput unless another OutputBackend is given)
+        self.backend = backend if backend is not None else PynputBackend()
+        
+        # Key injection happens on the dispatcher's own thread
+        self.dispatcher = KeyDispatcher(self.backend)
+        self.dispatcher.start()
         self.pose_map = {}  # Maps pose signatures to key combinations
         self.poses_dir = poses_dir
         
+        # Key combos resolved for the output backend, per pose id
+        self.compiled_combos = {}
+        
         # Track currently pressed keys
         self.currently_pressed_keys = set()
         
-        # Timers for sustained key presses
-        self.key_timers = {}
+        # Pending releases of sustained key presses, per pose id
+        self.release_handles = {}
+        
+        # Macro timelines compiled per pose id, and the pending steps of running macros
+        self.compiled_macros = {}
+        self.macro_handles = {}
+        
+        # Batched matcher over all saved signatures, kept in sync with pose_map
+        self.matcher = PoseMatcher(index_min_poses=index_min_poses, index_candidates=index_candidates)
+        self.last_match = None
+        
+        # LandmarkFrame being matched, passed along with key events for latency tracing
+        self._origin = None
+        
+        # Press/hold/release state of every pose
+        self.pose_states = PoseStateTracker()
         
         # Create poses directory if it doesn't exist
         if not os.path.exists(poses_dir):
@@ -27,7 +57,11 @@ class KeyboardMapper(QObject):
         self.load_poses()
     
     def trigger_key(self, pose_id, release_only=False):
-        """Trigger a keyboard combination with enhanced configuration options"""
+        """Trigger a keyboard combination with enhanced configuration options
+        
+        Uses the combo compiled when the pose was loaded or saved, so no key
+        names are parsed here.
+        """
         # If pose_id is a string representation of a pose, convert it
         if isinstance(pose_id, str):
             pose_data = self.pose_map.get(pose_id, {})
@@ -36,94 +70,136 @@ class KeyboardMapper(QObject):
             pose_data = pose_id
             pose_id = self._find_pose_id_by_key_combo(pose_data.get('key_combo'))
         
-        key_combo = pose_data.get('key_combo', '')
+        keys = self.compiled_combos.get(pose_id, ())
         
-        print(f"\n--- {'RELEASING' if release_only else 'TRIGGERING'} KEY: {key_combo} ---")
+        # Determine key press behavior based on pose configuration
+        immediate_release = pose_data.get('immediate_release', True)
+        sustained_duration = pose_data.get('sustained_duration', 0)
         
-        try:
-            keys = key_combo.split('+')
-            
-            # Determine key press behavior based on pose configuration
-            immediate_release = pose_data.get('immediate_release', True)
-            sustained_duration = pose_data.get('sustained_duration', 0)
+        # Press keys
+        if not release_only:
+            # Keys still held by a pending sustained release stay pressed
+            self._cancel_release(pose_id)
+            for key in keys:
+                # Only press if not already pressed
+                if key not in self.currently_pressed_keys:
+                    self._press_single_key(key)
+                    self.currently_pressed_keys.add(key)
             
-            # Press keys
-            if not release_only:
-                for key in keys:
-                    key = key.strip().lower()
-                    # Only press if not already pressed
-                    if key not in self.currently_pressed_keys:
-                        self._press_single_key(key)
-                        self.currently_pressed_keys.add(key)
-                
-                # Handle sustained key press if configured
-                if not immediate_release and sustained_duration > 0:
-                    self._setup_key_timer(key_combo, sustained_duration)
-            
-            # Release keys if immediate release is enabled
-            if immediate_release or release_only:
-                for key in reversed(keys):
-                    key = key.strip().lower()
-                    if key in self.currently_pressed_keys:
-                        self._release_single_key(key)
-                        self.currently_pressed_keys.discard(key)
-            
-            print(f"--- KEY COMBINATION {key_combo} {'RELEASED' if release_only else 'TRIGGERED'} SUCCESSFULLY ---")
-        except Exception as e:
-            print(f"CRITICAL ERROR {'releasing' if release_only else 'triggering'} key combination {key_combo}: {e}")
+            # Handle sustained key press if configured
+            if not immediate_release and sustained_duration > 0:
+                self._schedule_release(pose_id, keys, sustained_duration)
+        
+        # Release keys if immediate release is enabled
+        if immediate_release or release_only:
+            self._cancel_release(pose_id, release_now=True)
+            for key in reversed(keys):
+                if key in self.currently_pressed_keys:
+                    self._release_single_key(key)
+                    self.currently_pressed_keys.discard(key)
     
-    def _press_single_key(self, key):
-        """Press a single key with error handling"""
+    def _compile_pose(self, pose_id):
+        """Resolve a pose's key combo and macro for the backend once, ahead of the hot path"""
+        pose_data = self.pose_map[pose_id]
+        key_combo = pose_data.get('key_combo', '')
         try:
-            if key in ['ctrl', 'alt', 'shift']:
-                self.keyboard.press(getattr(Key, key))
-            elif key.startswith('f') and key[1:].isdigit() and 1 <= int(key[1:]) <= 24:
-                self.keyboard.press(getattr(Key, key))
-            elif key.startswith('num') and key[3:].isdigit():
-                self.keyboard.press(getattr(Key, f'num_{key[3:]}'))
-            elif len(key) == 1:
-                self.keyboard.press(key)
-            else:
-                self.keyboard.press(getattr(Key, key))
-        except Exception as e:
-            print(f"Error pressing key '{key}': {e}")
+            self.compiled_combos[pose_id] = compile_key_combo(key_combo, self.backend)
+        except ValueError as e:
+            logger.error("Pose %s has an invalid key combination '%s': %s", pose_id, key_combo, e)
+            self.compiled_combos[pose_id] = ()
+        
+        macro = pose_data.get('macro', '')
+        try:
+            self.compiled_macros[pose_id] = compile_macro(macro, pose_data.get('macro_gap_ms', 16), self.backend)
+        except ValueError as e:
+            logger.error("Pose %s has an invalid macro '%s': %s", pose_id, macro, e)
+            self.compiled_macros[pose_id] = []
+    
+    def run_macro(self, pose_id):
+        """Start a pose's macro; every step is injected by the dispatcher's scheduler
+        
+        A macro that is still running for this pose is cut short first.
+        """
+        self._cancel_macro(pose_id)
+        start = self.dispatcher.clock()
+        self.macro_handles[pose_id] = [
+            self.dispatcher.schedule_at(start + offset, events)
+            for offset, events in self.compiled_macros.get(pose_id, [])
+        ]
+    
+    def _cancel_macro(self, pose_id):
+        """Cancel the remaining steps of a running macro and release the keys it holds
+        
+        Keys that another pose holds too (a held key combo, a pending
+        sustained release or another running macro) stay pressed.
+        """
+        handles = self.macro_handles.pop(pose_id, None)
+        if not handles:
+            return
+        # Latest step first: once one turns out to have fired, all earlier ones have
+        for handle in reversed(handles):
+            if not handle.cancel():
+                break
+        held = self._macro_held_keys(handles)
+        if not held:
+            return
+        
+        held_elsewhere = set(self.currently_pressed_keys)
+        for handle in self.release_handles.values():
+            if not (handle.cancelled or handle.fired):
+                held_elsewhere.update(key for _, key in handle.events)
+        for other in self.macro_handles.values():
+            held_elsewhere |= self._macro_held_keys(other)
+        for key in held - held_elsewhere:
+            self._release_single_key(key)
+    
+    @staticmethod
+    def _macro_held_keys(handles):
+        """Keys a macro has pressed and not released, going by the steps that fired"""
+        held = set()
+        for handle in handles:
+            if not handle.fired:
+                break
+            for action, key in handle.events:
+                if action == PRESS_KEY:
+                    held.add(key)
+                else:
+                    held.discard(key)
+        return held
+    
+    def _press_single_key(self, key):
+        """Queue a key press for the dispatcher thread"""
+        self.dispatcher.press(key, self._origin)
     
     def _release_single_key(self, key):
-        """Release a single key with error handling"""
-        try:
-            if key in ['ctrl', 'alt', 'shift']:
-                self.keyboard.release(getattr(Key, key))
-            elif key.startswith('f') and key[1:].isdigit() and 1 <= int(key[1:]) <= 24:
-                self.keyboard.release(getattr(Key, key))
-            elif key.startswith('num') and key[3:].isdigit():
-                self.keyboard.release(getattr(Key, f'num_{key[3:]}'))
-            elif len(key) == 1:
-                self.keyboard.release(key)
-            else:
-                self.keyboard.release(getattr(Key, key))
-        except Exception as e:
-            print(f"Error releasing key '{key}': {e}")
+        """Queue a key release for the dispatcher thread"""
+        self.dispatcher.release(key, self._origin)
     
-    def _setup_key_timer(self, key_combo, duration):
-        """Set up a timer to release keys after a specified duration"""
-        # Cancel any existing timer for this key combo
-        if key_combo in self.key_timers:
-            existing_timer = self.key_timers[key_combo]
-            existing_timer.stop()
-            existing_timer.deleteLater()
-        
-        # Create a new timer
-        timer = QTimer()
-        timer.setSingleShot(True)
-        
-        # Create a lambda that captures the key_combo
-        timer.timeout.connect(lambda: self.trigger_key(self._find_pose_id_by_key_combo(key_combo), release_only=True))
-        
-        # Start the timer
-        timer.start(int(duration * 1000))  # Convert to milliseconds
-        
-        # Store the timer
-        self.key_timers[key_combo] = timer
+    def _schedule_release(self, pose_id, keys, duration):
+        """Have the dispatcher release a pose's keys after duration seconds
+        
+        The keys are handed over to the dispatcher's scheduler, so they are no
+        longer tracked in currently_pressed_keys.
+        """
+        held = [key for key in reversed(keys) if key in self.currently_pressed_keys]
+        self.currently_pressed_keys.difference_update(held)
+        self.release_handles[pose_id] = self.dispatcher.schedule(
+            duration, [(RELEASE_KEY, key) for key in held])
+
+    def _cancel_release(self, pose_id, release_now=False):
+        """Cancel a pose's pending sustained release
+        
+        Its keys are released right away with release_now, otherwise they are
+        tracked as pressed again.
+        """
+        handle = self.release_handles.pop(pose_id, None)
+        if handle is None or not handle.cancel():
+            return
+        for _, key in handle.events:
+            if release_now:
+                self._release_single_key(key)
+            else:
+                self.currently_pressed_keys.add(key)
 
     def _find_pose_id_by_key_combo(self, key_combo):
         """Find the pose ID associated with a given key combination"""
@@ -132,109 +208,62 @@ class KeyboardMapper(QObject):
                 return pose_id
         return None
     
-    def add_mapping(self, pose_name, pose_signature, key_combo, 
-                    threshold=0.75, 
-                    recognition_speed=500,  # ms between pose checks
-                    immediate_release=True, 
-                    sustained_duration=0):
-        """Add a mapping with advanced configuration options"""
-        print("\nSAVING NEW POSE:")
-        print(f"Pose Name: {pose_name}")
-        print(f"Key Combo: {key_combo}")
-        print(f"Threshold: {threshold}")
-        print(f"Recognition Speed: {recognition_speed}ms")
-        print(f"Immediate Release: {immediate_release}")
-        print(f"Sustained Duration: {sustained_duration}s")
-        
-        # Create a deep copy to prevent reference issues
-        if pose_signature:
-            saved_signature = [tuple(point) for point in pose_signature]
-        else:
-            saved_signature = None
+    def check_pose(self, pose_detector, current_signature, now=None, landmarks=None):
+        """Check if a pose matches any known mappings and press/release keys
         
-        pose_id = str(len(self.pose_map))
-        self.pose_map[pose_id] = {
-            "name": pose_name,
-            "signature": saved_signature,
-            "key_combo": key_combo,
-            "threshold": threshold,
-            "recognition_speed": recognition_speed,
-            "immediate_release": immediate_release,
-            "sustained_duration": sustained_duration,
-            "image_path": None
-        }
-        self.save_poses()
+        The current signature is scored against the whole library at once by
+        the PoseMatcher; the full score vector is kept in last_match. With the
+        frame time in now, each pose is only re-evaluated at its own
+        recognition_speed. Keys are only pressed or released when a pose's
+        state machine changes state. landmarks, the LandmarkFrame the
+        signature was built from, is only used for latency tracing.
+        """
+        if now is None:
+            now = time.perf_counter()
         
-        print(f"Saved pose with ID: {pose_id}")
-        return pose_id
-
-    def check_pose(self, pose_detector, current_signature):
-        """Check if a pose matches any known mappings with advanced pose tracking"""
         if not current_signature:
-            # If no current signature, release all keys
-            self.release_all_keys()
+            # If no current signature, release everything that is held
+            self.matcher.reset_scores()
+            self.last_match = None
+            self._apply_pose_events(self.pose_states.reset())
             return None
         
-        print(f"\nCHECKING CURRENT POSE against {len(self.pose_map)} saved poses")
-        print(f"Current signature type: {type(current_signature)}")
-        print(f"Current signature length: {len(current_signature)}")
-        
-        best_match = None
-        best_score = 0
-        
-        for pose_id, pose_data in self.pose_map.items():
-            saved_signature = pose_data.get("signature")
-            threshold = pose_data.get("threshold", 0.6)
-            
-            print(f"\nPose {pose_id} ({pose_data.get('name', 'unnamed')}):")
-            print(f"  Saved signature type: {type(saved_signature)}")
-            print(f"  Saved signature length: {len(saved_signature) if saved_signature else 'None'}")
-            
-            if not saved_signature:
-                print("  ERROR: No saved signature for this pose")
+        result = self.matcher.match(current_signature, now)
+        self.last_match = result
+        self._origin = landmarks
+        try:
+            self._apply_pose_events(self.pose_states.update(result, now, self.pose_map))
+        finally:
+            self._origin = None
+        return result.pose_id
+    
+    def _apply_pose_events(self, events):
+        """Turn pose state transitions into key presses and releases"""
+        for event, pose_id in events:
+            pose_data = self.pose_map.get(pose_id)
+            if pose_data is None:
                 continue
             
-            # Calculate similarity
-            try:
-                similarity = pose_detector.compare_poses(current_signature, saved_signature)
-                print(f"  Similarity: {similarity:.4f}, Threshold: {threshold:.4f}")
-                
-                if similarity > threshold and similarity > best_score:
-                    best_score = similarity
-                    best_match = pose_id
-            except Exception as e:
-                print(f"  ERROR comparing poses: {str(e)}")
+            if event == PRESS:
+                if self.compiled_macros.get(pose_id):
+                    logger.debug("Pose %s active, running macro %s", pose_id, pose_data["macro"])
+                    self.key_triggered.emit(pose_data["macro"])
+                    self.run_macro(pose_id)
+                    continue
+                logger.debug("Pose %s active, pressing %s", pose_id, pose_data["key_combo"])
+                self.key_triggered.emit(pose_data["key_combo"])
+                self.trigger_key(pose_id)
+            elif self.compiled_macros.get(pose_id):
+                # Macros always run to completion
                 continue
-        
-        if best_match:
-            print(f"FOUND BEST MATCH: {best_match} with score {best_score:.4f}")
-            
-            # Trigger the key
-            key_combo = self.pose_map[best_match]["key_combo"]
-            self.key_triggered.emit(key_combo)
-            
-            # Check if this is a movement pose
-            if len(key_combo) == 1 and key_combo.lower() in 'wasd':
-                # Special handling for movement keys
-                # Only press the key if it's not already pressed
-                if key_combo not in self.currently_pressed_keys:
-                    self.trigger_key(best_match)
-            else:
-                # Regular key triggering for other types of poses
-                self.trigger_key(best_match)
-            
-            return best_match
-        
-        # If no match found, release all keys
-        self.release_all_keys()
-        print(f"No matching pose found. Best score was {best_score:.4f}")
-        return None
+            elif not pose_data.get("immediate_release", True):
+                # Held keys are released when the pose ends
+                self.trigger_key(pose_id, release_only=True)
 
     # Existing methods like save_poses, load_poses remain the same
    
     def save_poses(self):
         """Save all pose mappings to file with proper JSON serialization"""
-        print("\nSAVING POSES TO FILE:")
         config_path = os.path.join(self.poses_dir, "poses.json")
         
         # Prepare a copy of the pose map for serialization
@@ -243,28 +272,28 @@ class KeyboardMapper(QObject):
             # Create a deep copy
             pose_copy = pose_data.copy()
             
-            # Convert tuple signatures to lists for JSON serialization
+            # Convert signatures to plain lists for JSON serialization
             if pose_copy.get("signature"):
-                pose_copy["signature"] = [list(point) for point in pose_copy["signature"]]
+                pose_copy["signature"] = pose_copy["signature"].to_json()
             
             serializable_map[pose_id] = pose_copy
             
-            print(f"Saving Pose {pose_id} ({pose_data.get('name', 'unnamed')}):")
-            for key, value in pose_copy.items():
-                print(f"  {key}: {value}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Saving pose %s (%s): %s", pose_id, pose_data.get('name', 'unnamed'),
+                             ", ".join(f"{key}={value}" for key, value in pose_copy.items() if key != "signature"))
         
         # Save to file
         try:
             with open(config_path, 'w') as f:
                 json.dump(serializable_map, f, indent=2)
-            print(f"Successfully saved poses to {config_path}")
+            logger.info("Saved %d poses to %s", len(serializable_map), config_path)
         except Exception as e:
-            print(f"ERROR saving poses: {str(e)}")
+            logger.error("Error saving poses: %s", e)
                 
     def load_poses(self):
         """Load pose mappings from file with proper conversion"""
         config_path = os.path.join(self.poses_dir, "poses.json")
-        print(f"\nLOADING POSES FROM: {config_path}")
+        logger.info("Loading poses from %s", config_path)
         
         if os.path.exists(config_path):
             try:
@@ -273,44 +302,61 @@ class KeyboardMapper(QObject):
                     
                 # Convert loaded data back to the format we need
                 for pose_id, pose_data in loaded_map.items():
-                    # Convert signature points from lists back to tuples
-                    if pose_data.get("signature"):
-                        pose_data["signature"] = [tuple(point) for point in pose_data["signature"]]
+                    saved_signature = pose_data.get("signature")
+                    pose_data["signature"] = PoseSignature.from_json(saved_signature)
+                    if saved_signature and pose_data["signature"] is None:
+                        logger.warning("Pose %s has a signature from an older version that cannot be matched reliably; please recapture it", pose_id)
+                    # Before recognition_speed was used, 500 was its default and minimum,
+                    # so poses saved back then would now be checked only twice a second.
+                    # Such poses also predate the exit threshold.
+                    if "exit_threshold" not in pose_data and pose_data.get("recognition_speed") == 500:
+                        logger.info("Pose %s: recognition speed 500 ms from an older version reset to every frame", pose_id)
+                        pose_data["recognition_speed"] = 0
                         
                 self.pose_map = loaded_map
+                self.matcher.rebuild(self.pose_map)
+                self.compiled_combos = {}
+                self.compiled_macros = {}
+                for pose_id in self.pose_map:
+                    self._compile_pose(pose_id)
                 
                 # Debug info
-                print(f"Loaded {len(self.pose_map)} poses:")
-                for pose_id, pose_data in self.pose_map.items():
-                    print(f"  Pose {pose_id} ({pose_data.get('name', 'unnamed')}):")
-                    print(f"  Signature type: {type(pose_data.get('signature'))}")
-                    print(f"  Signature length: {len(pose_data.get('signature', [])) if pose_data.get('signature') else 'None'}")
+                logger.info("Loaded %d poses", len(self.pose_map))
+                if logger.isEnabledFor(logging.DEBUG):
+                    for pose_id, pose_data in self.pose_map.items():
+                        logger.debug("Pose %s (%s): signature visible slots %s", pose_id, pose_data.get('name', 'unnamed'),
+                                     pose_data['signature'].visible_count if pose_data.get('signature') else 'None')
                     
             except Exception as e:
-                print(f"ERROR loading poses: {str(e)}")
+                logger.error("Error loading poses: %s", e)
                 # Initialize with empty dict if load fails
                 self.pose_map = {}
+                self.matcher.clear()
         else:
-            print("No poses file found. Starting with empty pose map.")
+            logger.info("No poses file found. Starting with empty pose map.")
             self.pose_map = {}
+            self.matcher.clear()
 
     def add_mapping(self, pose_name, pose_signature, key_combo, 
                     threshold=0.75, 
-                    recognition_speed=500,
+                    recognition_speed=0,  # ms between pose checks, 0 = every frame
                     immediate_release=True, 
-                    sustained_duration=0):
+                    sustained_duration=0,
+                    exit_threshold=None,  # Release below this score, defaults to threshold - 0.05
+                    dwell_frames=1,  # Frames the pose must be held before the key fires
+                    dwell_ms=0,  # Time the pose must be held before the key fires
+                    macro="",  # Comma-separated key combos fired in sequence instead of key_combo
+                    macro_gap_ms=16):  # Time between macro steps
         """Add a mapping with advanced configuration options"""
-        print("\nSAVING NEW POSE:")
-        print(f"Pose Name: {pose_name}")
-        print(f"Key Combo: {key_combo}")
-        print(f"Threshold: {threshold}")
-        print(f"Recognition Speed: {recognition_speed}ms")
-        print(f"Immediate Release: {immediate_release}")
-        print(f"Sustained Duration: {sustained_duration}s")
+        logger.debug("New pose '%s': key combo %s, threshold %s, recognition speed %sms, "
+                     "immediate release %s, sustained duration %ss, exit threshold %s, "
+                     "dwell %s frames / %sms, macro %s (%sms gaps)",
+                     pose_name, key_combo, threshold, recognition_speed, immediate_release,
+                     sustained_duration, exit_threshold, dwell_frames, dwell_ms, macro or 'None', macro_gap_ms)
         
         # Create a deep copy to prevent reference issues
-        if pose_signature:
-            saved_signature = [tuple(point) for point in pose_signature]
+        if pose_signature is not None:
+            saved_signature = pose_signature.copy()
         else:
             saved_signature = None
         
@@ -323,62 +369,143 @@ class KeyboardMapper(QObject):
             "recognition_speed": recognition_speed,
             "immediate_release": immediate_release,
             "sustained_duration": sustained_duration,
+            "exit_threshold": exit_threshold,
+            "dwell_frames": dwell_frames,
+            "dwell_ms": dwell_ms,
+            "macro": macro,
+            "macro_gap_ms": macro_gap_ms,
             "image_path": None
         }
+        self.matcher.set_pose_data(pose_id, self.pose_map[pose_id])
+        self._compile_pose(pose_id)
         self.save_poses()
         
-        print(f"Saved pose with ID: {pose_id}")
+        logger.info("Saved pose '%s' with ID %s", pose_name, pose_id)
         return pose_id
     
     def remove_mapping(self, pose_id):
         """Remove a pose mapping"""
-        print(f"\nREMOVING POSE: {pose_id}")
-        
         if pose_id in self.pose_map:
             # Log the details of the pose being removed
             pose_data = self.pose_map[pose_id]
-            print(f"Pose Name: {pose_data.get('name', 'Unnamed Pose')}")
-            print(f"Key Combo: {pose_data.get('key_combo', 'N/A')}")
+            logger.debug("Removing pose %s (%s, key combo %s)", pose_id,
+                         pose_data.get('name', 'Unnamed Pose'), pose_data.get('key_combo', 'N/A'))
             
             # Remove the pose from the map
             del self.pose_map[pose_id]
+            self.matcher.remove_pose(pose_id)
+            self.compiled_combos.pop(pose_id, None)
+            self.compiled_macros.pop(pose_id, None)
+            self._cancel_macro(pose_id)
             
             # Save the updated poses
             self.save_poses()
             
-            print(f"Pose {pose_id} removed successfully")
+            logger.info("Pose %s removed", pose_id)
         else:
-            print(f"No pose found with ID: {pose_id}")
+            logger.warning("No pose found with ID %s", pose_id)
+
+    def update_mapping(self, pose_id, pose_data):
+        """Replace the configuration of an existing pose and save"""
+        self.pose_map[pose_id] = pose_data
+        self.matcher.set_pose_data(pose_id, pose_data)
+        self._compile_pose(pose_id)
+        self.save_poses()
+
+    def shutdown(self):
+        """Release held keys, stop the dispatcher thread and close the backend"""
+        self.release_all_keys()
+        self.dispatcher.stop()
+        self.backend.close()
 
     def release_all_keys(self):
         """Release all currently pressed keys"""
-        print("\n--- RELEASING ALL KEYS ---")
+        # Keys waiting for a sustained release are released now
+        for pose_id in list(self.release_handles):
+            self._cancel_release(pose_id, release_now=True)
+        
+        # Running macros are stopped
+        for pose_id in list(self.macro_handles):
+            self._cancel_macro(pose_id)
         
         # Create a copy of the currently pressed keys to avoid modifying the set during iteration
-        for key_combo in list(self.currently_pressed_keys):
-            try:
-                print(f"Releasing key combination: {key_combo}")
-                self.trigger_key(key_combo, release_only=True)
-            except Exception as e:
-                print(f"Error releasing key {key_combo}: {e}")
+        for key in list(self.currently_pressed_keys):
+            logger.debug("Releasing key %s", key)
+            self._release_single_key(key)
         
         # Clear the set of currently pressed keys
         self.currently_pressed_keys.clear()
+        
+        # Poses have to be entered again before they press anything
+        self.pose_states.reset()
+
+def compile_key_combo(key_combo, backend=None):
+    """Turn a combo like 'ctrl+shift+s' into a tuple of keys for an output backend
+    
+    Without a backend the key names are only checked and returned as-is.
+    'None' (used for poses without a binding) compiles to an empty tuple.
+    Raises ValueError if the combo is empty or contains an unknown key.
+    """
+    if key_combo.strip().lower() == 'none':
+        return ()
+    keys = []
+    for key in key_combo.split('+'):
+        key = key.strip().lower()
+        if len(key) == 0:
+            raise ValueError("Empty key in combination")
+        if backend is None:
+            check_key_name(key)
+            keys.append(key)
+        else:
+            keys.append(backend.resolve_key(key))
+    return tuple(keys)
+
+
+def compile_macro(macro, gap_ms=16, backend=None):
+    """Turn a macro like 'down, down+right, right+p' into a timeline
+    
+    Returns [(offset in seconds, [(action, key)])], one entry per step plus
+    a final release. Step i starts at i * gap_ms: keys the step shares with
+    the previous one stay held, the others are released and pressed. A step
+    that repeats the previous one is re-tapped, its keys being released half
+    a gap earlier. An empty macro compiles to an empty list.
+    """
+    if not macro.strip():
+        return []
+    steps = [compile_key_combo(step, backend) for step in macro.split(',')]
+    if any(len(step) == 0 for step in steps):
+        raise ValueError("Empty step in macro")
+    
+    gap = gap_ms / 1000.0
+    timeline = []
+    previous = ()
+    for i, step in enumerate(steps):
+        if step == previous:
+            timeline.append(((i - 0.5) * gap, [(RELEASE_KEY, key) for key in reversed(previous)]))
+            previous = ()
+        events = [(RELEASE_KEY, key) for key in reversed(previous) if key not in step]
+        events += [(PRESS_KEY, key) for key in step if key not in previous]
+        timeline.append((i * gap, events))
+        previous = step
+    timeline.append((len(steps) * gap, [(RELEASE_KEY, key) for key in reversed(previous)]))
+    return timeline
+
+
+def validate_macro(macro):
+    """Validate a macro sequence; an empty macro is valid (no macro)."""
+    try:
+        compile_macro(macro)
+        return True, "Valid macro"
+    except ValueError as e:
+        return False, str(e)
+
 
 def validate_keybind(keybind):
     """Validate the entered keybind to ensure it is supported."""
     try:
-        # Split the key combination
-        keys = keybind.split('+')
-        
-        # Check if all parts of the combination are valid
-        for key in keys:
-            key = key.strip().lower()
-            # We'll be very permissive here, just doing basic validation
-            if len(key) == 0:
-                return False, "Empty key in combination"
-                
+        compile_key_combo(keybind)
         return True, "Valid keybind"
+    except ValueError as e:
+        return False, str(e)
     except Exception as e:
         return False, f"Error validating keybind: {str(e)}"
-
@@ -0,0 +1,198 @@
+import logging
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from modules.landmarks import LandmarkFrame, NUM_LANDMARKS, LANDMARK_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# File layout: a 16-byte header, then one fixed-size record per landmark frame,
+# so a whole session can be opened with np.memmap without parsing anything
+MAGIC = b"MKLR"
+VERSION = 1
+_HEADER = struct.Struct('<4sHHHH4x')  # magic, version, landmarks, fields, record size
+HEADER_SIZE = _HEADER.size
+
+FLAG_POSE = 1  # Record holds landmarks; without it the pose was lost at that point
+
+RECORD_DTYPE = np.dtype([
+    ('seq', '<i8'),            # Camera frame sequence number (-1 for pose-lost records)
+    ('timestamp', '<f8'),      # perf_counter time the landmarks were ready
+    ('capture_time', '<f8'),   # perf_counter time the camera frame was captured
+    ('flags', '<u4'),
+    ('reserved', '<u4'),
+    ('data', '<f4', (NUM_LANDMARKS, LANDMARK_FIELDS))
+])
+
+EXTENSION = ".lmrec"
+
+
+class LandmarkRecorder:
+    """Streams every landmark frame published by a PoseDetector to a file.
+
+    on_landmarks is registered once as a landmark listener and runs on the
+    inference thread; while no file is open it returns right away. Each
+    frame is packed into a preallocated record and appended to a buffered
+    file, so recording costs one small write per frame.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file = None
+        self._record = np.zeros(1, dtype=RECORD_DTYPE)
+        self.path = None
+        self.frames_written = 0
+
+    @property
+    def recording(self):
+        return self._file is not None
+
+    def start(self, path):
+        """Start a new recording at path, ending any current one"""
+        self.stop()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        f = open(path, 'wb')
+        f.write(_HEADER.pack(MAGIC, VERSION, NUM_LANDMARKS, LANDMARK_FIELDS, RECORD_DTYPE.itemsize))
+        with self._lock:
+            self._file = f
+            self.path = path
+            self.frames_written = 0
+        logger.info("Recording landmarks to %s", path)
+
+    def stop(self):
+        with self._lock:
+            f, self._file = self._file, None
+        if f is not None:
+            f.close()
+            logger.info("Recorded %d landmark frames to %s", self.frames_written, self.path)
+
+    def on_landmarks(self, landmark_frame):
+        """Landmark listener: append a LandmarkFrame, or a pose-lost record for None"""
+        if self._file is None:
+            return
+        record = self._record[0]
+        if landmark_frame is not None:
+            record['seq'] = landmark_frame.seq
+            record['timestamp'] = landmark_frame.timestamp
+            record['capture_time'] = landmark_frame.capture_time
+            record['flags'] = FLAG_POSE
+            record['data'] = landmark_frame.data
+        else:
+            now = time.perf_counter()
+            record['seq'] = -1
+            record['timestamp'] = record['capture_time'] = now
+            record['flags'] = 0
+            record['data'] = 0.0
+        with self._lock:
+            if self._file is not None:
+                self._file.write(self._record.data)
+                self.frames_written += 1
+
+
+class LandmarkRecording:
+    """A recorded session, memory-mapped; records[i] is one frame (see RECORD_DTYPE)
+
+    A record cut short by a crash at the end of the file is ignored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            raise ValueError(f"{path} is not a landmark recording")
+        magic, version, landmarks, fields, record_size = _HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a landmark recording")
+        if version != VERSION or (landmarks, fields, record_size) != (NUM_LANDMARKS, LANDMARK_FIELDS, RECORD_DTYPE.itemsize):
+            raise ValueError(f"{path} has an unsupported format (version {version})")
+
+        count = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        if count:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def landmarks(self):
+        """(frames, 33, 4) landmarks of the records that have a pose"""
+        return self.records['data'][(self.records['flags'] & FLAG_POSE) != 0]
+
+    @property
+    def duration(self):
+        if len(self.records) < 2:
+            return 0.0
+        return float(self.records['timestamp'][-1] - self.records['timestamp'][0])
+
+    def frames(self):
+        """Yield a LandmarkFrame per record (None where the pose was lost), with recorded times
+
+        The frames' data are views into the file, not copies.
+        """
+        for record in self.records:
+            if record['flags'] & FLAG_POSE:
+                yield LandmarkFrame(record['data'], int(record['seq']), float(record['timestamp']),
+                                    float(record['capture_time']))
+            else:
+                yield None
+
+
+class LandmarkReplayThread(QThread):
+    """Feeds a recording back through a PoseDetector as if it came from the model.
+
+    Frames are published with PoseDetector.publish_landmark_array, so the
+    matching pipeline receives them exactly like live landmarks. With speed
+    1.0 the original frame timing is kept, 2.0 plays twice as fast, and 0
+    publishes as fast as possible.
+    """
+
+    finished_replay = pyqtSignal()
+
+    def __init__(self, pose_detector, recording, speed=1.0, loop=False):
+        super().__init__()
+        self.pose_detector = pose_detector
+        self.recording = recording if isinstance(recording, LandmarkRecording) else LandmarkRecording(recording)
+        self.speed = speed
+        self.loop = loop
+        self.running = False
+
+    def run(self):
+        self.running = True
+        records = self.recording.records
+        while self.running and len(records):
+            start = time.perf_counter()
+            first = float(records['timestamp'][0])
+            for i in range(len(records)):
+                if not self.running:
+                    break
+                record = records[i]
+                timestamp = float(record['timestamp'])
+                if self.speed > 0:
+                    delay = start + (timestamp - first) / self.speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+
+                if record['flags'] & FLAG_POSE:
+                    # Keep the recorded inference latency, shifted to now
+                    now = time.perf_counter()
+                    capture_time = now - (timestamp - float(record['capture_time']))
+                    self.pose_detector.publish_landmark_array(record['data'], int(record['seq']), capture_time)
+                else:
+                    self.pose_detector.publish_landmark_array(None)
+            if not self.loop:
+                break
+        self.running = False
+        self.finished_replay.emit()
+
+    def stop(self):
+        self.running = False
+        self.wait()
@@ -0,0 +1,34 @@
+import numpy as np
+
+NUM_LANDMARKS = 33
+LANDMARK_FIELDS = 4  # x, y, z, visibility
+X, Y, Z, VISIBILITY = range(LANDMARK_FIELDS)
+
+# MediaPipe landmarks 0-10 are facial landmarks, which the app ignores
+FIRST_BODY_LANDMARK = 11
+
+
+class LandmarkFrame:
+    """Landmarks of one detected pose, stored in a single (33, 4) float32 array.
+
+    Rows are MediaPipe landmark indices, columns are x, y, z and visibility.
+    Facial landmarks are kept in place (so indices stay MediaPipe's) with
+    their visibility forced to 0.
+    """
+
+    __slots__ = ('data', 'seq', 'timestamp', 'capture_time')
+
+    def __init__(self, data=None, seq=0, timestamp=0.0, capture_time=0.0):
+        if data is None:
+            data = np.zeros((NUM_LANDMARKS, LANDMARK_FIELDS), dtype=np.float32)
+        self.data = data
+        self.seq = seq                    # Camera frame sequence number
+        self.timestamp = timestamp        # perf_counter time the landmarks were ready
+        self.capture_time = capture_time  # perf_counter time the camera frame was captured
+
+    def copy(self):
+        return LandmarkFrame(self.data.copy(), self.seq, self.timestamp, self.capture_time)
+
+    def __repr__(self):
+        return f"LandmarkFrame(seq={self.seq}, timestamp={self.timestamp:.4f})"
+
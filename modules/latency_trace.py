@@ -0,0 +1,95 @@
+import csv
+import threading
+
+import numpy as np
+
+# Stages of a camera frame's way to a key press, in order
+STAGES = ("queue", "inference", "delivery", "signature", "matching", "output", "total")
+QUEUE, INFERENCE, DELIVERY, SIGNATURE, MATCHING, OUTPUT, TOTAL = range(len(STAGES))
+# queue:     capture -> inference starts (time spent waiting in the FrameMailbox)
+# inference: MediaPipe (in this process or the inference process)
+# delivery:  landmarks published -> GUI thread receives them
+# signature: building the PoseSignature
+# matching:  PoseMatcher and pose state machines
+# output:    key event queued -> injected by the output backend
+# total:     capture -> first key injected
+
+
+class LatencyTracer:
+    """Per-frame stage durations, kept in a fixed-size ring.
+
+    Every stage is recorded against the camera frame's sequence number, on
+    whichever thread runs it; row seq % size holds the most recent frame
+    with that residue. Recording is a couple of array writes, and nothing
+    at all while disabled.
+    """
+
+    def __init__(self, size=4096):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._allocate(size)
+
+    def _allocate(self, size):
+        self._seqs = np.full(size, -1, dtype=np.int64)
+        self._durations = np.full((size, len(STAGES)), np.nan, dtype=np.float64)
+
+    def configure(self, enabled, size=None):
+        with self._lock:
+            if size is not None and size != len(self._seqs):
+                self._allocate(size)
+            self.enabled = enabled
+
+    def record(self, seq, stage, duration_ms):
+        """Store a stage duration (ms) of frame seq; only the first value per stage is kept"""
+        if not self.enabled:
+            return
+        with self._lock:
+            row = seq % len(self._seqs)
+            if self._seqs[row] != seq:
+                self._seqs[row] = seq
+                self._durations[row] = np.nan
+            if np.isnan(self._durations[row, stage]):
+                self._durations[row, stage] = duration_ms
+
+    def stats(self):
+        """{stage: {count, p50, p95, p99, max}} over the frames in the ring, in ms"""
+        with self._lock:
+            durations = self._durations[self._seqs >= 0]
+        result = {}
+        for stage, name in enumerate(STAGES):
+            values = durations[:, stage]
+            values = values[~np.isnan(values)]
+            if len(values) == 0:
+                result[name] = {"count": 0}
+                continue
+            p50, p95, p99 = np.percentile(values, (50, 95, 99))
+            result[name] = {
+                "count": len(values),
+                "p50": float(p50),
+                "p95": float(p95),
+                "p99": float(p99),
+                "max": float(values.max())
+            }
+        return result
+
+    def dump_csv(self, path):
+        """Write one row per traced frame (seq, then every stage in ms; empty if not reached)"""
+        with self._lock:
+            valid = self._seqs >= 0
+            seqs = self._seqs[valid]
+            durations = self._durations[valid]
+        order = np.argsort(seqs)
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(("seq",) + STAGES)
+            for i in order:
+                writer.writerow([int(seqs[i])] + ["" if np.isnan(value) else f"{value:.3f}" for value in durations[i]])
+
+    def clear(self):
+        with self._lock:
+            self._seqs[:] = -1
+            self._durations[:] = np.nan
+
+
+# Shared by the camera, inference, matching and output threads
+tracer = LatencyTracer()
@@ -0,0 +1,120 @@
+import collections
+import logging
+import sys
+
+# Loggers of this app are named after their module (logging.getLogger(__name__)),
+# so per-module levels can be set with names like "modules.keyboard_mapper"
+APP_LOGGERS = ("modules", "ui", "__main__")
+
+FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+logger = logging.getLogger(__name__)
+
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the most recent log records in memory.
+
+    Records are stored as they are and only formatted when dumped, so
+    keeping debug detail around costs a deque append per message.
+    """
+
+    def __init__(self, capacity=10000, level=logging.DEBUG):
+        super().__init__(level)
+        self.records = collections.deque(maxlen=capacity)
+        self.setFormatter(logging.Formatter(FORMAT))
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def lines(self):
+        """Formatted records, oldest first"""
+        # emit() runs under the handler lock, so this snapshot is consistent
+        with self.lock:
+            records = list(self.records)
+        return [self.format(record) for record in records]
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for line in self.lines():
+                f.write(line + "\n")
+
+
+class _ModuleLevelFilter(logging.Filter):
+    """Passes a record if it reaches the level of the most specific configured module"""
+
+    def __init__(self, default_level, module_levels):
+        super().__init__()
+        self.default_level = default_level
+        self.module_levels = module_levels
+        self._cache = {}
+
+    def level_for(self, name):
+        level = self._cache.get(name)
+        if level is None:
+            level = self.default_level
+            best = -1
+            for module, module_level in self.module_levels.items():
+                if (name == module or name.startswith(module + ".")) and len(module) > best:
+                    level, best = module_level, len(module)
+            self._cache[name] = level
+        return level
+
+    def filter(self, record):
+        return record.levelno >= self.level_for(record.name)
+
+
+# Set by configure_logging() when the ring buffer is enabled
+ring_buffer = None
+
+
+def _level(name, invalid):
+    """Numeric level of a level name; unknown names give INFO and are appended to invalid"""
+    level = logging.getLevelName(str(name).upper())
+    if not isinstance(level, int):
+        # getLevelName() returns "Level FOO" for names it doesn't know
+        invalid.append(name)
+        return logging.INFO
+    return level
+
+
+def configure_logging(log_settings):
+    """Set up console output, per-module levels and the optional ring buffer
+
+    The console shows records at log_settings["level"] and above, or at the
+    level given for their module in log_settings["levels"]. With ring_buffer
+    set to a capacity, records down to ring_level are also kept in memory.
+    Loggers are set to the lowest level anything listens to, so disabled
+    debug calls return right away without formatting anything.
+    """
+    global ring_buffer
+
+    invalid = []
+    console_level = _level(log_settings["level"], invalid)
+    module_levels = {name: _level(level, invalid) for name, level in log_settings.get("levels", {}).items()}
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter(FORMAT))
+    console.addFilter(_ModuleLevelFilter(console_level, module_levels))
+    handlers = [console]
+
+    ring_buffer = None
+    ring_level = logging.CRITICAL + 1
+    if log_settings.get("ring_buffer"):
+        ring_level = _level(log_settings["ring_level"], invalid)
+        ring_buffer = RingBufferHandler(log_settings["ring_buffer"], ring_level)
+        handlers.append(ring_buffer)
+
+    for name in APP_LOGGERS:
+        app_logger = logging.getLogger(name)
+        for handler in list(app_logger.handlers):
+            app_logger.removeHandler(handler)
+        for handler in handlers:
+            app_logger.addHandler(handler)
+        app_logger.setLevel(min(console_level, ring_level))
+        app_logger.propagate = False
+
+    for name, level in module_levels.items():
+        logging.getLogger(name).setLevel(min(level, ring_level))
+
+    for name in invalid:
+        logger.warning("Unknown log level '%s', using INFO", name)
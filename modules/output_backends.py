@@ -0,0 +1,237 @@
+import abc
+import sys
+import threading
+import time
+
+# Named keys usable in key combos, with their Linux input event codes
+EVDEV_KEY_NAMES = {
+    'alt': 'KEY_LEFTALT', 'alt_l': 'KEY_LEFTALT', 'alt_r': 'KEY_RIGHTALT', 'alt_gr': 'KEY_RIGHTALT',
+    'ctrl': 'KEY_LEFTCTRL', 'ctrl_l': 'KEY_LEFTCTRL', 'ctrl_r': 'KEY_RIGHTCTRL',
+    'shift': 'KEY_LEFTSHIFT', 'shift_l': 'KEY_LEFTSHIFT', 'shift_r': 'KEY_RIGHTSHIFT',
+    'cmd': 'KEY_LEFTMETA', 'cmd_l': 'KEY_LEFTMETA', 'cmd_r': 'KEY_RIGHTMETA',
+    'space': 'KEY_SPACE', 'enter': 'KEY_ENTER', 'tab': 'KEY_TAB', 'esc': 'KEY_ESC',
+    'backspace': 'KEY_BACKSPACE', 'delete': 'KEY_DELETE', 'insert': 'KEY_INSERT',
+    'home': 'KEY_HOME', 'end': 'KEY_END', 'page_up': 'KEY_PAGEUP', 'page_down': 'KEY_PAGEDOWN',
+    'up': 'KEY_UP', 'down': 'KEY_DOWN', 'left': 'KEY_LEFT', 'right': 'KEY_RIGHT',
+    'caps_lock': 'KEY_CAPSLOCK', 'num_lock': 'KEY_NUMLOCK', 'scroll_lock': 'KEY_SCROLLLOCK',
+    'print_screen': 'KEY_SYSRQ', 'pause': 'KEY_PAUSE', 'menu': 'KEY_COMPOSE',
+    'media_play_pause': 'KEY_PLAYPAUSE', 'media_next': 'KEY_NEXTSONG',
+    'media_previous': 'KEY_PREVIOUSSONG', 'media_volume_up': 'KEY_VOLUMEUP',
+    'media_volume_down': 'KEY_VOLUMEDOWN', 'media_volume_mute': 'KEY_MUTE',
+}
+
+# Characters on an unshifted US layout that have their own evdev key
+_EVDEV_CHARS = {
+    '-': 'KEY_MINUS', '=': 'KEY_EQUAL', '[': 'KEY_LEFTBRACE', ']': 'KEY_RIGHTBRACE',
+    ';': 'KEY_SEMICOLON', "'": 'KEY_APOSTROPHE', '`': 'KEY_GRAVE', '\\': 'KEY_BACKSLASH',
+    ',': 'KEY_COMMA', '.': 'KEY_DOT', '/': 'KEY_SLASH', ' ': 'KEY_SPACE',
+}
+
+# Virtual key codes of numpad 0-9, per platform
+if sys.platform == 'win32':
+    _NUMPAD_KEYCODES = [0x60 + n for n in range(10)]       # VK_NUMPAD0..9
+elif sys.platform == 'darwin':
+    _NUMPAD_KEYCODES = [82, 83, 84, 85, 86, 87, 88, 89, 91, 92]
+else:
+    _NUMPAD_KEYCODES = [0xFFB0 + n for n in range(10)]     # XK_KP_0..9
+
+
+def check_key_name(key):
+    """Raise ValueError unless key is a key name this app can bind"""
+    if len(key) == 1:
+        return
+    if key.startswith('num') and key[3:].isdigit():
+        if int(key[3:]) > 9:
+            raise ValueError(f"Unknown numpad key '{key}'")
+        return
+    if key.startswith('f') and key[1:].isdigit():
+        if not 1 <= int(key[1:]) <= 24:
+            raise ValueError(f"Function key '{key}' out of range (f1-f24)")
+        return
+    if key not in EVDEV_KEY_NAMES:
+        raise ValueError(f"Unknown key '{key}'")
+
+
+class OutputBackend(abc.ABC):
+    """Where key events end up.
+
+    resolve_key() turns a key name into whatever object press()/release()
+    take; it runs when combos are compiled, never on the hot path.
+    press()/release()/move_mouse()/scroll() are only called from the
+    KeyDispatcher thread.
+    """
+
+    name = None
+
+    def resolve_key(self, key):
+        check_key_name(key)
+        return key
+
+    @abc.abstractmethod
+    def press(self, key):
+        pass
+
+    @abc.abstractmethod
+    def release(self, key):
+        pass
+
+    @abc.abstractmethod
+    def move_mouse(self, dx, dy):
+        pass
+
+    @abc.abstractmethod
+    def scroll(self, dx, dy):
+        pass
+
+    def close(self):
+        pass
+
+
+class PynputBackend(OutputBackend):
+    """Injects keys through pynput (X11, Windows, macOS)"""
+
+    name = "pynput"
+
+    def __init__(self):
+        from pynput import mouse
+        from pynput.keyboard import Controller, Key, KeyCode
+        self._key = Key
+        self._key_code = KeyCode
+        self.keyboard = Controller()
+        self.mouse = mouse.Controller()
+
+    def resolve_key(self, key):
+        check_key_name(key)
+        if len(key) == 1:
+            return key
+        if key.startswith('num'):
+            return self._key_code.from_vk(_NUMPAD_KEYCODES[int(key[3:])])
+        if key not in self._key.__members__:
+            raise ValueError(f"Key '{key}' is not available on this platform")
+        return self._key[key]
+
+    def press(self, key):
+        self.keyboard.press(key)
+
+    def release(self, key):
+        self.keyboard.release(key)
+
+    def move_mouse(self, dx, dy):
+        self.mouse.move(dx, dy)
+
+    def scroll(self, dx, dy):
+        self.mouse.scroll(dx, dy)
+
+
+class UInputBackend(OutputBackend):
+    """Linux virtual keyboard on /dev/uinput (needs python-evdev and write access)
+
+    Events go straight to the kernel input layer, skipping the X server
+    round trip pynput makes, and also work under Wayland.
+    """
+
+    name = "uinput"
+
+    def __init__(self, device_name="motion-keybind"):
+        from evdev import UInput, ecodes
+        self._ecodes = ecodes
+        # Every key plus relative axes, so the device also works as a mouse
+        self._ui = UInput({
+            ecodes.EV_KEY: list(ecodes.keys.keys()),
+            ecodes.EV_REL: [ecodes.REL_X, ecodes.REL_Y, ecodes.REL_WHEEL, ecodes.REL_HWHEEL]
+        }, name=device_name)
+
+    def resolve_key(self, key):
+        check_key_name(key)
+        if len(key) == 1:
+            if key.isalnum() and key.isascii():
+                code_name = f"KEY_{key.upper()}"
+            elif key in _EVDEV_CHARS:
+                code_name = _EVDEV_CHARS[key]
+            else:
+                raise ValueError(f"Character '{key}' needs shift; bind it as a combo with shift instead")
+        elif key.startswith('num'):
+            code_name = f"KEY_KP{key[3:]}"
+        elif key.startswith('f') and key[1:].isdigit():
+            code_name = f"KEY_{key.upper()}"
+        else:
+            code_name = EVDEV_KEY_NAMES[key]
+        return getattr(self._ecodes, code_name)
+
+    def press(self, key):
+        self._ui.write(self._ecodes.EV_KEY, key, 1)
+        self._ui.syn()
+
+    def release(self, key):
+        self._ui.write(self._ecodes.EV_KEY, key, 0)
+        self._ui.syn()
+
+    def move_mouse(self, dx, dy):
+        if dx:
+            self._ui.write(self._ecodes.EV_REL, self._ecodes.REL_X, dx)
+        if dy:
+            self._ui.write(self._ecodes.EV_REL, self._ecodes.REL_Y, dy)
+        self._ui.syn()
+
+    def scroll(self, dx, dy):
+        if dx:
+            self._ui.write(self._ecodes.EV_REL, self._ecodes.REL_HWHEEL, dx)
+        if dy:
+            self._ui.write(self._ecodes.EV_REL, self._ecodes.REL_WHEEL, dy)
+        self._ui.syn()
+
+    def close(self):
+        self._ui.close()
+
+
+class RecordingBackend(OutputBackend):
+    """Keeps key events in memory instead of injecting them
+
+    Every event is stored as (perf_counter time, action, key name), or
+    (time, "move"/"scroll", (dx, dy)) for pointer motion, so timing and
+    correctness can be checked headless, without a display. Times come from
+    clock, which tests can replace with the dispatcher's fake clock.
+    """
+
+    name = "recording"
+
+    def __init__(self, clock=time.perf_counter):
+        self._lock = threading.Lock()
+        self.clock = clock
+        self.events = []
+
+    def press(self, key):
+        with self._lock:
+            self.events.append((self.clock(), "press", key))
+
+    def release(self, key):
+        with self._lock:
+            self.events.append((self.clock(), "release", key))
+
+    def move_mouse(self, dx, dy):
+        with self._lock:
+            self.events.append((self.clock(), "move", (dx, dy)))
+
+    def scroll(self, dx, dy):
+        with self._lock:
+            self.events.append((self.clock(), "scroll", (dx, dy)))
+
+    def take_events(self):
+        """Return and forget the events recorded so far"""
+        with self._lock:
+            events, self.events = self.events, []
+        return events
+
+
+BACKENDS = {
+    PynputBackend.name: PynputBackend,
+    UInputBackend.name: UInputBackend,
+    RecordingBackend.name: RecordingBackend,
+}
+
+
+def create_backend(name):
+    """Create an output backend by name; raises ValueError for unknown names"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown output backend '{name}' (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
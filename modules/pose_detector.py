@@ -1,13 +1,36 @@
+import logging
+import time
+
 import cv2
 import mediapipe as mp
 import numpy as np
 from PyQt5.QtCore import QObject, pyqtSignal
 
+from modules.frame_mailbox import FrameBufferPool
+from modules.landmarks import LandmarkFrame, FIRST_BODY_LANDMARK, VISIBILITY
+from modules.latency_trace import tracer, QUEUE, INFERENCE
+from modules.pose_signature import PoseSignature, build_signature, signature_similarity
+
+logger = logging.getLogger(__name__)
+
+# Model settings shared by in-process and out-of-process inference
+POSE_OPTIONS = {
+    'min_detection_confidence': 0.5,
+    'min_tracking_confidence': 0.5,
+    'model_complexity': 1,  # Use a more accurate model
+    'smooth_landmarks': True
+}
+
+# Colours of drawn landmarks, in RGB
+LANDMARK_COLOR = (255, 0, 0)
+CONNECTION_COLOR = (224, 224, 224)
+
 class PoseDetector(QObject):
-    pose_detected = pyqtSignal(dict)
+    pose_detected = pyqtSignal(object)  # LandmarkFrame
+    pose_lost = pyqtSignal()  # Emitted once when a previously detected pose disappears
     processed_frame = pyqtSignal(np.ndarray)
     
-    def __init__(self):
+    def __init__(self, load_model=True):
         super().__init__()
         self.mp_pose = mp.solutions.pose
         self.mp_drawing = mp.solutions.drawing_utils
@@ -18,81 +41,174 @@ class PoseDetector(QObject):
             connection for connection in self.mp_pose.POSE_CONNECTIONS 
             if not (connection[0] < 11 and connection[1] < 11)  # Exclude face connections
         ]
+        # Connections between body landmarks only (0-10 are facial landmarks)
+        self.body_connections = [
+            connection for connection in self.mp_pose.POSE_CONNECTIONS 
+            if connection[0] >= 11 and connection[1] >= 11
+        ]
         
         # Create custom drawing spec
         self.custom_drawing_spec = self.mp_drawing_styles.get_default_pose_landmarks_style()
-        
-        self.pose = self.mp_pose.Pose(
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5,
-            model_complexity=1,  # Use a more accurate model
-            smooth_landmarks=True
-        )
-        self.current_landmarks = None
+        # Landmarks are drawn on the RGB display frame: MediaPipe's default red, in RGB order
+        self.landmark_drawing_spec = self.mp_drawing.DrawingSpec(color=LANDMARK_COLOR)
+        
+        # The MediaPipe graph is only needed when inference runs in this process
+        self.pose = self.mp_pose.Pose(**POSE_OPTIONS) if load_model else None
+        # Every published LandmarkFrame is a new one that is never written again:
+        # pose_detected is queued to the GUI thread, which may read a frame long
+        # after the next one arrived. The latest is published by swapping a single
+        # reference, so readers on other threads always see a complete snapshot.
+        self._landmarks = None
+        self._seq = 0
+        # Called with every published LandmarkFrame (None when the pose is lost)
+        # on the inference thread, for consumers that can't wait for the GUI thread
+        self._landmark_listeners = []
         self.draw_landmarks = True
+        self.inference_ms = 0.0  # Model time of the latest frame
+        # Every frame is converted to RGB once, into one of these buffers; the
+        # model reads it, landmarks are drawn on it, and it is emitted for display
+        self._rgb_buffers = FrameBufferPool()
+    
+    @property
+    def current_landmarks(self):
+        """LandmarkFrame of the most recently detected pose (or None)"""
+        return self._landmarks
+    
+    def close(self):
+        """Release the MediaPipe graph"""
+        if self.pose is not None:
+            self.pose.close()
+            self.pose = None
        
-    def process_frame(self, frame):
-        # Convert to RGB for MediaPipe
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.pose.process(rgb_frame)
+    def process_frame(self, frame, seq=None, capture_time=None):
+        """Run the model on a BGR frame and publish its landmarks
         
-        # Draw pose landmarks on the frame only if drawing is enabled
-        annotated_frame = frame.copy()
-        if results.pose_landmarks and self.draw_landmarks:
-            # Create a custom connection list excluding facial landmarks
-            connections = [
-                connection for connection in self.mp_pose.POSE_CONNECTIONS 
-                if connection[0] >= 11 and connection[1] >= 11  # Skip facial landmarks (0-10)
-            ]
-            
-            # Create a custom landmark list excluding facial landmarks
+        seq and capture_time (perf_counter) identify the camera frame for
+        latency tracing; without them the detector numbers frames itself.
+        """
+        start = time.perf_counter()
+        if seq is not None:
+            tracer.record(seq, QUEUE, (start - capture_time) * 1000.0)
+        
+        # Convert to RGB for MediaPipe, into a reused buffer. Marked read-only,
+        # MediaPipe uses it in place instead of copying it.
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb_buffers.acquire(frame.shape))
+        rgb_frame.flags.writeable = False
+        results = self.pose.process(rgb_frame)
+        rgb_frame.flags.writeable = True
+        self.inference_ms = (time.perf_counter() - start) * 1000.0
+        if seq is not None:
+            tracer.record(seq, INFERENCE, self.inference_ms)
+        
+        # Nothing is drawn or emitted when no display is connected
+        display = self.receivers(self.processed_frame) > 0
+        if results.pose_landmarks:
             landmarks_proto = results.pose_landmarks
-            for i in range(11):  # Set visibility of facial landmarks to 0
-                if i < len(landmarks_proto.landmark):
-                    landmarks_proto.landmark[i].visibility = 0
+            landmark_frame = self._next_landmark_frame(seq, capture_time)
+            data = landmark_frame.data
+            for idx, landmark in enumerate(landmarks_proto.landmark):
+                data[idx] = (landmark.x, landmark.y, landmark.z, landmark.visibility)
+            # Exclude facial landmarks
+            data[:FIRST_BODY_LANDMARK, VISIBILITY] = 0
             
-            # Draw only body landmarks
-            self.mp_drawing.draw_landmarks(
-                annotated_frame, 
-                landmarks_proto,
-                connections
-            )
-            
-            # Extract landmark positions (excluding face landmarks)
-            landmarks = {}
-            for idx, landmark in enumerate(results.pose_landmarks.landmark):
-                if idx >= 11:  # Only include body landmarks
-                    landmarks[idx] = {
-                        'x': landmark.x,
-                        'y': landmark.y,
-                        'z': landmark.z,
-                        'visibility': landmark.visibility
-                    }
+            self._publish(landmark_frame)
             
-            self.current_landmarks = landmarks
-            # Emit the landmarks
-            self.pose_detected.emit(landmarks)
-        elif results.pose_landmarks and not self.draw_landmarks:
-            # Still extract landmarks but don't draw them
-            landmarks = {}
-            for idx, landmark in enumerate(results.pose_landmarks.landmark):
-                if idx >= 11:  # Skip facial landmarks
-                    landmarks[idx] = {
-                        'x': landmark.x,
-                        'y': landmark.y,
-                        'z': landmark.z,
-                        'visibility': landmark.visibility
-                    }
-            
-            self.current_landmarks = landmarks
-            # Emit the landmarks
-            self.pose_detected.emit(landmarks)
+            # Draw pose landmarks on the frame only if drawing is enabled
+            if display and self.draw_landmarks:
+                # Set visibility of facial landmarks to 0 so they are not drawn
+                for i in range(min(FIRST_BODY_LANDMARK, len(landmarks_proto.landmark))):
+                    landmarks_proto.landmark[i].visibility = 0
+                
+                # Draw only body landmarks
+                self.mp_drawing.draw_landmarks(
+                    rgb_frame, 
+                    landmarks_proto,
+                    self.body_connections,
+                    self.landmark_drawing_spec
+                )
+        else:
+            self._publish_lost()
+        
+        # Emit the processed frame (already RGB for displaying in PyQt)
+        if display:
+            self.processed_frame.emit(rgb_frame)
+
+    def process_landmark_array(self, frame, landmark_array, seq=None, capture_time=None):
+        """Publish landmarks computed outside this detector (e.g. by the inference process)
+        
+        Args:
+            frame: The BGR camera frame the landmarks belong to
+            landmark_array: (33, 4) array of x, y, z, visibility, or None if no pose was found
+            seq, capture_time: Camera frame sequence number and capture time, if known
+        """
+        landmark_frame = self.publish_landmark_array(landmark_array, seq, capture_time)
+        if self.receivers(self.processed_frame) == 0:
+            return
+        
+        # Convert to RGB for displaying in PyQt, into a reused buffer, and draw on that
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb_buffers.acquire(frame.shape))
+        if landmark_frame is not None and self.draw_landmarks:
+            self._draw_landmark_array(rgb_frame, landmark_frame.data)
+        self.processed_frame.emit(rgb_frame)
+    
+    def publish_landmark_array(self, landmark_array, seq=None, capture_time=None):
+        """Publish a (33, 4) landmark array that has no camera image (e.g. a recording)
+        
+        None means no pose was found. Returns the published LandmarkFrame, or None.
+        """
+        if landmark_array is None:
+            self._publish_lost()
+            return None
+        landmark_frame = self._next_landmark_frame(seq, capture_time)
+        np.copyto(landmark_frame.data, landmark_array)
+        landmark_frame.data[:FIRST_BODY_LANDMARK, VISIBILITY] = 0
+        self._publish(landmark_frame)
+        return landmark_frame
+    
+    def _next_landmark_frame(self, seq=None, capture_time=None):
+        """Allocate a landmark frame (528 bytes) owned by its consumers and stamp it"""
+        landmark_frame = LandmarkFrame()
+        now = time.perf_counter()
+        if seq is None:
+            self._seq += 1
+            seq, capture_time = self._seq, now
+        landmark_frame.seq = seq
+        landmark_frame.timestamp = now
+        landmark_frame.capture_time = capture_time
+        return landmark_frame
+    
+    def add_landmark_listener(self, listener):
+        """Call listener(landmark_frame) directly on the inference thread for every frame"""
+        self._landmark_listeners.append(listener)
+    
+    def _publish(self, landmark_frame):
+        """Make a filled landmark frame the current snapshot and emit it"""
+        self._landmarks = landmark_frame
+        for listener in self._landmark_listeners:
+            listener(landmark_frame)
+        self.pose_detected.emit(landmark_frame)
+    
+    def _publish_lost(self):
+        """Clear the snapshot when the pose disappears, notifying consumers once"""
+        if self._landmarks is not None:
+            self._landmarks = None
+            for listener in self._landmark_listeners:
+                listener(None)
+            self.pose_lost.emit()
+    
+    def _draw_landmark_array(self, frame, landmark_array):
+        """Draw body landmarks and connections on an RGB frame, matching MediaPipe's default style"""
+        h, w = frame.shape[:2]
+        points = (landmark_array[:, :2] * (w, h)).astype(np.int32)
+        visible = landmark_array[:, VISIBILITY] > 0.5
         
-        # Convert back to RGB for displaying in PyQt
-        annotated_frame_rgb = cv2.cvtColor(annotated_frame, cv2.COLOR_BGR2RGB)
+        for start, end in self.body_connections:
+            if visible[start] and visible[end]:
+                cv2.line(frame, tuple(points[start]), tuple(points[end]), CONNECTION_COLOR, 2)
         
-        # Emit the processed frame
-        self.processed_frame.emit(annotated_frame_rgb)
+        for idx in range(FIRST_BODY_LANDMARK, len(points)):
+            if visible[idx]:
+                cv2.circle(frame, tuple(points[idx]), 3, LANDMARK_COLOR, -1)
 
     def set_draw_landmarks(self, draw):
         """Set whether to draw landmarks on the frame"""
@@ -100,150 +216,32 @@ class PoseDetector(QObject):
 
     # Replace these two methods in your PoseDetector class
 
-    def get_current_pose_signature(self):
-        """Generate a comprehensive pose signature using multiple body regions"""
-        if not self.current_landmarks:
-            return None
+    def get_current_pose_signature(self, landmarks=None):
+        """Generate a fixed-slot pose signature using multiple body regions
         
-        # Define key body regions with their corresponding landmark indices
-        body_regions = {
-            'shoulders': [11, 12],  # Left and right shoulders
-            'torso': [23, 24, 11, 12],  # Left and right hip, left and right shoulder
-            'arms': [13, 14, 15, 16],  # Left and right elbows, wrists
-            'hands': [15, 16, 19, 20],  # Wrists and hand landmarks
-            'legs': [23, 24, 25, 26],  # Left and right hip, knee
-            'feet': [27, 28, 31, 32]   # Left and right ankle, heel
-        }
-        
-        # Collect valid landmarks
-        valid_points = []
-        
-        # Check for shoulders (reference points)
-        if 11 not in self.current_landmarks or 12 not in self.current_landmarks:
-            print("Shoulders not clearly visible")
-            return None
-        
-        # Calculate body center and scale using shoulders
-        left_shoulder = (self.current_landmarks[11]['x'], self.current_landmarks[11]['y'])
-        right_shoulder = (self.current_landmarks[12]['x'], self.current_landmarks[12]['y'])
-        
-        center_x = (left_shoulder[0] + right_shoulder[0]) / 2
-        center_y = (left_shoulder[1] + right_shoulder[1]) / 2
-        shoulder_width = np.sqrt((left_shoulder[0] - right_shoulder[0])**2 + 
-                                (left_shoulder[1] - right_shoulder[1])**2)
-        
-        # Collect landmarks from all body regions with sufficient visibility
-        signature = []
-        total_landmarks_used = 0
-        
-        for region, landmarks in body_regions.items():
-            region_points = []
-            for landmark_id in landmarks:
-                if (landmark_id in self.current_landmarks and 
-                    self.current_landmarks[landmark_id]['visibility'] > 0.5):
-                    point = (self.current_landmarks[landmark_id]['x'], 
-                            self.current_landmarks[landmark_id]['y'])
-                    
-                    # Normalize relative to body center and scale
-                    norm_x = (point[0] - center_x) / shoulder_width
-                    norm_y = (point[1] - center_y) / shoulder_width
-                    
-                    region_points.append((norm_x, norm_y))
-            
-            # If we have at least half the landmarks for a region, include it
-            if len(region_points) >= len(landmarks) / 2:
-                signature.extend(region_points)
-                total_landmarks_used += len(region_points)
-        
-        # Ensure we have a meaningful number of points
-        if total_landmarks_used < 10:
-            print(f"Not enough landmarks detected: {total_landmarks_used}")
+        Uses the given LandmarkFrame, or the latest published one if omitted.
+        Returns a PoseSignature, or None if not enough of the body is visible.
+        """
+        if landmarks is None:
+            landmarks = self.current_landmarks
+        if landmarks is None:
             return None
         
-        print(f"Created comprehensive pose signature with {total_landmarks_used} points")
+        signature = build_signature(landmarks.data)
+        if signature is None:
+            logger.debug("Not enough landmarks detected for a pose signature")
         return signature
 
     def compare_poses(self, pose1, pose2):
-        """Enhanced pose comparison with more sophisticated similarity calculation"""
-        # Basic validation
+        """Similarity in [0, 1] of two PoseSignatures, using only slots visible in both"""
         if pose1 is None or pose2 is None:
-            print("Cannot compare: One or both pose signatures are None")
-            return 0.0
-        
-        if not isinstance(pose1, list) or not isinstance(pose2, list):
-            print(f"Type error: pose1 is {type(pose1)}, pose2 is {type(pose2)}")
-            return 0.0
-        
-        if len(pose1) == 0 or len(pose2) == 0:
-            print("Cannot compare: Empty pose signatures")
             return 0.0
         
-        # Account for different numbers of points
-        common_len = min(len(pose1), len(pose2))
-        
-        # Calculate distances between points with region-based weighting
-        total_dist = 0.0
-        valid_points = 0
-        weighted_dist = 0.0
-        
-        # Define region weights (you can adjust these)
-        region_weights = {
-            0: 1.0,  # First points (e.g., shoulders)
-            1: 1.0,
-            2: 1.2,  # Torso points might be more important
-            3: 1.2,
-            4: 1.1,  # Arms slightly less critical
-            5: 1.1,
-            6: 0.9,  # Hands and extremities less critical
-            7: 0.9
-        }
-        
-        for i in range(common_len):
-            try:
-                p1 = pose1[i]
-                p2 = pose2[i]
-                
-                # Skip invalid points
-                if len(p1) != 2 or len(p2) != 2:
-                    continue
-                    
-                # Calculate Euclidean distance
-                dist = np.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
-                
-                # Apply region-based weighting
-                weight = region_weights.get(i, 1.0)
-                weighted_dist += dist * weight
-                
-                total_dist += dist
-                valid_points += 1
-            except Exception as e:
-                print(f"Error comparing point {i}: {str(e)}")
-                continue
-        
-        # Check if we have any valid comparisons
-        if valid_points == 0:
+        if not isinstance(pose1, PoseSignature) or not isinstance(pose2, PoseSignature):
+            logger.error("Type error: pose1 is %s, pose2 is %s", type(pose1), type(pose2))
             return 0.0
         
-        # Calculate average distances
-        avg_dist = total_dist / valid_points
-        avg_weighted_dist = weighted_dist / valid_points
-        
-        # More sophisticated similarity calculation
-        # Prioritize lower distances and apply a non-linear transformation
-        similarity = 1.0 / (1.0 + 4.0 * avg_weighted_dist)
-        
-        # Apply a curve to enhance similarities
-        if similarity > 0.6:
-            similarity = 0.6 + (similarity - 0.6) * 1.5
-            similarity = min(similarity, 1.0)
-        
-        print(f"Pose comparison:")
-        print(f"  Total points: {valid_points}")
-        print(f"  Average distance: {avg_dist:.4f}")
-        print(f"  Weighted distance: {avg_weighted_dist:.4f}")
-        print(f"  Similarity: {similarity:.4f}")
-        
-        return similarity
+        return signature_similarity(pose1, pose2)
     
     def visualize_pose_signature(frame, signature, color=(0, 255, 0), thickness=2):
         """
@@ -258,7 +256,7 @@ class PoseDetector(QObject):
         Returns:
             The frame with visualization drawn on it
         """
-        if not signature:
+        if signature is None:
             return frame
         
         # Get frame dimensions
@@ -272,8 +270,11 @@ class PoseDetector(QObject):
         # Normalized coordinates are usually very small
         scale = min(w, h) // 3
         
-        # Draw each point in the signature
-        for i, (norm_x, norm_y) in enumerate(signature):
+        # Draw each visible slot of the signature
+        for i, (norm_x, norm_y) in enumerate(signature.points.tolist()):
+            if not signature.mask[i]:
+                continue
+
             # Convert normalized coordinates to pixel coordinates
             px = int(center_x + norm_x * scale)
             py = int(center_y + norm_y * scale)
@@ -312,13 +313,13 @@ class PoseDetector(QObject):
         # Import the function from the global scope
         from modules.pose_detector import visualize_pose_signature
         # Draw the signature on the frame
-        if signature:
+        if signature is not None:
             debug_frame = visualize_pose_signature(debug_frame, signature)
             
             # Add debug text
             cv2.putText(
                 debug_frame, 
-                f"Pose Points: {len(signature)}", 
+                f"Pose Points: {signature.visible_count}", 
                 (10, 30), 
                 cv2.FONT_HERSHEY_SIMPLEX, 
                 0.7, 
@@ -354,16 +355,12 @@ class PoseDetector(QObject):
             self.camera_view.size(), Qt.KeepAspectRatio))
         
     def check_pose(self, pose_detector, current_signature):
-        print("\n--- CHECKING CURRENT POSE ---")
-        print(f"Current signature available: {current_signature is not None}")
-        
         if not current_signature:
-            print("No current pose signature to check")
+            logger.debug("No current pose signature to check")
             return None
         
-        print(f"\nCHECKING CURRENT POSE against {len(self.pose_map)} saved poses")
-        print(f"Current signature type: {type(current_signature)}")
-        print(f"Current signature length: {len(current_signature)}")
+        logger.debug("Checking current pose (%d visible slots) against %d saved poses",
+                     current_signature.visible_count, len(self.pose_map))
         
         best_match = None
         best_score = 0
@@ -372,31 +369,25 @@ class PoseDetector(QObject):
             saved_signature = pose_data.get("signature")
             threshold = pose_data.get("threshold", 0.6)
             
-            print(f"\nPose {pose_id} ({pose_data.get('name', 'unnamed')}):")
-            print(f"  Saved signature type: {type(saved_signature)}")
-            print(f"  Saved signature length: {len(saved_signature) if saved_signature else 'None'}")
-            
             if not saved_signature:
-                print("  ERROR: No saved signature for this pose")
+                logger.debug("Pose %s has no saved signature", pose_id)
                 continue
             
             # Calculate similarity
             try:
                 similarity = pose_detector.compare_poses(current_signature, saved_signature)
-                print(f"  Similarity: {similarity:.4f}, Threshold: {threshold:.4f}")
+                logger.debug("Pose %s: similarity %.4f, threshold %.4f", pose_id, similarity, threshold)
                 
                 if similarity > threshold and similarity > best_score:
                     best_score = similarity
                     best_match = pose_id
-                    print(f"  NEW BEST MATCH: {best_match} with score {best_score:.4f}")
             except Exception as e:
-                print(f"  ERROR comparing poses: {str(e)}")
+                logger.error("Error comparing poses: %s", e)
                 continue
         
         if best_match:
-            print(f"FOUND BEST MATCH: {best_match} with score {best_score:.4f}")
-            print(f"Triggering key: {self.pose_map[best_match]['key_combo']}")
+            logger.debug("Best match: %s with score %.4f", best_match, best_score)
             return best_match
         
-        print(f"No matching pose found. Best score was {best_score:.4f}")
+        logger.debug("No matching pose found. Best score was %.4f", best_score)
         return None
\ No newline at end of file
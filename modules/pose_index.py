@@ -0,0 +1,238 @@
+import heapq
+
+import numpy as np
+
+from modules.pose_signature import NUM_SLOTS, SLOT_WEIGHTS
+
+
+class _Node:
+    __slots__ = ('dim', 'split', 'left', 'right', 'parent', 'ids', 'points', 'masks', '_matrix')
+
+    def __init__(self, parent=None):
+        # Inner nodes split on dim/split into left/right. Every node also holds
+        # poses directly: all of them in a leaf, and in an inner node those
+        # whose slot at dim is hidden, which can go to neither side.
+        self.dim = None
+        self.split = 0.0
+        self.left = None
+        self.right = None
+        self.parent = parent
+        self.ids = []
+        self.points = []
+        self.masks = []
+        self._matrix = None
+
+    @property
+    def is_leaf(self):
+        return self.dim is None
+
+    @property
+    def matrix(self):
+        """(points, masks) of the node's own poses stacked into arrays, cached until they change"""
+        if self._matrix is None:
+            self._matrix = (np.stack(self.points), np.stack(self.masks))
+        return self._matrix
+
+    def add(self, pose_id, points, mask):
+        self.ids.append(pose_id)
+        self.points.append(points)
+        self.masks.append(mask)
+        self._matrix = None
+
+    def take_all(self):
+        """Remove and return (ids, points, masks) of every pose in this subtree"""
+        ids, points, masks = self.ids, self.points, self.masks
+        if not self.is_leaf:
+            for child in (self.left, self.right):
+                child_ids, child_points, child_masks = child.take_all()
+                ids, points, masks = ids + child_ids, points + child_points, masks + child_masks
+        self.dim, self.left, self.right = None, None, None
+        self.ids, self.points, self.masks, self._matrix = [], [], [], None
+        return ids, points, masks
+
+
+class PoseIndex:
+    """Incremental KD-tree over pose signatures.
+
+    Used to narrow a large pose library down to the k nearest candidates,
+    which are then re-scored exactly by the PoseMatcher. Inserting splits a
+    leaf once it exceeds leaf_size; removing only touches the pose's own
+    node, and a leaf left empty is folded into its parent, so edits to
+    pose_map never rebuild the whole tree.
+
+    Distances follow the matcher's score: only slots visible in both
+    signatures count, each weighted by SLOT_WEIGHTS, as the sum of
+    |dx| + |dy| (the weighted L1 distance, which is at most sqrt(2) times
+    the weighted Euclidean distance the score averages).
+
+    Searches stop after max_leaves nodes. query() also returns a lower bound
+    on the distance of every pose it did not return, which lets the caller
+    tell whether the candidates are guaranteed to contain every pose that
+    can still match.
+    """
+
+    def __init__(self, leaf_size=32, max_leaves=8):
+        self.leaf_size = leaf_size
+        self.max_leaves = max_leaves
+        self._root = _Node()
+        self._node_of = {}  # Pose id -> node holding it
+
+    def __len__(self):
+        return len(self._node_of)
+
+    def __contains__(self, pose_id):
+        return pose_id in self._node_of
+
+    def insert(self, pose_id, signature):
+        """Add a pose, replacing its previous signature if it is already indexed"""
+        self.remove(pose_id)
+        points = np.asarray(signature.points, dtype=np.float32).reshape(NUM_SLOTS, 2)
+        mask = np.asarray(signature.mask, dtype=bool).reshape(NUM_SLOTS)
+
+        node = self._descend(points, mask)
+        node.add(pose_id, points, mask)
+        self._node_of[pose_id] = node
+        if node.is_leaf and len(node.ids) > self.leaf_size:
+            self._split(node)
+
+    def _descend(self, points, mask):
+        """Deepest node a pose belongs to: a leaf, or the inner node whose split slot it hides"""
+        node = self._root
+        while not node.is_leaf:
+            slot, coord = divmod(node.dim, 2)
+            if not mask[slot]:
+                break
+            node = node.left if points[slot, coord] < node.split else node.right
+        return node
+
+    def remove(self, pose_id):
+        node = self._node_of.pop(pose_id, None)
+        if node is None:
+            return
+        i = node.ids.index(pose_id)
+        del node.ids[i]
+        del node.points[i]
+        del node.masks[i]
+        node._matrix = None
+        if node.is_leaf and not node.ids and node.parent is not None:
+            self._collapse(node.parent)
+
+    def _collapse(self, parent):
+        """Fold an empty child leaf of parent away"""
+        sibling = parent.right if parent.left.is_leaf and not parent.left.ids else parent.left
+        if parent.ids:
+            # parent keeps poses of its own: turn the whole subtree back into a leaf
+            ids, points, masks = parent.take_all()
+            for pose_id, pose_points, mask in zip(ids, points, masks):
+                parent.add(pose_id, pose_points, mask)
+                self._node_of[pose_id] = parent
+            if len(parent.ids) > self.leaf_size:
+                self._split(parent)
+            return
+
+        # Otherwise the sibling takes the parent's place, in place so links stay valid
+        parent.dim, parent.split = sibling.dim, sibling.split
+        parent.left, parent.right = sibling.left, sibling.right
+        parent.ids, parent.points, parent.masks, parent._matrix = sibling.ids, sibling.points, sibling.masks, None
+        for child in (parent.left, parent.right):
+            if child is not None:
+                child.parent = parent
+        for pose_id in parent.ids:
+            self._node_of[pose_id] = parent
+        if parent.is_leaf and not parent.ids and parent.parent is not None:
+            self._collapse(parent.parent)
+
+    def clear(self):
+        self._root = _Node()
+        self._node_of = {}
+
+    def _split(self, leaf):
+        points, masks = leaf.matrix
+        coords = points.reshape(len(points), -1)
+        visible = np.repeat(masks, 2, axis=1)
+        # Split on the coordinate with the largest spread among the poses that show it,
+        # preferring slots every pose shows so few stay behind in the inner node
+        low = np.where(visible, coords, np.inf).min(axis=0)
+        high = np.where(visible, coords, -np.inf).max(axis=0)
+        spread = np.where(visible.any(axis=0), high - low, 0.0) * visible.mean(axis=0)
+        dim = int(np.argmax(spread))
+        if spread[dim] <= 0.0:
+            return  # Nothing to split on; keep one oversized leaf
+
+        shown = visible[:, dim]
+        values = coords[shown, dim]
+        split = float(np.median(values))
+        if (values < split).all() or not (values < split).any():
+            split = float(values.mean())
+            if not (values < split).any():
+                return
+
+        ids, pose_points, pose_masks = leaf.ids, leaf.points, leaf.masks
+        leaf.dim, leaf.split = dim, split
+        leaf.left, leaf.right = _Node(leaf), _Node(leaf)
+        leaf.ids, leaf.points, leaf.masks, leaf._matrix = [], [], [], None
+        for pose_id, p, mask, is_shown, value in zip(ids, pose_points, pose_masks, shown, coords[:, dim]):
+            node = leaf if not is_shown else (leaf.left if value < split else leaf.right)
+            node.add(pose_id, p, mask)
+            self._node_of[pose_id] = node
+
+        for child in (leaf.left, leaf.right):
+            if len(child.ids) > self.leaf_size:
+                self._split(child)
+
+    def query(self, signature, k=32):
+        """The (up to) k nearest pose ids, nearest first, and a bound for the rest
+
+        The bound is a distance no pose left out of the result can be closer
+        than (inf if every pose was returned).
+        """
+        points = np.asarray(signature.points, dtype=np.float32).reshape(NUM_SLOTS, 2)
+        mask = np.asarray(signature.mask, dtype=bool).reshape(NUM_SLOTS)
+        weights = np.where(mask, SLOT_WEIGHTS, 0.0).astype(np.float32)
+        best = []  # Max-heap of (-distance, counter, pose_id)
+        # Min-heap of (bound, counter, node, offsets); offsets maps a coordinate to the
+        # gap between the signature and the node's region along it, and bound is
+        # their weighted sum: a lower bound on the distance of every pose in the node
+        frontier = [(0.0, 0, self._root, {})]
+        counter = 1
+        visited = 0
+        rest = float('inf')  # Bound of the first node left unsearched
+
+        while frontier:
+            bound, _, node, offsets = heapq.heappop(frontier)
+            if visited >= self.max_leaves or (len(best) == k and bound >= -best[0][0]):
+                rest = bound
+                break
+
+            if node.ids:
+                visited += 1
+                node_points, node_masks = node.matrix
+                distances = np.einsum('ps,ps->p', np.abs(node_points - points).sum(axis=2),
+                                      node_masks * weights)
+                for pose_id, distance in zip(node.ids, distances.tolist()):
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, counter, pose_id))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, counter, pose_id))
+                    counter += 1
+
+            if not node.is_leaf:
+                slot, coord = divmod(node.dim, 2)
+                offset = float(points[slot, coord]) - node.split
+                near, far = (node.left, node.right) if offset < 0 else (node.right, node.left)
+                heapq.heappush(frontier, (bound, counter, near, offsets))
+                # Poses in the far child show this slot, so if the signature shows it
+                # too, their distance includes at least the gap to the split
+                previous = offsets.get(node.dim, 0.0)
+                if weights[slot] and abs(offset) > previous:
+                    far_offsets = dict(offsets)
+                    far_offsets[node.dim] = abs(offset)
+                    far_bound = bound + float(weights[slot]) * (abs(offset) - previous)
+                else:
+                    far_offsets, far_bound = offsets, bound
+                heapq.heappush(frontier, (far_bound, counter + 1, far, far_offsets))
+                counter += 2
+
+        if len(best) == k:
+            rest = min(rest, -best[0][0])
+        return [pose_id for _, _, pose_id in sorted(best, key=lambda item: -item[0])], rest
@@ -0,0 +1,250 @@
+import numpy as np
+
+from modules.pose_index import PoseIndex
+from modules.pose_state import exit_threshold_of
+from modules.pose_signature import (MIN_COMMON_SLOTS, NUM_SLOTS, SLOT_WEIGHTS, similarity_from_distance,
+                                   signature_similarity)
+
+# Scores kept from earlier frames are dropped once the signature has moved
+# further than this (as a similarity) from where they were computed
+RESCORE_SIMILARITY = 0.9
+
+
+class MatchResult:
+    """Outcome of matching one signature against the pose library"""
+
+    __slots__ = ('pose_id', 'score', 'scores', 'pose_ids', 'entering', 'holding', 'evaluated')
+
+    def __init__(self, pose_id, score, scores, pose_ids, entering=None, holding=None, evaluated=0):
+        self.pose_id = pose_id      # Best pose above its threshold, or None
+        self.score = score          # Score of that pose (or the best score overall if None)
+        self.scores = scores        # Latest score of every pose, aligned with pose_ids
+        self.pose_ids = pose_ids
+        self.entering = entering    # Per pose: score above the enter threshold
+        self.holding = holding      # Per pose: score above the exit threshold
+        self.evaluated = evaluated  # Number of poses actually re-scored for this frame
+
+    def top(self, k=3):
+        """The k best (pose_id, score) pairs, best first"""
+        order = np.argsort(-self.scores)[:k]
+        return [(self.pose_ids[i], float(self.scores[i])) for i in order]
+
+
+class PoseMatcher:
+    """Scores a signature against every saved pose in one vectorized call.
+
+    Saved signatures are stacked into a (poses, slots, 2) matrix with a
+    parallel (poses, slots) visibility mask and a threshold vector. Rows are
+    added, updated and removed in place (removal swaps in the last row), so
+    editing the library never rebuilds the matrices.
+
+    With index_min_poses set, a PoseIndex is maintained alongside the rows;
+    once the library reaches that size, match() only re-scores the
+    index_candidates nearest poses instead of scanning every row. When the
+    index cannot rule out that a pose beyond those candidates clears its
+    threshold, the frame falls back to a full scan, so the index never
+    changes which poses match.
+
+    Each pose also has its own evaluation period (its recognition_speed).
+    When match() is given the frame time, only poses that are due are
+    re-scored; the others keep their last score until their next turn. Kept
+    scores are only valid near the signature they were computed for: once
+    the signature moves materially (below RESCORE_SIMILARITY to that one),
+    every pose is due again, so a pose is neither held on a stale score nor
+    missed until its next turn.
+    """
+
+    # Per-row arrays, kept aligned with pose_ids
+    _COLUMNS = ('_points', '_masks', '_thresholds', '_exit_thresholds', '_periods', '_next_due', '_last_scores')
+
+    def __init__(self, capacity=16, index_min_poses=None, index_candidates=32):
+        self.index = PoseIndex() if index_min_poses is not None else None
+        self.index_min_poses = index_min_poses
+        self.index_candidates = index_candidates
+        self._points = np.zeros((capacity, NUM_SLOTS, 2), dtype=np.float32)
+        self._masks = np.zeros((capacity, NUM_SLOTS), dtype=bool)
+        self._thresholds = np.zeros(capacity, dtype=np.float32)
+        self._exit_thresholds = np.zeros(capacity, dtype=np.float32)
+        self._periods = np.zeros(capacity, dtype=np.float64)      # Seconds between evaluations
+        self._next_due = np.zeros(capacity, dtype=np.float64)     # perf_counter time of next evaluation
+        self._last_scores = np.zeros(capacity, dtype=np.float64)
+        self.pose_ids = []  # Row -> pose id
+        self._rows = {}     # Pose id -> row
+        self._reference = None  # Signature the kept scores were computed near
+
+    def __len__(self):
+        return len(self.pose_ids)
+
+    def __contains__(self, pose_id):
+        return pose_id in self._rows
+
+    def row_of(self, pose_id):
+        return self._rows[pose_id]
+
+    def rebuild(self, pose_map):
+        """Load every pose with a signature from a KeyboardMapper pose_map"""
+        self.clear()
+        for pose_id, pose_data in pose_map.items():
+            self.set_pose_data(pose_id, pose_data)
+
+    def set_pose_data(self, pose_id, pose_data):
+        """Add or update a pose from its pose_map entry"""
+        self.set_pose(
+            pose_id,
+            pose_data.get("signature"),
+            pose_data.get("threshold", 0.6),
+            pose_data.get("recognition_speed", 0) / 1000.0,
+            exit_threshold_of(pose_data)
+        )
+
+    def clear(self):
+        self.pose_ids = []
+        self._rows = {}
+        if self.index is not None:
+            self.index.clear()
+
+    def set_pose(self, pose_id, signature, threshold, period=0.0, exit_threshold=None):
+        """Add or update a pose; poses without a signature are removed
+        
+        period is the time in seconds between evaluations (0 = every frame).
+        exit_threshold defaults to the threshold itself (no hysteresis).
+        """
+        if signature is None:
+            self.remove_pose(pose_id)
+            return
+
+        row = self._rows.get(pose_id)
+        if row is None:
+            row = len(self.pose_ids)
+            if row == len(self._thresholds):
+                self._grow()
+            self.pose_ids.append(pose_id)
+            self._rows[pose_id] = row
+
+        self._points[row] = signature.points
+        self._masks[row] = signature.mask
+        self._thresholds[row] = threshold
+        self._exit_thresholds[row] = threshold if exit_threshold is None else exit_threshold
+        self._periods[row] = period
+        self._next_due[row] = 0.0
+        self._last_scores[row] = 0.0
+        if self.index is not None:
+            self.index.insert(pose_id, signature)
+
+    def remove_pose(self, pose_id):
+        row = self._rows.pop(pose_id, None)
+        if row is None:
+            return
+        if self.index is not None:
+            self.index.remove(pose_id)
+        last = len(self.pose_ids) - 1
+        if row != last:
+            # Move the last row into the hole
+            for name in self._COLUMNS:
+                column = getattr(self, name)
+                column[row] = column[last]
+            moved_id = self.pose_ids[last]
+            self.pose_ids[row] = moved_id
+            self._rows[moved_id] = row
+        self.pose_ids.pop()
+
+    def _grow(self):
+        capacity = max(16, 2 * len(self._thresholds))
+        for name in self._COLUMNS:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def score(self, signature, rows=None):
+        """Similarity of a signature to every saved pose (or to the given rows only)
+        
+        Like signature_similarity, poses sharing fewer than MIN_COMMON_SLOTS
+        visible slots with the signature score 0.
+        """
+        n = len(self.pose_ids)
+        if rows is None:
+            points, masks = self._points[:n], self._masks[:n]
+        else:
+            points, masks = self._points[rows], self._masks[rows]
+
+        common = masks & signature.mask
+        counts = np.count_nonzero(common, axis=1)
+        diff = points - signature.points
+        distances = np.sqrt(np.einsum('psk,psk->ps', diff, diff))
+        weighted = np.einsum('ps,ps,s->p', distances, common, SLOT_WEIGHTS)
+
+        scores = np.zeros(len(counts), dtype=np.float64)
+        valid = counts >= MIN_COMMON_SLOTS
+        scores[valid] = similarity_from_distance(weighted[valid] / counts[valid])
+        return scores
+
+    @staticmethod
+    def _best_possible_score(signature, distance):
+        """Upper bound on the score of a pose at least this index distance away
+
+        The index distance is the weighted L1 distance over the common slots,
+        at most sqrt(2) times their summed weighted Euclidean distance, and
+        the score averages the latter over at most visible_count slots.
+        """
+        return similarity_from_distance(distance / (np.sqrt(2.0) * max(signature.visible_count, 1)))
+
+    def reset_scores(self):
+        """Forget all scores, e.g. when the pose was lost"""
+        self._last_scores[:] = 0.0
+        self._next_due[:] = 0.0
+        self._reference = None
+
+    def scheduled_rows(self, now, rows=None):
+        """Rows (all, or among the given ones) whose evaluation is due at time now
+        
+        The returned rows are rescheduled one period later.
+        """
+        if rows is None:
+            rows = np.arange(len(self.pose_ids))
+        rows = rows[self._next_due[rows] <= now]
+        self._next_due[rows] = now + self._periods[rows]
+        return rows
+
+    def match(self, signature, now=None):
+        """Best pose whose score exceeds its own threshold, plus all scores
+        
+        If now (a perf_counter time) is given, only poses that are due are
+        re-scored; otherwise every pose (or every index candidate) is.
+        """
+        n = len(self.pose_ids)
+        if n == 0:
+            empty = np.zeros(0, dtype=bool)
+            return MatchResult(None, 0.0, np.zeros(0), [], empty, empty)
+
+        rows = None
+        if self.index is not None and n >= self.index_min_poses:
+            candidates, rest = self.index.query(signature, self.index_candidates)
+            if self._best_possible_score(signature, rest) <= self._exit_thresholds[:n].min():
+                rows = np.fromiter((self._rows[pose_id] for pose_id in candidates), dtype=np.intp,
+                                   count=len(candidates))
+                # Poses that are not near the current one no longer match
+                is_candidate = np.zeros(n, dtype=bool)
+                is_candidate[rows] = True
+                self._last_scores[:n][~is_candidate] = 0.0
+
+        if now is not None:
+            if self._reference is None or signature_similarity(signature, self._reference) < RESCORE_SIMILARITY:
+                # Scores kept from other rows no longer describe this pose
+                self._next_due[:n] = 0.0
+                self._reference = signature
+            rows = self.scheduled_rows(now, rows)
+        elif rows is None:
+            rows = np.arange(n)
+
+        if len(rows):
+            self._last_scores[rows] = self.score(signature, rows)
+
+        scores = self._last_scores[:n].copy()
+        above = scores > self._thresholds[:n]
+        holding = scores > self._exit_thresholds[:n]
+        candidates = np.where(above, scores, -1.0)
+        best_row = int(np.argmax(candidates))
+        best_id = self.pose_ids[best_row] if above[best_row] else None
+        best_score = float(scores[best_row]) if best_id is not None else float(scores.max())
+        return MatchResult(best_id, best_score, scores, list(self.pose_ids), above, holding, len(rows))
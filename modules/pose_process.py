@@ -0,0 +1,255 @@
+import logging
+import multiprocessing as mproc
+import struct
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+from PyQt5.QtCore import QThread
+
+from modules.landmarks import NUM_LANDMARKS, LANDMARK_FIELDS
+from modules.latency_trace import tracer, QUEUE, INFERENCE
+
+logger = logging.getLogger(__name__)
+
+# Result message: int64 sequence number, optionally followed by the float32 landmark array
+_RESULT_HEADER = struct.Struct('<q')
+# Sequence number of the message the child sends once its model is loaded
+_READY_SEQ = -1
+
+
+class SharedFrameRing:
+    """Fixed number of preallocated frame slots in a shared-memory block.
+
+    The parent process writes camera frames into the slots; the inference
+    process attaches to the same block by name and reads them in place, so a
+    frame crosses the process boundary without being pickled.
+    """
+
+    def __init__(self, shape, slots=3, name=None):
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.slot_bytes = int(np.prod(self.shape))
+        self._owner = name is None
+        if self._owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * slots)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.buffer = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf)
+        self._next_slot = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, frame):
+        """Copy a frame into the next slot and return the slot index"""
+        slot = self._next_slot
+        np.copyto(self.buffer[slot], frame)
+        self._next_slot = (slot + 1) % self.slots
+        return slot
+
+    def close(self):
+        self.buffer = None
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+
+def run_inference_process(conn):
+    """Entry point of the inference process.
+
+    Messages from the parent:
+        ("ring", name, shape, slots)  attach to a (new) shared frame ring
+        ("frame", slot, seq)          run the model on a frame in the ring
+        ("stop",)                     shut down
+    Once the model is loaded a ready message (sequence number -1) is sent,
+    then a result for every frame, all with send_bytes().
+    """
+    # Heavy imports happen only in the child
+    import cv2
+    import mediapipe as mp
+    from modules.pose_detector import POSE_OPTIONS
+
+    pose = mp.solutions.pose.Pose(**POSE_OPTIONS)
+    ring = None
+    landmark_array = np.zeros((NUM_LANDMARKS, LANDMARK_FIELDS), dtype=np.float32)
+    conn.send_bytes(_RESULT_HEADER.pack(_READY_SEQ))
+
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+
+            if message[0] == "stop":
+                break
+            if message[0] == "ring":
+                if ring is not None:
+                    ring.close()
+                _, name, shape, slots = message
+                ring = SharedFrameRing(shape, slots, name=name)
+                continue
+
+            _, slot, seq = message
+            rgb_frame = cv2.cvtColor(ring.buffer[slot], cv2.COLOR_BGR2RGB)
+            results = pose.process(rgb_frame)
+
+            header = _RESULT_HEADER.pack(seq)
+            if results.pose_landmarks:
+                for idx, landmark in enumerate(results.pose_landmarks.landmark):
+                    landmark_array[idx] = (landmark.x, landmark.y, landmark.z, landmark.visibility)
+                conn.send_bytes(header + landmark_array.tobytes())
+            else:
+                conn.send_bytes(header)
+    finally:
+        if ring is not None:
+            ring.close()
+        pose.close()
+
+
+class PoseProcessThread(QThread):
+    """Feeds frames to a MediaPipe child process and publishes its landmarks.
+
+    Drop-in alternative to PoseInferenceThread: the model, its Python-side
+    post-processing and the BGR->RGB conversion run in another process, so
+    they do not compete with Qt and key injection for the GIL. If the child
+    crashes or stalls it is restarted and the stream continues with the next
+    frame.
+
+    A new child first has to import MediaPipe and load the model, which can
+    take far longer than a frame; it gets startup_timeout_ms to report that
+    it is ready before result_timeout_ms applies to each frame.
+    """
+
+    def __init__(self, pose_detector, mailbox, ring_slots=3,
+                 result_timeout_ms=2000, restart_delay_ms=500, startup_timeout_ms=60000):
+        super().__init__()
+        self.pose_detector = pose_detector
+        self.mailbox = mailbox
+        self.ring_slots = ring_slots
+        self.result_timeout = result_timeout_ms / 1000.0
+        self.startup_timeout = startup_timeout_ms / 1000.0
+        self.restart_delay = restart_delay_ms / 1000.0
+        self.running = False
+        self.restarts = 0
+
+        self._ctx = mproc.get_context("spawn")
+        self._process = None
+        self._conn = None
+        self._ring = None
+        self._seq = 0
+
+    def run(self):
+        self.running = True
+        self.mailbox.reopen()
+
+        try:
+            while self.running:
+                captured = self.mailbox.get(timeout=0.1)
+                if captured is None:
+                    continue
+
+                start = time.perf_counter()
+                tracer.record(captured.seq, QUEUE, (start - captured.timestamp) * 1000.0)
+                try:
+                    landmark_array = self._infer(captured.image)
+                except (EOFError, BrokenPipeError, ConnectionResetError, TimeoutError) as e:
+                    if not self.running:
+                        break
+                    logger.warning("Inference process failed (%s: %s), restarting", type(e).__name__, e)
+                    self._restart_process()
+                    continue
+
+                self.pose_detector.inference_ms = (time.perf_counter() - start) * 1000.0
+                tracer.record(captured.seq, INFERENCE, self.pose_detector.inference_ms)
+                self.pose_detector.process_landmark_array(
+                    captured.image, landmark_array, captured.seq, captured.timestamp)
+        finally:
+            self._stop_process()
+            if self._ring is not None:
+                self._ring.close()
+                self._ring = None
+
+    def _infer(self, frame):
+        """Send a frame to the child and wait for its landmarks"""
+        if self._process is None or not self._process.is_alive():
+            self._start_process()
+
+        if self._ring is None or self._ring.shape != frame.shape:
+            if self._ring is not None:
+                self._ring.close()
+            self._ring = SharedFrameRing(frame.shape, self.ring_slots)
+            self._conn.send(("ring", self._ring.name, frame.shape, self.ring_slots))
+
+        self._seq += 1
+        slot = self._ring.write(frame)
+        self._conn.send(("frame", slot, self._seq))
+
+        # Skip results of requests that timed out before a restart
+        while True:
+            if not self._conn.poll(self.result_timeout):
+                raise TimeoutError("no result from inference process")
+            message = self._conn.recv_bytes()
+            seq, = _RESULT_HEADER.unpack_from(message)
+            if seq == self._seq:
+                break
+
+        if len(message) == _RESULT_HEADER.size:
+            return None
+        return np.frombuffer(message, dtype=np.float32, offset=_RESULT_HEADER.size).reshape(
+            NUM_LANDMARKS, LANDMARK_FIELDS)
+
+    def _start_process(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        self._process = self._ctx.Process(
+            target=run_inference_process, args=(child_conn,), daemon=True)
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        self._wait_ready()
+
+        # A new child has to attach to the existing ring again
+        if self._ring is not None:
+            self._conn.send(("ring", self._ring.name, self._ring.shape, self.ring_slots))
+
+    def _wait_ready(self):
+        """Wait for a new child to load its model (raises EOFError if it dies, TimeoutError if too slow)"""
+        deadline = time.perf_counter() + self.startup_timeout
+        while not self._conn.poll(0.1):
+            if not self.running:
+                raise TimeoutError("stopped while the inference process was starting")
+            if time.perf_counter() > deadline:
+                raise TimeoutError("inference process did not load the model in time")
+        seq, = _RESULT_HEADER.unpack_from(self._conn.recv_bytes())
+        if seq != _READY_SEQ:
+            raise EOFError(f"unexpected message {seq} from a starting inference process")
+
+    def _restart_process(self):
+        self._stop_process(graceful=False)
+        self.restarts += 1
+        time.sleep(self.restart_delay)
+
+    def _stop_process(self, graceful=True):
+        if self._process is None:
+            return
+        if graceful and self._process.is_alive():
+            try:
+                self._conn.send(("stop",))
+            except (BrokenPipeError, OSError):
+                pass
+            self._process.join(1.0)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join(1.0)
+        self._conn.close()
+        self._process = None
+        self._conn = None
+
+    def stop(self):
+        """Stop feeding frames, shut down the child process and drain the mailbox"""
+        self.running = False
+        self.mailbox.close()
+        self.wait()
+        self.mailbox.clear()
@@ -0,0 +1,124 @@
+import numpy as np
+
+from modules.landmarks import X, Y, VISIBILITY
+
+LEFT_SHOULDER = 11
+RIGHT_SHOULDER = 12
+
+# Key body regions with their corresponding landmark indices. A landmark can
+# belong to several regions; every (region, landmark) pair gets its own slot.
+BODY_REGIONS = (
+    ('shoulders', (11, 12)),         # Left and right shoulders
+    ('torso', (23, 24, 11, 12)),     # Left and right hip, left and right shoulder
+    ('arms', (13, 14, 15, 16)),      # Left and right elbows, wrists
+    ('hands', (15, 16, 19, 20)),     # Wrists and hand landmarks
+    ('legs', (23, 24, 25, 26)),      # Left and right hip, knee
+    ('feet', (27, 28, 31, 32))       # Left and right ankle, heel
+)
+
+# Landmark index and region index of every signature slot
+SLOT_LANDMARKS = np.array([idx for _, ids in BODY_REGIONS for idx in ids], dtype=np.intp)
+SLOT_REGIONS = np.array([r for r, (_, ids) in enumerate(BODY_REGIONS) for _ in ids], dtype=np.intp)
+REGION_SIZES = np.array([len(ids) for _, ids in BODY_REGIONS])
+NUM_SLOTS = len(SLOT_LANDMARKS)
+
+# Per-slot distance weights: shoulders 1.0, torso 1.2/1.1, first arm points 0.9
+SLOT_WEIGHTS = np.ones(NUM_SLOTS, dtype=np.float32)
+SLOT_WEIGHTS[:8] = (1.0, 1.0, 1.2, 1.2, 1.1, 1.1, 0.9, 0.9)
+
+VISIBILITY_THRESHOLD = 0.5
+MIN_VISIBLE_SLOTS = 10
+# Two signatures that share fewer visible slots than this score 0: a couple of
+# matching shoulder points say nothing about the rest of the pose
+MIN_COMMON_SLOTS = 8
+
+
+class PoseSignature:
+    """Fixed-slot pose signature.
+
+    points holds the (x, y) of every slot, normalized to the shoulder center
+    and shoulder width; mask says which slots were visible. Slot i always
+    refers to the same body landmark, so two signatures can be compared
+    slot by slot even when different parts of the body were hidden.
+    """
+
+    __slots__ = ('points', 'mask')
+
+    def __init__(self, points, mask):
+        self.points = points
+        self.mask = mask
+
+    @property
+    def visible_count(self):
+        return int(np.count_nonzero(self.mask))
+
+    def copy(self):
+        return PoseSignature(self.points.copy(), self.mask.copy())
+
+    def to_json(self):
+        return {
+            "points": self.points.tolist(),
+            "mask": self.mask.tolist()
+        }
+
+    @classmethod
+    def from_json(cls, value):
+        """Rebuild a signature saved by to_json()
+
+        Signatures saved before slots existed are lists of visible points.
+        Only a complete list (every slot visible) can be mapped back onto the
+        slots; anything else returns None and the pose must be recaptured.
+        """
+        if not value:
+            return None
+        if isinstance(value, dict):
+            points = np.asarray(value["points"], dtype=np.float32).reshape(NUM_SLOTS, 2)
+            mask = np.asarray(value["mask"], dtype=bool).reshape(NUM_SLOTS)
+            return cls(points, mask)
+        if len(value) == NUM_SLOTS:
+            points = np.asarray(value, dtype=np.float32).reshape(NUM_SLOTS, 2)
+            return cls(points, np.ones(NUM_SLOTS, dtype=bool))
+        return None
+
+
+def build_signature(data):
+    """Build a PoseSignature from a (33, 4) landmark array, or None if too little is visible"""
+    left = data[LEFT_SHOULDER, X:Y + 1]
+    right = data[RIGHT_SHOULDER, X:Y + 1]
+    shoulder_width = float(np.hypot(*(left - right)))
+    if shoulder_width == 0.0:
+        return None
+    center = (left + right) / 2
+
+    # A slot counts if its landmark is visible and at least half of its region is
+    visible = data[SLOT_LANDMARKS, VISIBILITY] > VISIBILITY_THRESHOLD
+    region_counts = np.bincount(SLOT_REGIONS, weights=visible, minlength=len(BODY_REGIONS))
+    mask = visible & (region_counts >= REGION_SIZES / 2)[SLOT_REGIONS]
+
+    if np.count_nonzero(mask) < MIN_VISIBLE_SLOTS:
+        return None
+
+    points = (data[SLOT_LANDMARKS, X:Y + 1] - center) / shoulder_width
+    points[~mask] = 0.0
+    return PoseSignature(points.astype(np.float32, copy=False), mask)
+
+
+def signature_similarity(sig1, sig2):
+    """Similarity in [0, 1] over the slots visible in both signatures (0 if too few are)"""
+    common = sig1.mask & sig2.mask
+    valid_points = np.count_nonzero(common)
+    if valid_points < MIN_COMMON_SLOTS:
+        return 0.0
+
+    distances = np.hypot(*(sig1.points - sig2.points).T)
+    avg_weighted_dist = float(np.dot(distances[common], SLOT_WEIGHTS[common])) / valid_points
+    return similarity_from_distance(avg_weighted_dist)
+
+
+def similarity_from_distance(avg_weighted_dist):
+    """Map an average weighted distance to a similarity score (works on arrays too)"""
+    # Prioritize lower distances and apply a non-linear transformation
+    similarity = 1.0 / (1.0 + 4.0 * np.asarray(avg_weighted_dist))
+    # Apply a curve to enhance similarities
+    similarity = np.where(similarity > 0.6, np.minimum(0.6 + (similarity - 0.6) * 1.5, 1.0), similarity)
+    return float(similarity) if similarity.ndim == 0 else similarity
@@ -0,0 +1,99 @@
+# Default gap between a pose's enter threshold and its (lower) exit threshold
+DEFAULT_HYSTERESIS = 0.05
+
+IDLE = "idle"
+PENDING = "pending"  # Above the enter threshold, waiting out the dwell time
+ACTIVE = "active"    # Key pressed (or tapped) and not yet released
+
+PRESS = "press"
+RELEASE = "release"
+
+
+def exit_threshold_of(pose_data):
+    """Score below which an active pose is released"""
+    threshold = pose_data.get("threshold", 0.6)
+    exit_threshold = pose_data.get("exit_threshold")
+    if exit_threshold is None:
+        exit_threshold = threshold - DEFAULT_HYSTERESIS
+    return min(exit_threshold, threshold)
+
+
+class _PoseState:
+    __slots__ = ('state', 'since', 'frames')
+
+    def __init__(self, since):
+        self.state = PENDING
+        self.since = since
+        self.frames = 1
+
+
+class PoseStateTracker:
+    """Per-pose press/hold/release state machine.
+
+    A pose becomes ACTIVE once its score has stayed above its enter
+    threshold for dwell_frames frames and dwell_ms milliseconds, and is
+    released when its score drops to its exit threshold or below. Events
+    are produced only on these transitions, so a pose hovering around its
+    threshold does not make the key chatter.
+
+    Only the best-scoring pose can start entering on a given frame; poses
+    that are already active are held independently of each other.
+    """
+
+    def __init__(self):
+        self._states = {}  # Pose id -> _PoseState, only for non-idle poses
+
+    def state_of(self, pose_id):
+        entry = self._states.get(pose_id)
+        return entry.state if entry else IDLE
+
+    @property
+    def active_poses(self):
+        return [pose_id for pose_id, entry in self._states.items() if entry.state == ACTIVE]
+
+    def update(self, result, now, pose_map):
+        """Advance the state machines with a MatchResult and return [(event, pose_id)]"""
+        events = []
+        rows = {pose_id: row for row, pose_id in enumerate(result.pose_ids)}
+
+        # Pending and active poses
+        for pose_id, entry in list(self._states.items()):
+            row = rows.get(pose_id)
+            if row is None:
+                # Pose was removed from the library
+                if entry.state == ACTIVE:
+                    events.append((RELEASE, pose_id))
+                del self._states[pose_id]
+                continue
+
+            if entry.state == ACTIVE:
+                if not result.holding[row]:
+                    events.append((RELEASE, pose_id))
+                    del self._states[pose_id]
+            elif result.entering[row]:
+                entry.frames += 1
+                if self._dwell_done(entry, now, pose_map[pose_id]):
+                    entry.state = ACTIVE
+                    events.append((PRESS, pose_id))
+            else:
+                del self._states[pose_id]
+
+        # A new pose can start entering
+        if result.pose_id is not None and result.pose_id not in self._states:
+            entry = _PoseState(now)
+            self._states[result.pose_id] = entry
+            if self._dwell_done(entry, now, pose_map[result.pose_id]):
+                entry.state = ACTIVE
+                events.append((PRESS, result.pose_id))
+
+        return events
+
+    def _dwell_done(self, entry, now, pose_data):
+        return (entry.frames >= pose_data.get("dwell_frames", 1)
+                and (now - entry.since) * 1000.0 >= pose_data.get("dwell_ms", 0))
+
+    def reset(self):
+        """Drop all states; returns release events for the poses that were active"""
+        events = [(RELEASE, pose_id) for pose_id in self.active_poses]
+        self._states = {}
+        return events
@@ -0,0 +1,41 @@
+import logging
+
+from PyQt5.QtCore import QThread
+
+logger = logging.getLogger(__name__)
+
+
+class PoseInferenceThread(QThread):
+    """Runs PoseDetector.process_frame off the GUI thread.
+
+    Frames are pulled from the camera's FrameMailbox, so the worker always
+    processes the newest frame. Results reach the GUI through the detector's
+    signals, which Qt queues across the thread boundary.
+    """
+
+    def __init__(self, pose_detector, mailbox):
+        super().__init__()
+        self.pose_detector = pose_detector
+        self.mailbox = mailbox
+        self.running = False
+
+    def run(self):
+        self.running = True
+        self.mailbox.reopen()
+
+        while self.running:
+            captured = self.mailbox.get(timeout=0.1)
+            if captured is None:
+                continue
+
+            try:
+                self.pose_detector.process_frame(captured.image, captured.seq, captured.timestamp)
+            except Exception as e:
+                logger.exception("Error in pose inference: %s", e)
+
+    def stop(self):
+        """Stop the worker, wait for the current frame to finish and drain the mailbox"""
+        self.running = False
+        self.mailbox.close()
+        self.wait()
+        self.mailbox.clear()
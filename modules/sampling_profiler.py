@@ -0,0 +1,171 @@
+import collections
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("speedscope", "collapsed")
+
+
+class SamplingProfiler:
+    """Statistical profiler for every Python thread in the process.
+
+    While recording, a background thread takes a snapshot of all thread
+    stacks with sys._current_frames() every interval and counts identical
+    stacks. Nothing is instrumented, so the profiled code runs unchanged and
+    there is no cost at all while the profiler is idle.
+
+    Results are written as speedscope JSON (one sampled profile per thread)
+    or as collapsed stacks ("thread;outer;...;inner count" lines) for
+    flamegraph tools.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._thread = None
+        self._stop = threading.Event()
+        self._samples = collections.Counter()  # (thread name, stack tuple) -> count
+        self._thread_names = {}
+        self._ticks = 0
+        self._elapsed = 0.0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration, path, fmt="speedscope", on_finished=None):
+        """Record for duration seconds on a background thread, then write path
+
+        on_finished(path) is called from the profiler thread once the file is
+        written. Returns False if a recording is already running.
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown profile format '{fmt}' (choose from {', '.join(FORMATS)})")
+        if self.running:
+            return False
+        self._samples.clear()
+        self._thread_names = {}
+        self._ticks = 0
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._record, args=(duration, path, fmt, on_finished),
+            name="SamplingProfiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """End a running recording early; the file is still written"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _record(self, duration, path, fmt, on_finished):
+        logger.info("Profiling all threads for %.1f s", duration)
+        own_id = threading.get_ident()
+        started = time.perf_counter()
+        deadline = started + duration
+        while not self._stop.is_set() and time.perf_counter() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self._samples[(self._thread_name(thread_id, frame), self._stack(frame))] += 1
+            self._ticks += 1
+            self._stop.wait(self.interval)
+        self._elapsed = time.perf_counter() - started
+
+        try:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            if fmt == "speedscope":
+                self.write_speedscope(path)
+            else:
+                self.write_collapsed(path)
+            logger.info("Profile with %d samples written to %s", sum(self._samples.values()), path)
+        except Exception as e:
+            logger.error("Error writing profile: %s", e)
+            return
+        if on_finished is not None:
+            on_finished(path)
+
+    def _thread_name(self, thread_id, frame):
+        """Name of a thread; QThreads are named after their class (e.g. CameraThread)"""
+        name = self._thread_names.get(thread_id)
+        if name is None:
+            thread = threading._active.get(thread_id)
+            if thread is not None and not isinstance(thread, threading._DummyThread):
+                name = thread.name
+            else:
+                # Threads not started by threading: use the class whose run() is outermost
+                while frame.f_back is not None:
+                    frame = frame.f_back
+                owner = frame.f_locals.get("self") if frame.f_code.co_name == "run" else None
+                name = type(owner).__name__ if owner is not None else f"thread-{thread_id}"
+            self._thread_names[thread_id] = name
+        return name
+
+    @staticmethod
+    def _stack(frame):
+        """Stack from the outermost to the innermost frame, as (function, file, line) tuples"""
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    @staticmethod
+    def _frame_label(entry):
+        function, filename, line = entry
+        return f"{function} ({os.path.basename(filename)}:{line})"
+
+    def write_collapsed(self, path):
+        with open(path, 'w') as f:
+            for (thread_name, stack), count in sorted(self._samples.items()):
+                labels = [thread_name] + [self._frame_label(entry) for entry in stack]
+                f.write(";".join(label.replace(";", ":") for label in labels) + f" {count}\n")
+
+    def write_speedscope(self, path):
+        # Each sample stands for the real time between samples, which is a bit
+        # longer than the interval because taking the sample itself takes time
+        period = self._elapsed / self._ticks if self._ticks else self.interval
+        frames = []
+        frame_index = {}
+        profiles = {}
+        for (thread_name, stack), count in self._samples.items():
+            indices = []
+            for entry in stack:
+                index = frame_index.get(entry)
+                if index is None:
+                    index = frame_index[entry] = len(frames)
+                    function, filename, line = entry
+                    frames.append({"name": function, "file": filename, "line": line})
+                indices.append(index)
+            profile = profiles.setdefault(thread_name, {"samples": [], "weights": []})
+            profile["samples"].append(indices)
+            profile["weights"].append(count * period)
+
+        document = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"motion_keybind profile ({self._elapsed:.1f} s)",
+            "exporter": "motion_keybind sampling profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": thread_name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": sum(profile["weights"]),
+                    "samples": profile["samples"],
+                    "weights": profile["weights"]
+                }
+                for thread_name, profile in sorted(profiles.items())
+            ]
+        }
+        with open(path, 'w') as f:
+            json.dump(document, f)
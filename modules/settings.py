@@ -0,0 +1,99 @@
+import copy
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_PATH = os.path.join("config", "settings.json")
+
+# Defaults for every setting; config/settings.json only needs to override what differs
+DEFAULT_SETTINGS = {
+    "camera": {
+        "source": "camera",         # "camera", "video" (a video file) or "images" (a directory of images)
+        "device": 0,                # Camera index for the live camera
+        "path": "",                 # Video file or image directory
+        "realtime": True,           # Play files at their frame rate; False = as fast as detection keeps up
+        "loop": False,              # Start files over when they end
+        "fps": 30,                  # Camera frame rate to request, and the rate of image directories
+        # Capture mode requested from the camera (null = driver default). MJPG lets most
+        # USB webcams deliver full frame rates; one driver buffer keeps frames fresh.
+        "width": 640,
+        "height": 480,
+        "fourcc": "MJPG",
+        "buffer_size": 1
+    },
+    "inference": {
+        "mode": "thread",           # "thread" or "process"
+        "ring_slots": 3,            # Shared-memory frame slots in process mode
+        "result_timeout_ms": 2000,  # Restart the worker process if a frame takes this long
+        "startup_timeout_ms": 60000,  # Time a new worker process gets to load the model
+        "restart_delay_ms": 500
+    },
+    "matching": {
+        "min_interval_ms": 0,       # Minimum time between matches; 0 = match every landmark frame
+        "index_min_poses": None,    # Use the nearest-neighbour index from this many poses (None = never)
+        "index_candidates": 32      # Poses re-scored exactly per frame when the index is used
+    },
+    "output": {
+        "backend": "pynput"         # "pynput", "uinput" (Linux, needs python-evdev) or "recording"
+    },
+    "tracing": {
+        "enabled": False,           # Record per-stage latency of every frame
+        "history": 4096,            # Frames kept in the trace ring
+        "csv_path": "latency_trace.csv"  # Written on exit while tracing is enabled
+    },
+    "hud": {
+        "visible": False,           # Show the performance overlay at startup (toggle with F3)
+        "refresh_hz": 4             # How often the overlay text is updated
+    },
+    "profiler": {
+        "duration_s": 10,           # Length of a recording started with F4 or the "profile" voice command
+        "interval_ms": 5,           # Time between stack samples
+        "format": "speedscope",     # "speedscope" (JSON, open at speedscope.app) or "collapsed" (flamegraph.pl)
+        "output_path": "profile.speedscope.json"
+    },
+    "recording": {
+        "directory": "recordings"   # Landmark sessions recorded with F5 or the "record" voice command
+    },
+    "logging": {
+        "level": "INFO",            # Console level: DEBUG, INFO, WARNING or ERROR
+        "levels": {},               # Per-module console levels, e.g. {"modules.keyboard_mapper": "DEBUG"}
+        "ring_buffer": 0,           # Keep this many recent records in memory (0 = off)
+        "ring_level": "DEBUG",      # Lowest level kept in the ring buffer
+        "ring_dump_path": "debug_log.txt"  # Written on exit while the ring buffer is on
+    },
+    "analog": {
+        "enabled": False,           # Drive the mouse from landmark positions while tracking
+        # Each axis: source (modules.analog_output.SOURCES), target (mouse_x, mouse_y,
+        # scroll_x, scroll_y), center, deadzone (shoulder widths), gain (units/s), curve
+        "axes": [
+            {"source": "torso_lean", "target": "mouse_x", "center": 0.0, "deadzone": 0.1, "gain": 1500.0, "curve": 1.5},
+            {"source": "right_wrist_y", "target": "mouse_y", "center": 1.5, "deadzone": 0.3, "gain": 800.0, "curve": 1.5}
+        ]
+    }
+}
+
+
+def _merge(defaults, overrides):
+    merged = copy.deepcopy(defaults)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def load_settings(path=SETTINGS_PATH):
+    """Load application settings, falling back to defaults for anything missing"""
+    overrides = {}
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                content = f.read().strip()
+            if content:
+                overrides = json.loads(content)
+        except Exception as e:
+            logger.error("Error loading settings from %s: %s", path, e)
+    return _merge(DEFAULT_SETTINGS, overrides)
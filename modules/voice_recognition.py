@@ -1,7 +1,10 @@
 import speech_recognition as sr
 from PyQt5.QtCore import QObject, pyqtSignal, QThread
+import logging
 import time
 
+logger = logging.getLogger(__name__)
+
 class VoiceListener(QThread):
     command_detected = pyqtSignal(str)
     listening_status = pyqtSignal(bool)
@@ -18,7 +21,9 @@ class VoiceListener(QThread):
             "edit": "EDIT",
             "delete": "DELETE",
             "start": "START",  # Simplified from "start tracking"
-            "stop": "STOP"     # Simplified from "stop tracking"
+            "stop": "STOP",    # Simplified from "stop tracking"
+            "profile": "PROFILE",
+            "record": "RECORD"
         }
         # Set extremely low threshold for all commands
         self.recognizer.energy_threshold = 100
@@ -38,17 +43,17 @@ class VoiceListener(QThread):
                 
                 self.listening_status.emit(True)
                 try:
-                    print("Listening for commands...")  # Debug output
+                    logger.debug("Listening for commands...")
                     audio = self.recognizer.listen(source, timeout=1, phrase_time_limit=3)
                     self.listening_status.emit(False)
                     
                     text = self.recognizer.recognize_google(audio).lower()
-                    print(f"Recognized: {text}")  # Debug output
+                    logger.debug("Recognized: %s", text)
                     
                     # More permissive command matching
                     for command_text, command_action in self.commands.items():
                         if command_text in text:
-                            print(f"Command detected: {command_action}")  # Debug output
+                            logger.info("Command detected: %s", command_action)
                             self.command_detected.emit(command_action)
                             # Brief pause after command detection
                             time.sleep(0.5)
@@ -60,10 +65,10 @@ class VoiceListener(QThread):
                     self.listening_status.emit(False)
                 except sr.RequestError:
                     self.listening_status.emit(False)
-                    print("Could not request results from Google Speech Recognition service")
+                    logger.warning("Could not request results from Google Speech Recognition service")
                 except Exception as e:
                     self.listening_status.emit(False)
-                    print(f"Error in voice recognition: {e}")
+                    logger.error("Error in voice recognition: %s", e)
                     
     def stop(self):
         self.running = False
@@ -0,0 +1,34 @@
+import os
+import sys
+import types
+
+# Modules are imported as in the app, relative to the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _install_mediapipe_stub():
+    """Stand-in for the parts of MediaPipe that PoseDetector touches without a model
+
+    Tests publish landmark arrays directly (PoseDetector(load_model=False)),
+    so only the module layout and the pose connections are needed.
+    """
+    def missing_model(**options):
+        raise RuntimeError("MediaPipe is not installed; create PoseDetector with load_model=False")
+
+    pose = types.SimpleNamespace(
+        Pose=missing_model,
+        POSE_CONNECTIONS=frozenset({(11, 12), (11, 13), (13, 15), (12, 14), (14, 16), (11, 23), (12, 24),
+                                    (23, 24), (23, 25), (24, 26), (25, 27), (26, 28), (0, 1), (1, 2)})
+    )
+    drawing_utils = types.SimpleNamespace(DrawingSpec=lambda **spec: spec, draw_landmarks=lambda *args: None)
+    drawing_styles = types.SimpleNamespace(get_default_pose_landmarks_style=lambda: None)
+    mediapipe = types.ModuleType("mediapipe")
+    mediapipe.solutions = types.SimpleNamespace(pose=pose, drawing_utils=drawing_utils,
+                                                drawing_styles=drawing_styles)
+    sys.modules["mediapipe"] = mediapipe
+
+
+try:
+    import mediapipe  # noqa: F401
+except ImportError:
+    _install_mediapipe_stub()
@@ -0,0 +1,39 @@
+import time
+
+from modules.key_dispatcher import KeyDispatcher, RELEASE_KEY
+from modules.output_backends import RecordingBackend
+
+
+def test_cancel_and_fire_never_both_happen():
+    backend = RecordingBackend()
+    dispatcher = KeyDispatcher(backend)
+    dispatcher.start()
+    try:
+        outcomes = {}  # Key -> cancel() result, None if never cancelled
+        for i in range(2000):
+            key = str(i)
+            handle = dispatcher.schedule(0.0005 * (i % 4), [(RELEASE_KEY, key)])
+            if i % 3 == 0:
+                # Let the deadline come close, so cancel() races the dispatcher
+                time.sleep(0.0002)
+            outcomes[key] = handle.cancel() if i % 2 else None
+        time.sleep(0.05)
+    finally:
+        dispatcher.stop()
+
+    released = [key for _, _, key in backend.take_events()]
+    assert len(released) == len(set(released))
+    for key, cancelled in outcomes.items():
+        assert (key in released) != bool(cancelled)
+
+
+def test_mouse_motion_is_kept_out_of_key_latency_stats():
+    dispatcher = KeyDispatcher(RecordingBackend())
+    dispatcher.press("a")
+    for _ in range(5):
+        dispatcher.move_mouse(1, 0)
+    dispatcher.scroll(0, 1)
+    dispatcher.release("a")
+    dispatcher.poll()
+    assert dispatcher.latency_stats()["count"] == 2
+    assert dispatcher.motion_stats()["count"] == 6
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from modules.keyboard_mapper import KeyboardMapper
+from modules.landmark_recording import (HEADER_SIZE, LandmarkRecorder, LandmarkRecording,
+                                        LandmarkReplayThread, RECORD_DTYPE)
+from modules.landmarks import LANDMARK_FIELDS, NUM_LANDMARKS, VISIBILITY
+from modules.output_backends import RecordingBackend
+from modules.pose_detector import PoseDetector
+
+
+def random_pose(rng):
+    """(33, 4) landmarks of a fully visible body"""
+    data = np.empty((NUM_LANDMARKS, LANDMARK_FIELDS), dtype=np.float32)
+    data[:, :3] = rng.uniform(0.1, 0.9, (NUM_LANDMARKS, 3))
+    data[:, VISIBILITY] = 1.0
+    return data
+
+
+@pytest.fixture
+def poses():
+    rng = np.random.default_rng(42)
+    return random_pose(rng), random_pose(rng)
+
+
+@pytest.fixture
+def mapper(tmp_path):
+    mapper = KeyboardMapper(str(tmp_path / "poses"), RecordingBackend())
+    yield mapper
+    mapper.shutdown()
+
+
+def record_session(path, frames):
+    """Publish frames (None = pose lost) through a detector while recording them"""
+    detector = PoseDetector(load_model=False)
+    recorder = LandmarkRecorder()
+    detector.add_landmark_listener(recorder.on_landmarks)
+    recorder.start(str(path))
+    for data in frames:
+        detector.publish_landmark_array(data)
+    recorder.stop()
+    return recorder
+
+
+def test_recording_reads_back_what_was_published(tmp_path, poses):
+    path = tmp_path / "session.lmrec"
+    first, second = poses
+    recorder = record_session(path, [first, second, None])
+    assert recorder.frames_written == 3
+
+    recording = LandmarkRecording(str(path))
+    assert len(recording) == 3
+    np.testing.assert_array_equal(recording.landmarks[0, 11:], first[11:])
+    # Facial landmarks are published with visibility 0
+    assert not recording.landmarks[:, :11, VISIBILITY].any()
+    frames = list(recording.frames())
+    assert frames[1].seq == recording.records['seq'][1]
+    assert frames[2] is None
+    assert recording.duration >= 0.0
+
+
+def test_partial_last_record_is_ignored(tmp_path, poses):
+    path = tmp_path / "session.lmrec"
+    record_session(path, [poses[0], poses[1]])
+    with open(path, 'ab') as f:
+        f.write(b"\0" * (RECORD_DTYPE.itemsize // 2))
+    assert len(LandmarkRecording(str(path))) == 2
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / "not_a_recording.lmrec"
+    path.write_bytes(b"\0" * HEADER_SIZE)
+    with pytest.raises(ValueError):
+        LandmarkRecording(str(path))
+
+
+def key_events(mapper, detector, frames_source):
+    """Match every published frame with the mapper; returns the injected (action, key) events"""
+    def on_landmarks(landmark_frame):
+        signature = detector.get_current_pose_signature(landmark_frame) if landmark_frame is not None else None
+        mapper.check_pose(detector, signature, landmarks=landmark_frame)
+
+    detector.add_landmark_listener(on_landmarks)
+    frames_source()
+    mapper.release_all_keys()
+    mapper.dispatcher.stop()
+    return [(action, key) for _, action, key in mapper.backend.take_events()]
+
+
+def test_replay_presses_the_same_keys_as_the_live_session(tmp_path, poses, mapper):
+    path = tmp_path / "session.lmrec"
+    wave, rest = poses
+    session = [rest, wave, wave, wave, rest, rest, None, wave, wave, None]
+
+    detector = PoseDetector(load_model=False)
+    signature = detector.get_current_pose_signature(detector.publish_landmark_array(wave))
+    mapper.add_mapping("wave", signature, "a", immediate_release=False)
+    detector = PoseDetector(load_model=False)
+    recorder = LandmarkRecorder()
+    detector.add_landmark_listener(recorder.on_landmarks)
+    recorder.start(str(path))
+    live = key_events(mapper, detector, lambda: [detector.publish_landmark_array(data) for data in session])
+    recorder.stop()
+    assert live == [("press", "a"), ("release", "a"), ("press", "a"), ("release", "a")]
+
+    replay_mapper = KeyboardMapper(str(tmp_path / "poses"), RecordingBackend())
+    try:
+        detector = PoseDetector(load_model=False)
+        replay = LandmarkReplayThread(detector, str(path), speed=0)
+
+        def run_replay():
+            replay.start()
+            assert replay.wait(5000)
+
+        assert key_events(replay_mapper, detector, run_replay) == live
+    finally:
+        replay_mapper.shutdown()
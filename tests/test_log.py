@@ -0,0 +1,30 @@
+import logging
+
+import pytest
+
+from modules import log
+
+
+@pytest.fixture(autouse=True)
+def restore_app_loggers():
+    yield
+    for name in log.APP_LOGGERS:
+        app_logger = logging.getLogger(name)
+        for handler in list(app_logger.handlers):
+            app_logger.removeHandler(handler)
+        app_logger.setLevel(logging.NOTSET)
+        app_logger.propagate = True
+    logging.getLogger("modules.pose_matcher").setLevel(logging.NOTSET)
+
+
+def test_unknown_level_falls_back_to_info(capsys):
+    log.configure_logging({"level": "verbose", "levels": {"modules.pose_matcher": "debug"}})
+    assert "Unknown log level 'verbose', using INFO" in capsys.readouterr().out
+
+    logging.getLogger("modules.keyboard_mapper").debug("hidden")
+    logging.getLogger("modules.keyboard_mapper").info("shown")
+    logging.getLogger("modules.pose_matcher").debug("module level")
+    out = capsys.readouterr().out
+    assert "hidden" not in out
+    assert "shown" in out
+    assert "module level" in out
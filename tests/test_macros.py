@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+from modules.key_dispatcher import KeyDispatcher, PRESS_KEY, RELEASE_KEY
+from modules.keyboard_mapper import KeyboardMapper, compile_macro
+from modules.output_backends import RecordingBackend
+
+
+class SteppingClock:
+    """Fake perf_counter that moves forward a fixed tick on every reading"""
+
+    def __init__(self, tick=0.0001):
+        self.now = 100.0
+        self.tick = tick
+
+    def __call__(self):
+        self.now += self.tick
+        return self.now
+
+
+def run_macro_offline(macro, gap_ms):
+    """Run a macro through a dispatcher polled under a fake clock; returns (events, timer stats)"""
+    clock = SteppingClock()
+    backend = RecordingBackend(clock)
+    dispatcher = KeyDispatcher(backend, clock=clock)
+    start = clock() + 0.001  # Leave time to schedule every step before the first is due
+    for offset, events in compile_macro(macro, gap_ms):
+        dispatcher.schedule_at(start + offset, events)
+    dispatcher.poll()
+    while dispatcher.scheduled_count:
+        dispatcher.poll()
+    return [(round((t - start) * 1000.0, 1), action, key) for t, action, key in backend.take_events()], \
+        dispatcher.timer_stats()
+
+
+def test_compile_macro_holds_shared_keys_and_retaps_repeats():
+    assert compile_macro("a, a+b, b, b", 10) == [
+        (0.0, [(PRESS_KEY, "a")]),
+        (0.01, [(PRESS_KEY, "b")]),
+        (0.02, [(RELEASE_KEY, "a")]),
+        (0.025, [(RELEASE_KEY, "b")]),
+        (0.03, [(PRESS_KEY, "b")]),
+        (0.04, [(RELEASE_KEY, "b")]),
+    ]
+
+
+def test_macro_steps_fire_on_time_under_a_fake_clock():
+    events, stats = run_macro_offline("down, down+right, right+p", 16)
+    # Each event is injected a clock reading or two after its step's deadline
+    assert events == [
+        (0.1, "press", "down"),
+        (16.1, "press", "right"),
+        (32.1, "release", "down"),
+        (32.3, "press", "p"),
+        (48.1, "release", "p"),
+        (48.3, "release", "right"),
+    ]
+    # Every step fires within one clock tick of its deadline, on every run
+    assert stats["count"] == 4
+    assert stats["max"] <= 0.1
+    assert run_macro_offline("down, down+right, right+p", 16) == (events, stats)
+
+
+@pytest.fixture
+def mapper(tmp_path):
+    mapper = KeyboardMapper(str(tmp_path), RecordingBackend())
+    yield mapper
+    mapper.shutdown()
+
+
+def test_cancelled_macro_keeps_keys_other_poses_hold(mapper):
+    holder = mapper.add_mapping("hold", None, "shift", immediate_release=False)
+    macro = mapper.add_mapping("macro", None, "None", macro="shift+a, b", macro_gap_ms=200)
+    mapper.trigger_key(holder)
+    mapper.run_macro(macro)
+    time.sleep(0.05)  # First step fired, second one pending
+    mapper._cancel_macro(macro)
+    time.sleep(0.05)
+
+    events = [(action, key) for _, action, key in mapper.backend.take_events()]
+    # The macro's own shift press is not undone while the held pose keeps shift down
+    assert events == [("press", "shift"), ("press", "shift"), ("press", "a"), ("release", "a")]
+    assert mapper.currently_pressed_keys == {"shift"}
@@ -0,0 +1,22 @@
+import pytest
+
+from modules.output_backends import OutputBackend, RecordingBackend
+
+
+def test_backend_must_implement_every_action():
+    class PressOnly(OutputBackend):
+        def press(self, key):
+            pass
+
+    with pytest.raises(TypeError):
+        PressOnly()
+
+
+def test_recording_backend_keeps_events_in_order():
+    backend = RecordingBackend()
+    backend.press("a")
+    backend.move_mouse(3, -2)
+    backend.release("a")
+    assert [(action, key) for _, action, key in backend.take_events()] == [
+        ("press", "a"), ("move", (3, -2)), ("release", "a")]
+    assert backend.take_events() == []
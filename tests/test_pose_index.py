@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from modules.pose_index import PoseIndex
+from modules.pose_matcher import PoseMatcher
+from modules.pose_signature import NUM_SLOTS, SLOT_WEIGHTS, PoseSignature
+
+
+def make_signature(rng, points, hidden=0):
+    """Signature of points with some slots beyond the torso hidden"""
+    mask = np.ones(NUM_SLOTS, dtype=bool)
+    if hidden:
+        mask[rng.choice(np.arange(8, NUM_SLOTS), hidden, replace=False)] = False
+    points = np.where(mask[:, None], points, 0.0).astype(np.float32)
+    return PoseSignature(points, mask)
+
+
+def make_library(rng, clusters, per_cluster, spread=0.3):
+    """Poses grouped around a few well separated postures"""
+    centers = rng.normal(0.0, 3.0, (clusters, NUM_SLOTS, 2))
+    return [center + rng.normal(0.0, spread, (NUM_SLOTS, 2)) for center in centers for _ in range(per_cluster)]
+
+
+def matchers(rng, library, **index_options):
+    full = PoseMatcher()
+    indexed = PoseMatcher(index_min_poses=1, **index_options)
+    for pose_id, points in enumerate(library):
+        signature = make_signature(rng, points, int(rng.integers(0, 4)))
+        for matcher in (full, indexed):
+            matcher.set_pose(pose_id, signature, 0.6, 0.0, 0.55)
+    return full, indexed
+
+
+@pytest.mark.parametrize("max_leaves", [4, 64])
+def test_index_matches_full_scan(max_leaves):
+    rng = np.random.default_rng(7)
+    library = make_library(rng, clusters=12, per_cluster=40)
+    full, indexed = matchers(rng, library, index_candidates=48)
+    # With a small search budget the index can rarely rule out the other
+    # poses and falls back to full scans; with a large one it mostly can't
+    indexed.index.max_leaves = max_leaves
+
+    used_index = 0
+    for _ in range(300):
+        points = library[rng.integers(len(library))] + rng.normal(0.0, 0.1, (NUM_SLOTS, 2))
+        signature = make_signature(rng, points, int(rng.integers(0, 4)))
+        expected, result = full.match(signature), indexed.match(signature)
+        assert result.pose_id == expected.pose_id
+        assert (result.entering == expected.entering).all()
+        assert (result.holding == expected.holding).all()
+        used_index += result.evaluated < len(library)
+    if max_leaves == 64:
+        assert used_index > 0
+
+
+def test_query_bound_holds_for_unreturned_poses():
+    rng = np.random.default_rng(3)
+    index = PoseIndex(leaf_size=8, max_leaves=3)
+    signatures = [make_signature(rng, points, int(rng.integers(0, 6)))
+                  for points in make_library(rng, clusters=5, per_cluster=30)]
+    for pose_id, signature in enumerate(signatures):
+        index.insert(pose_id, signature)
+
+    query = signatures[17]
+    ids, rest = index.query(query, k=10)
+    for pose_id, signature in enumerate(signatures):
+        if pose_id in ids:
+            continue
+        common = signature.mask & query.mask
+        distance = float(np.dot(np.abs(signature.points - query.points).sum(axis=1), common * SLOT_WEIGHTS))
+        assert distance >= rest - 1e-4
+
+
+def leaves(node):
+    if node.is_leaf:
+        return [node]
+    return leaves(node.left) + leaves(node.right)
+
+
+def test_remove_collapses_empty_leaves():
+    rng = np.random.default_rng(11)
+    index = PoseIndex(leaf_size=4)
+    for pose_id, points in enumerate(make_library(rng, clusters=6, per_cluster=20)):
+        index.insert(pose_id, make_signature(rng, points, int(rng.integers(0, 4))))
+
+    order = rng.permutation(len(index))
+    for count, pose_id in enumerate(order, 1):
+        index.remove(int(pose_id))
+        assert len(index) == len(order) - count
+        if len(index):
+            assert all(leaf.ids for leaf in leaves(index._root))
+    assert index._root.is_leaf and not index._root.ids
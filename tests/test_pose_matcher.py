@@ -0,0 +1,34 @@
+import numpy as np
+
+from modules.pose_matcher import PoseMatcher
+from modules.pose_signature import NUM_SLOTS, PoseSignature
+
+
+def signature(points):
+    return PoseSignature(np.asarray(points, dtype=np.float32), np.ones(NUM_SLOTS, dtype=bool))
+
+
+def test_slow_pose_is_rescored_when_the_signature_moves():
+    rng = np.random.default_rng(5)
+    arms_up, arms_down = rng.normal(0.0, 1.0, (2, NUM_SLOTS, 2))
+    matcher = PoseMatcher()
+    matcher.set_pose("slow", signature(arms_up), 0.6, period=1.0)
+
+    assert matcher.match(signature(arms_up), now=0.0).pose_id == "slow"
+    # Not due for another second, but the pose it was scored on is gone
+    result = matcher.match(signature(arms_down), now=0.1)
+    assert result.pose_id is None
+    assert not result.holding[0]
+
+
+def test_slow_pose_keeps_its_score_while_the_signature_is_steady():
+    rng = np.random.default_rng(6)
+    pose = rng.normal(0.0, 1.0, (NUM_SLOTS, 2))
+    matcher = PoseMatcher()
+    matcher.set_pose("slow", signature(pose), 0.6, period=1.0)
+
+    assert matcher.match(signature(pose), now=0.0).evaluated == 1
+    result = matcher.match(signature(pose + 0.001), now=0.1)
+    assert result.evaluated == 0
+    assert result.pose_id == "slow"
+
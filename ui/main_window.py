@@ -1,22 +1,37 @@
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                             QLabel, QPushButton, QGridLayout, QDialog,
                             QLineEdit, QMessageBox, QTabWidget, QSlider,
-                            QStyle, QSystemTrayIcon)
-from PyQt5.QtGui import QPixmap, QImage, QIcon
+                            QStyle, QSystemTrayIcon, QShortcut)
+from PyQt5.QtGui import QPixmap, QImage, QIcon, QKeySequence
 from PyQt5.QtCore import Qt, pyqtSlot, QTimer, QPoint
 
 import cv2
+import logging
 import numpy as np
 import os
+import time
 
 from modules.camera import CameraThread
+from modules.frame_sources import CameraSource, create_frame_source
 from modules.pose_detector import PoseDetector
+from modules.pose_worker import PoseInferenceThread
+from modules.pose_process import PoseProcessThread
+from modules.settings import load_settings
 from modules.keyboard_mapper import KeyboardMapper
+from modules.output_backends import PynputBackend, create_backend
+from modules.analog_output import AnalogMapper
+from modules.latency_trace import tracer, DELIVERY, SIGNATURE, MATCHING
+from modules.sampling_profiler import SamplingProfiler
+from modules.landmark_recording import LandmarkRecorder, EXTENSION as RECORDING_EXTENSION
+from modules import log
 from modules.voice_recognition import VoiceListener
 from ui.pose_widget import PoseWidget
 from ui.pose_review_panel import PoseReviewPanel
 from ui.pose_edit_dialog import PoseEditDialog
 from ui.voice_tab import VoiceTab
+from ui.perf_hud import PerfHud
+
+logger = logging.getLogger(__name__)
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -43,40 +58,91 @@ class MainWindow(QMainWindow):
             }
         """)
         
+        self.settings = load_settings()
+        tracer.configure(self.settings["tracing"]["enabled"], self.settings["tracing"]["history"])
+        
         # Initialize modules
-        self.camera_thread = CameraThread()
-        self.pose_detector = PoseDetector()
-        self.keyboard_mapper = KeyboardMapper()
+        try:
+            frame_source = create_frame_source(self.settings["camera"])
+        except ValueError as e:
+            logger.error("Error creating frame source: %s; falling back to camera 0", e)
+            frame_source = CameraSource(0)
+        self.camera_thread = CameraThread(frame_source)
+        inference_settings = self.settings["inference"]
+        if inference_settings["mode"] == "process":
+            # MediaPipe runs in a child process; this process keeps the UI and key injection
+            self.pose_detector = PoseDetector(load_model=False)
+            self.inference_thread = PoseProcessThread(
+                self.pose_detector,
+                self.camera_thread.mailbox,
+                ring_slots=inference_settings["ring_slots"],
+                result_timeout_ms=inference_settings["result_timeout_ms"],
+                restart_delay_ms=inference_settings["restart_delay_ms"],
+                startup_timeout_ms=inference_settings["startup_timeout_ms"]
+            )
+        else:
+            self.pose_detector = PoseDetector()
+            self.inference_thread = PoseInferenceThread(self.pose_detector, self.camera_thread.mailbox)
+        try:
+            output_backend = create_backend(self.settings["output"]["backend"])
+        except Exception as e:
+            logger.error("Error creating output backend '%s': %s; falling back to pynput", self.settings['output']['backend'], e)
+            output_backend = PynputBackend()
+        self.keyboard_mapper = KeyboardMapper(
+            backend=output_backend,
+            index_min_poses=self.settings["matching"]["index_min_poses"],
+            index_candidates=self.settings["matching"]["index_candidates"]
+        )
         self.voice_listener = VoiceListener()
         
+        # Continuous mouse output, fed straight from the inference thread
+        self.analog_mapper = None
+        if self.settings["analog"]["enabled"]:
+            try:
+                self.analog_mapper = AnalogMapper.from_settings(self.keyboard_mapper.dispatcher, self.settings["analog"])
+                self.pose_detector.add_landmark_listener(self.analog_mapper.update)
+            except Exception as e:
+                logger.error("Error setting up analog output: %s", e)
+        
         # State variables
         self.tracking_enabled = False
         self.current_pose_signature = None
         self.capture_mode = False
         self.selected_pose_id = None
         
+        # Poses are matched on every new landmark frame, at most once per min_match_interval
+        self.min_match_interval = self.settings["matching"]["min_interval_ms"] / 1000.0
+        self.last_match_time = 0.0
+        
+        # Performance overlay on the camera view
+        self.hud = PerfHud(self.camera_thread, self.pose_detector, self.keyboard_mapper,
+                           self.settings["hud"]["refresh_hz"])
+        self.profiler = SamplingProfiler(self.settings["profiler"]["interval_ms"] / 1000.0)
+        
+        # Landmark session recording (idle until toggled)
+        self.landmark_recorder = LandmarkRecorder()
+        self.pose_detector.add_landmark_listener(self.landmark_recorder.on_landmarks)
+        
         # Set up UI
         self.setup_ui()
+        if self.settings["hud"]["visible"]:
+            self.toggle_debug_mode()
         
         # Connect signals
-        self.camera_thread.raw_frame_ready.connect(self.pose_detector.process_frame)
         self.pose_detector.processed_frame.connect(self.update_frame)
         self.pose_detector.pose_detected.connect(self.on_pose_detected)
+        self.pose_detector.pose_lost.connect(self.on_pose_lost)
         self.voice_listener.command_detected.connect(self.handle_voice_command)
         self.voice_listener.listening_status.connect(self.update_voice_status)
         
         # Ensure landmarks are not drawn initially
         self.pose_detector.set_draw_landmarks(False)
         
-        # Start camera and voice listener
+        # Start pose inference, camera and voice listener
+        self.inference_thread.start()
         self.camera_thread.start()
         self.voice_listener.start()
         
-        # Setup pose checking timer (checks every 500ms)
-        self.pose_timer = QTimer(self)
-        self.pose_timer.timeout.connect(self.check_current_pose)
-        self.pose_timer.start(800)
-        
     def setup_custom_titlebar(self):
         """Create a custom title bar that matches the app's theme"""
         # Custom title bar widget
@@ -280,6 +346,9 @@ class MainWindow(QMainWindow):
         # Create debug button
         self.debug_btn = QPushButton("Enable Debug Mode")
         self.debug_btn.clicked.connect(self.toggle_debug_mode)
+        QShortcut(QKeySequence(Qt.Key_F3), self, self.toggle_debug_mode)
+        QShortcut(QKeySequence(Qt.Key_F4), self, self.start_profiling)
+        QShortcut(QKeySequence(Qt.Key_F5), self, self.toggle_landmark_recording)
         
         # Find the control layout and add the button
         for i in range(self.centralWidget().layout().count()):
@@ -291,9 +360,10 @@ class MainWindow(QMainWindow):
 
     def toggle_debug_mode(self):
         """
-        Toggle debug visualization mode
+        Toggle debug visualization mode (the performance HUD)
         """
         self.debug_mode = not self.debug_mode
+        self.hud.set_visible(self.debug_mode)
         
         if self.debug_mode:
             self.debug_btn.setText("Disable Debug Mode")
@@ -381,22 +451,45 @@ class MainWindow(QMainWindow):
         h, w, ch = frame.shape
         bytes_per_line = ch * w
         qt_image = QImage(frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
-        self.camera_view.setPixmap(QPixmap.fromImage(qt_image).scaled(
-            self.camera_view.size(), Qt.KeepAspectRatio))
+        # Scaling first converts only the display-sized image to a pixmap; the frame's
+        # buffer is reused by the detector, so nothing may keep referencing it
+        pixmap = QPixmap.fromImage(qt_image.scaled(self.camera_view.size(), Qt.KeepAspectRatio))
+        # Drawn on the scaled pixmap, which is created per frame anyway
+        self.hud.paint(pixmap)
+        self.camera_view.setPixmap(pixmap)
     
-    @pyqtSlot(dict)
+    @pyqtSlot(object)
     def on_pose_detected(self, landmarks):
         """Process detected pose landmarks"""
-        # Update current pose signature
-        self.current_pose_signature = self.pose_detector.get_current_pose_signature()
+        start = time.perf_counter()
+        tracer.record(landmarks.seq, DELIVERY, (start - landmarks.timestamp) * 1000.0)
+        
+        # Update current pose signature from the snapshot delivered with the signal
+        self.current_pose_signature = self.pose_detector.get_current_pose_signature(landmarks)
+        tracer.record(landmarks.seq, SIGNATURE, (time.perf_counter() - start) * 1000.0)
         
         # If a pose is selected, update the match percentage display
         if self.selected_pose_id:
             self.update_match_percentage()
+        
+        # Match as soon as new landmarks arrive instead of on a polling timer
+        if self.tracking_enabled and landmarks.timestamp - self.last_match_time >= self.min_match_interval:
+            self.last_match_time = landmarks.timestamp
+            self.check_current_pose(landmarks)
+    
+    @pyqtSlot()
+    def on_pose_lost(self):
+        """Nobody is visible any more: drop the signature and release held keys"""
+        self.current_pose_signature = None
+        if self.selected_pose_id:
+            self.update_match_percentage()
+        self.check_current_pose()
     
-    # Modify check_current_pose
-    def check_current_pose(self):
-        """Check if current pose matches any saved poses"""
+    def check_current_pose(self, landmarks=None):
+        """Check if current pose matches any saved poses
+        
+        landmarks is the LandmarkFrame the current signature came from, if any.
+        """
         # If tracking is disabled, release all keys and exit
         if not self.tracking_enabled:
             self.keyboard_mapper.release_all_keys()
@@ -408,14 +501,17 @@ class MainWindow(QMainWindow):
             self.keyboard_mapper.release_all_keys()
             return
         
-        # Update match percentage for selected pose
-        self.update_match_percentage()
-        
         # Check if pose matches any saved poses and trigger keys if it does
+        start = time.perf_counter()
         matched_pose = self.keyboard_mapper.check_pose(
             self.pose_detector, 
-            self.current_pose_signature
+            self.current_pose_signature,
+            start,
+            landmarks
         )
+        self.hud.matching_ms = (time.perf_counter() - start) * 1000.0
+        if landmarks is not None:
+            tracer.record(landmarks.seq, MATCHING, self.hud.matching_ms)
         
         # Highlight matched pose in UI if there's a match
         if matched_pose:
@@ -454,15 +550,11 @@ class MainWindow(QMainWindow):
         else:
             QMessageBox.warning(self, "Error", "Failed to capture camera image.")
 
-    def save_reviewed_pose(self, name, key_combo, threshold, recognition_speed, immediate_release, sustained_duration):
+    def save_reviewed_pose(self, values):
         """Save a pose after review with advanced configuration"""
-        print("\nSAVING REVIEWED POSE:")
-        print(f"Name: {name}")
-        print(f"Key combo: {key_combo}")
-        print(f"Threshold: {threshold}")
-        print(f"Recognition Speed: {recognition_speed}")
-        print(f"Immediate Release: {immediate_release}")
-        print(f"Sustained Duration: {sustained_duration}")
+        logger.debug("Saving reviewed pose: %s", values)
+        name = values["name"]
+        key_combo = values["key_combo"]
         
         # Use the signature stored in the pose_review panel
         signature = getattr(self.pose_review, 'current_signature', None)
@@ -489,15 +581,8 @@ class MainWindow(QMainWindow):
             save_pixmap.save(image_path)
             
             # Add mapping with new parameters
-            pose_id = self.keyboard_mapper.add_mapping(
-                name,
-                signature,
-                key_combo,
-                threshold,
-                recognition_speed,
-                immediate_release,
-                sustained_duration
-            )
+            config = {key: value for key, value in values.items() if key not in ("name", "key_combo")}
+            pose_id = self.keyboard_mapper.add_mapping(name, signature, key_combo, **config)
             
             # Update the image path in the mapping
             self.keyboard_mapper.pose_map[pose_id]["image_path"] = image_path
@@ -528,52 +613,78 @@ class MainWindow(QMainWindow):
         # Also toggle landmark visibility
         self.pose_detector.set_draw_landmarks(self.tracking_enabled)
         
+        if self.analog_mapper is not None:
+            self.analog_mapper.set_enabled(self.tracking_enabled)
+        
         if self.tracking_enabled:
             self.tracking_btn.setText("Stop Tracking")
         else:
             self.tracking_btn.setText("Start Tracking")
+            self.keyboard_mapper.release_all_keys()
    
     def handle_voice_command(self, command):
         """Handle voice commands"""
-        print(f"Processing command: {command}")  # Debug output
+        logger.debug("Processing command: %s", command)
         
         if command == "CAPTURE":
-            print("Executing capture command")  # Debug output
             self.capture_pose()
         elif command == "SAVE_DATA":
-            print("Executing save data command")  # Debug output
             # Forward to pose review panel if visible
             if self.pose_review.isVisible():
                 self.pose_review.handle_voice_command("SAVE_DATA")
             else:
                 self.save_to_file()
         elif command == "EDIT":
-            print("Executing edit command")  # Debug output
             self.edit_selected_pose()
         elif command == "DELETE":
-            print("Executing delete command")  # Debug output
             self.delete_selected_pose()
         elif command == "START":
-            print("Executing start command")  # Debug output
             if not self.tracking_enabled:
                 self.toggle_tracking()
         elif command == "STOP":
-            print("Executing stop command")  # Debug output
             if self.tracking_enabled:
                 self.toggle_tracking()
+        elif command == "PROFILE":
+            self.start_profiling()
+        elif command == "RECORD":
+            self.toggle_landmark_recording()
+
+    def toggle_landmark_recording(self):
+        """Start or stop recording landmark frames to a new session file"""
+        if self.landmark_recorder.recording:
+            self.landmark_recorder.stop()
+            return
+        name = time.strftime("session-%Y%m%d-%H%M%S") + RECORDING_EXTENSION
+        path = os.path.join(self.settings["recording"]["directory"], name)
+        try:
+            self.landmark_recorder.start(path)
+        except Exception as e:
+            logger.error("Error starting landmark recording: %s", e)
+
+    def start_profiling(self):
+        """Sample every thread for the configured duration and write the profile"""
+        profiler_settings = self.settings["profiler"]
+        try:
+            started = self.profiler.start(profiler_settings["duration_s"], profiler_settings["output_path"],
+                                          profiler_settings["format"])
+        except ValueError as e:
+            logger.error("Cannot start profiler: %s", e)
+            return
+        if not started:
+            logger.warning("A profile is already being recorded")
 
    
     def on_pose_selected(self, pose_id):
         """Handle pose selection in the grid"""
         self.selected_pose_id = pose_id
-        print(f"MainWindow: Pose selected: {pose_id}")
+        logger.debug("Pose selected: %s", pose_id)
         # Update the match percentage display
         self.update_match_percentage()
 
     def on_pose_double_clicked(self, pose_id):
         """Handle pose double-click in the grid"""
         self.selected_pose_id = pose_id
-        print(f"MainWindow: Pose double-clicked: {pose_id}")
+        logger.debug("Pose double-clicked: %s", pose_id)
         # Open the edit dialog
         self.edit_selected_pose()
     
@@ -589,9 +700,14 @@ class MainWindow(QMainWindow):
         
         # Get all parameters with proper defaults
         threshold = pose_data.get("threshold", 0.60)
-        recognition_speed = pose_data.get("recognition_speed", 500)
+        recognition_speed = pose_data.get("recognition_speed", 0)
         immediate_release = pose_data.get("immediate_release", True)
         sustained_duration = pose_data.get("sustained_duration", 0)
+        exit_threshold = pose_data.get("exit_threshold")
+        dwell_frames = pose_data.get("dwell_frames", 1)
+        dwell_ms = pose_data.get("dwell_ms", 0)
+        macro = pose_data.get("macro", "")
+        macro_gap_ms = pose_data.get("macro_gap_ms", 16)
         
         dialog = PoseEditDialog(
             self.selected_pose_id,
@@ -602,6 +718,11 @@ class MainWindow(QMainWindow):
             recognition_speed,
             immediate_release,
             sustained_duration,
+            exit_threshold,
+            dwell_frames,
+            dwell_ms,
+            macro,
+            macro_gap_ms,
             self
         )
         
@@ -609,20 +730,23 @@ class MainWindow(QMainWindow):
             updated_data = dialog.get_values()
             
             # Update the pose data with ALL new configuration parameters
-            self.keyboard_mapper.pose_map[str(updated_data["pose_id"])] = {
+            pose_id = str(updated_data["pose_id"])
+            self.keyboard_mapper.update_mapping(pose_id, {
                 "name": updated_data["name"],
                 "key_combo": updated_data["key_combo"],
                 "threshold": updated_data["threshold"],
                 "recognition_speed": updated_data["recognition_speed"],
                 "immediate_release": updated_data["immediate_release"],
                 "sustained_duration": updated_data["sustained_duration"],
+                "exit_threshold": updated_data["exit_threshold"],
+                "dwell_frames": updated_data["dwell_frames"],
+                "dwell_ms": updated_data["dwell_ms"],
+                "macro": updated_data["macro"],
+                "macro_gap_ms": updated_data["macro_gap_ms"],
                 # Preserve existing signature and image path
-                "signature": self.keyboard_mapper.pose_map[str(updated_data["pose_id"])].get("signature"),
-                "image_path": self.keyboard_mapper.pose_map[str(updated_data["pose_id"])].get("image_path")
-            }
-            
-            # Save changes
-            self.keyboard_mapper.save_poses()
+                "signature": self.keyboard_mapper.pose_map[pose_id].get("signature"),
+                "image_path": self.keyboard_mapper.pose_map[pose_id].get("image_path")
+            })
             
             # Reload the grid
             self.load_saved_poses()
@@ -671,7 +795,7 @@ class MainWindow(QMainWindow):
                     try:
                         os.remove(image_path)
                     except Exception as e:
-                        print(f"Error deleting image file: {e}")
+                        logger.error("Error deleting image file: %s", e)
             
             # Remove from keyboard mapper
             self.keyboard_mapper.remove_mapping(self.selected_pose_id)
@@ -685,5 +809,31 @@ class MainWindow(QMainWindow):
     def closeEvent(self, event):
         """Clean up resources when closing"""
         self.camera_thread.stop()
+        self.inference_thread.stop()
+        self.pose_detector.close()
+        self.keyboard_mapper.shutdown()
         self.voice_listener.stop()
+        if self.profiler.running:
+            self.profiler.stop()
+        self.landmark_recorder.stop()
+        if tracer.enabled:
+            self.dump_latency_trace()
+        if log.ring_buffer is not None:
+            try:
+                log.ring_buffer.dump(self.settings["logging"]["ring_dump_path"])
+            except Exception as e:
+                logger.error("Error writing debug log: %s", e)
         super().closeEvent(event)
+    
+    def dump_latency_trace(self):
+        """Print per-stage latency percentiles and write the trace to CSV"""
+        for stage, stats in tracer.stats().items():
+            if stats["count"]:
+                logger.info("Latency %-10s p50 %7.2f ms, p95 %7.2f ms, p99 %7.2f ms (%d frames)",
+                            stage, stats['p50'], stats['p95'], stats['p99'], stats['count'])
+        path = self.settings["tracing"]["csv_path"]
+        try:
+            tracer.dump_csv(path)
+            logger.info("Latency trace written to %s", path)
+        except Exception as e:
+            logger.error("Error writing latency trace: %s", e)
@@ -0,0 +1,86 @@
+import time
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor, QFont, QFontMetrics, QImage, QPainter
+
+
+class PerfHud:
+    """Performance overlay for the camera view.
+
+    The text is re-rendered into a small cached image at most refresh_hz
+    times a second; every other frame only blits that image onto the
+    already-scaled display pixmap, so the HUD never touches the camera frame.
+    """
+
+    def __init__(self, camera_thread, pose_detector, keyboard_mapper, refresh_hz=4):
+        self.camera_thread = camera_thread
+        self.pose_detector = pose_detector
+        self.keyboard_mapper = keyboard_mapper
+        self.refresh_interval = 1.0 / refresh_hz
+        self.visible = False
+        self.matching_ms = 0.0  # Set by the main window after each match
+
+        self._font = QFont("Monospace", 9)
+        self._font.setStyleHint(QFont.TypeWriter)
+        self._overlay = None
+        self._last_refresh = 0.0
+        self._last_frames = 0
+
+    def set_visible(self, visible):
+        self.visible = visible
+        self._overlay = None
+        self._last_refresh = 0.0
+
+    def paint(self, pixmap):
+        """Draw the HUD onto a display pixmap, refreshing its contents if due"""
+        if not self.visible:
+            return
+        now = time.perf_counter()
+        if self._overlay is None or now - self._last_refresh >= self.refresh_interval:
+            self._overlay = self._render(self._lines(now))
+        painter = QPainter(pixmap)
+        painter.drawImage(8, 8, self._overlay)
+        painter.end()
+
+    def _lines(self, now):
+        frames = self.camera_thread.frames_captured
+        elapsed = now - self._last_refresh
+        fps = (frames - self._last_frames) / elapsed if self._last_refresh and elapsed > 0 else 0.0
+        self._last_frames, self._last_refresh = frames, now
+
+        mailbox = self.camera_thread.mailbox
+        lines = []
+        mode = self.camera_thread.source.mode
+        if mode is not None:
+            lines.append(f"camera    {mode['width']}x{mode['height']} {mode['fourcc']} buf {mode['buffer_size']}")
+        lines += [
+            f"capture   {fps:5.1f} fps",
+            f"inference {self.pose_detector.inference_ms:5.1f} ms",
+            f"matching  {self.matching_ms:5.2f} ms",
+            f"dropped   {mailbox.frames_dropped} / {mailbox.frames_posted}",
+            f"queues    frame {mailbox.pending}  keys {self.keyboard_mapper.dispatcher.queue_depth}",
+        ]
+
+        match = self.keyboard_mapper.last_match
+        if match is not None and len(match.pose_ids):
+            pose_map = self.keyboard_mapper.pose_map
+            for pose_id, score in match.top(3):
+                name = pose_map.get(pose_id, {}).get("name", pose_id)
+                lines.append(f"{score * 100:5.1f}%  {name[:18]}")
+        return lines
+
+    def _render(self, lines):
+        metrics = QFontMetrics(self._font)
+        line_height = metrics.height()
+        width = max(metrics.horizontalAdvance(line) for line in lines) + 12
+        overlay = QImage(width, line_height * len(lines) + 8, QImage.Format_ARGB32_Premultiplied)
+        overlay.fill(Qt.transparent)
+
+        painter = QPainter(overlay)
+        painter.fillRect(overlay.rect(), QColor(0, 0, 0, 160))
+        painter.setFont(self._font)
+        painter.setPen(QColor("#2ECC71"))
+        for i, line in enumerate(lines):
+            painter.drawText(6, 4 + i * line_height + metrics.ascent(), line)
+        painter.end()
+        return overlay
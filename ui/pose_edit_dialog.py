@@ -7,9 +7,14 @@ from PyQt5.QtCore import Qt
 class PoseEditDialog(QDialog):
     def __init__(self, pose_id, pose_name, key_combo, image_path, 
                 threshold=0.60, 
-                recognition_speed=500, 
+                recognition_speed=0, 
                 immediate_release=True, 
                 sustained_duration=0, 
+                exit_threshold=None, 
+                dwell_frames=1, 
+                dwell_ms=0, 
+                macro="", 
+                macro_gap_ms=16, 
                 parent=None):
         # Ensure all parameters are of the correct type
         self.pose_id = str(pose_id)
@@ -20,6 +25,11 @@ class PoseEditDialog(QDialog):
         self.recognition_speed = int(recognition_speed)  # Explicitly convert to int
         self.immediate_release = bool(immediate_release)
         self.sustained_duration = float(sustained_duration)
+        self.exit_threshold = float(exit_threshold) if exit_threshold is not None else max(0.05, self.threshold - 0.05)
+        self.dwell_frames = int(dwell_frames)
+        self.dwell_ms = int(dwell_ms)
+        self.macro = str(macro or "")
+        self.macro_gap_ms = int(macro_gap_ms)
         
         # Call the parent constructor with the parent widget
         super().__init__(parent)
@@ -57,6 +67,19 @@ class PoseEditDialog(QDialog):
         key_layout.addWidget(self.key_input)
         layout.addLayout(key_layout)
         
+        # Macro sequence
+        macro_layout = QHBoxLayout()
+        macro_layout.addWidget(QLabel("Macro:"))
+        self.macro_input = QLineEdit(self.macro)
+        self.macro_input.setPlaceholderText("Optional, e.g. down, down+right, right+p")
+        macro_layout.addWidget(self.macro_input)
+        macro_layout.addWidget(QLabel("Gap (ms):"))
+        self.macro_gap_input = QSpinBox()
+        self.macro_gap_input.setRange(1, 1000)
+        self.macro_gap_input.setValue(self.macro_gap_ms)
+        macro_layout.addWidget(self.macro_gap_input)
+        layout.addLayout(macro_layout)
+        
         # Matching Threshold
         threshold_layout = QHBoxLayout()
         threshold_layout.addWidget(QLabel("Matching Threshold:"))
@@ -74,12 +97,44 @@ class PoseEditDialog(QDialog):
         threshold_layout.addWidget(self.threshold_value)
         layout.addLayout(threshold_layout)
         
+        # Release Threshold (hysteresis)
+        exit_layout = QHBoxLayout()
+        exit_layout.addWidget(QLabel("Release Threshold:"))
+        self.exit_threshold_slider = QSlider(Qt.Horizontal)
+        self.exit_threshold_slider.setMinimum(5)
+        self.exit_threshold_slider.setMaximum(90)
+        self.exit_threshold_slider.setValue(int(self.exit_threshold * 100))
+        
+        self.exit_threshold_value = QLabel(f"{int(self.exit_threshold * 100)}%")
+        self.exit_threshold_slider.valueChanged.connect(
+            lambda v: self.exit_threshold_value.setText(f"{v}%")
+        )
+        
+        exit_layout.addWidget(self.exit_threshold_slider)
+        exit_layout.addWidget(self.exit_threshold_value)
+        layout.addLayout(exit_layout)
+        
+        # Dwell before the key fires
+        dwell_layout = QHBoxLayout()
+        dwell_layout.addWidget(QLabel("Hold Pose For (frames / ms):"))
+        self.dwell_frames_input = QSpinBox()
+        self.dwell_frames_input.setRange(1, 60)
+        self.dwell_frames_input.setValue(self.dwell_frames)
+        dwell_layout.addWidget(self.dwell_frames_input)
+        self.dwell_ms_input = QSpinBox()
+        self.dwell_ms_input.setRange(0, 2000)
+        self.dwell_ms_input.setSingleStep(10)
+        self.dwell_ms_input.setValue(self.dwell_ms)
+        dwell_layout.addWidget(self.dwell_ms_input)
+        layout.addLayout(dwell_layout)
+        
         # Recognition Speed
         speed_layout = QHBoxLayout()
         speed_layout.addWidget(QLabel("Recognition Speed (ms):"))
         self.speed_input = QSpinBox()
-        self.speed_input.setRange(100, 2000)
+        self.speed_input.setRange(0, 2000)
         self.speed_input.setSingleStep(50)
+        self.speed_input.setSpecialValueText("Every frame")  # Shown for 0
         self.speed_input.setValue(self.recognition_speed)
         speed_layout.addWidget(self.speed_input)
         layout.addLayout(speed_layout)
@@ -110,8 +165,11 @@ class PoseEditDialog(QDialog):
         # Explanatory text
         explanation = QLabel(
             "Matching Threshold: Lower values require more precise matching.\n"
-            "Recognition Speed: Time between pose checks (ms).\n"
-            "Immediate Release: If unchecked, key will be held for specified duration."
+            "Release Threshold: The key is released once the match drops to this value.\n"
+            "Hold Pose For: How long the pose must be held before the key fires.\n"
+            "Recognition Speed: Time between checks of this pose (ms), 0 checks every frame.\n"
+            "Immediate Release: If unchecked, key will be held for specified duration.\n"
+            "Macro: Key combinations fired one after another, Gap apart, instead of the key combination."
         )
         explanation.setWordWrap(True)
         layout.addWidget(explanation)
@@ -136,18 +194,28 @@ class PoseEditDialog(QDialog):
             "threshold": self.threshold_slider.value() / 100.0,
             "recognition_speed": self.speed_input.value(),
             "immediate_release": self.immediate_release_check.isChecked(),
-            "sustained_duration": self.duration_input.value()
+            "sustained_duration": self.duration_input.value(),
+            "exit_threshold": min(self.exit_threshold_slider.value(), self.threshold_slider.value()) / 100.0,
+            "dwell_frames": self.dwell_frames_input.value(),
+            "dwell_ms": self.dwell_ms_input.value(),
+            "macro": self.macro_input.text().strip(),
+            "macro_gap_ms": self.macro_gap_input.value()
         }
     
     def accept(self):
         key_combo = self.key_input.text()
         
         # Validate the keybind
-        from modules.keyboard_mapper import validate_keybind
+        from modules.keyboard_mapper import validate_keybind, validate_macro
         is_valid, message = validate_keybind(key_combo)
         
         if not is_valid:
             QMessageBox.warning(self, "Invalid Keybind", message)
             return
+        
+        is_valid, message = validate_macro(self.macro_input.text())
+        if not is_valid:
+            QMessageBox.warning(self, "Invalid Macro", message)
+            return
             
         super().accept()
\ No newline at end of file
@@ -5,7 +5,7 @@ from PyQt5.QtGui import QPixmap
 from PyQt5.QtCore import Qt, pyqtSignal
 
 class PoseReviewPanel(QWidget):
-    save_pose = pyqtSignal(str, str, float, int, bool, float)  # name, key_combo, threshold, recognition_speed, immediate_release, sustained_duration
+    save_pose = pyqtSignal(dict)  # Pose configuration, same keys as PoseEditDialog.get_values() without pose_id
     cancel_capture = pyqtSignal()
     
     def __init__(self, parent=None):
@@ -40,6 +40,19 @@ class PoseReviewPanel(QWidget):
         key_layout.addWidget(self.key_input)
         layout.addLayout(key_layout)
         
+        # Macro sequence
+        macro_layout = QHBoxLayout()
+        macro_layout.addWidget(QLabel("Macro:"))
+        self.macro_input = QLineEdit()
+        self.macro_input.setPlaceholderText("Optional, e.g. down, down+right, right+p")
+        macro_layout.addWidget(self.macro_input)
+        macro_layout.addWidget(QLabel("Gap (ms):"))
+        self.macro_gap_input = QSpinBox()
+        self.macro_gap_input.setRange(1, 1000)
+        self.macro_gap_input.setValue(16)
+        macro_layout.addWidget(self.macro_gap_input)
+        layout.addLayout(macro_layout)
+        
         # Matching threshold slider
         threshold_layout = QHBoxLayout()
         threshold_layout.addWidget(QLabel("Matching Threshold:"))
@@ -55,13 +68,43 @@ class PoseReviewPanel(QWidget):
         threshold_layout.addWidget(self.threshold_value)
         layout.addLayout(threshold_layout)
         
+        # Release threshold slider (hysteresis)
+        exit_layout = QHBoxLayout()
+        exit_layout.addWidget(QLabel("Release Threshold:"))
+        self.exit_threshold_slider = QSlider(Qt.Horizontal)
+        self.exit_threshold_slider.setMinimum(5)
+        self.exit_threshold_slider.setMaximum(90)
+        self.exit_threshold_slider.setValue(55)  # Default 5% below the matching threshold
+        self.exit_threshold_value = QLabel("55%")
+        self.exit_threshold_slider.valueChanged.connect(
+            lambda v: self.exit_threshold_value.setText(f"{v}%")
+        )
+        exit_layout.addWidget(self.exit_threshold_slider)
+        exit_layout.addWidget(self.exit_threshold_value)
+        layout.addLayout(exit_layout)
+        
+        # Dwell before the key fires
+        dwell_layout = QHBoxLayout()
+        dwell_layout.addWidget(QLabel("Hold Pose For (frames / ms):"))
+        self.dwell_frames_input = QSpinBox()
+        self.dwell_frames_input.setRange(1, 60)
+        self.dwell_frames_input.setValue(1)
+        dwell_layout.addWidget(self.dwell_frames_input)
+        self.dwell_ms_input = QSpinBox()
+        self.dwell_ms_input.setRange(0, 2000)
+        self.dwell_ms_input.setSingleStep(10)
+        self.dwell_ms_input.setValue(0)
+        dwell_layout.addWidget(self.dwell_ms_input)
+        layout.addLayout(dwell_layout)
+        
         # Recognition Speed
         speed_layout = QHBoxLayout()
         speed_layout.addWidget(QLabel("Recognition Speed (ms):"))
         self.speed_input = QSpinBox()
-        self.speed_input.setRange(100, 2000)
+        self.speed_input.setRange(0, 2000)
         self.speed_input.setSingleStep(50)
-        self.speed_input.setValue(500)  # Default 500ms
+        self.speed_input.setSpecialValueText("Every frame")  # Shown for 0
+        self.speed_input.setValue(0)  # Default: check every frame
         speed_layout.addWidget(self.speed_input)
         layout.addLayout(speed_layout)
         
@@ -91,8 +134,10 @@ class PoseReviewPanel(QWidget):
         # Add explanation
         threshold_explanation = QLabel(
             "Lower threshold requires more precise matching. "
+            "The key is released once the match drops to the release threshold. "
             "Recognition speed controls pose check frequency. "
-            "Uncheck immediate release to hold key for a set duration."
+            "Uncheck immediate release to hold key for a set duration. "
+            "A macro fires its key combinations one after another instead of the key combination."
         )
         threshold_explanation.setWordWrap(True)
         threshold_explanation.setStyleSheet("color: #AAAAAA; font-style: italic;")
@@ -133,10 +178,6 @@ class PoseReviewPanel(QWidget):
     def on_save(self):
         name = self.name_input.text()
         key_combo = self.key_input.text()
-        threshold = self.threshold_slider.value() / 100.0
-        recognition_speed = self.speed_input.value()
-        immediate_release = self.immediate_release_check.isChecked()
-        sustained_duration = self.duration_input.value()
         
         if not name:
             name = "Unnamed Pose"
@@ -144,21 +185,31 @@ class PoseReviewPanel(QWidget):
             key_combo = "None"
             
         # Validate the keybind
-        from modules.keyboard_mapper import validate_keybind
+        from modules.keyboard_mapper import validate_keybind, validate_macro
         is_valid, message = validate_keybind(key_combo)
         
         if not is_valid:
             QMessageBox.warning(self, "Invalid Keybind", message)
             return
+        
+        is_valid, message = validate_macro(self.macro_input.text())
+        if not is_valid:
+            QMessageBox.warning(self, "Invalid Macro", message)
+            return
             
-        self.save_pose.emit(
-            name, 
-            key_combo, 
-            threshold, 
-            recognition_speed, 
-            immediate_release, 
-            sustained_duration
-        )
+        self.save_pose.emit({
+            "name": name,
+            "key_combo": key_combo,
+            "threshold": self.threshold_slider.value() / 100.0,
+            "recognition_speed": self.speed_input.value(),
+            "immediate_release": self.immediate_release_check.isChecked(),
+            "sustained_duration": self.duration_input.value(),
+            "exit_threshold": min(self.exit_threshold_slider.value(), self.threshold_slider.value()) / 100.0,
+            "dwell_frames": self.dwell_frames_input.value(),
+            "dwell_ms": self.dwell_ms_input.value(),
+            "macro": self.macro_input.text().strip(),
+            "macro_gap_ms": self.macro_gap_input.value()
+        })
         self.clear()
         
     def on_cancel(self):
@@ -172,6 +223,7 @@ class PoseReviewPanel(QWidget):
     def clear(self):
         self.name_input.clear()
         self.key_input.clear()
+        self.macro_input.clear()
         self.image_preview.clear()
         self.current_signature = None  # Clear the stored signature
         self.setVisible(False)
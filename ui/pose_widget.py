@@ -1,8 +1,11 @@
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel
 from PyQt5.QtGui import QPixmap
 from PyQt5.QtCore import Qt, pyqtSignal, QTimer
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 
 class PoseWidget(QWidget):
     selected = pyqtSignal(str)  # Signal emitted when widget is clicked
@@ -116,7 +119,7 @@ class PoseWidget(QWidget):
         
         # Emit selection signal
         self.selected.emit(self.pose_id)
-        print(f"PoseWidget: Single click on {self.pose_name} (ID: {self.pose_id})")
+        logger.debug("Single click on %s (ID: %s)", self.pose_name, self.pose_id)
     
     def handle_double_click(self):
         """Process a confirmed double click"""
@@ -126,7 +129,7 @@ class PoseWidget(QWidget):
         
         # Emit double click signal
         self.double_clicked.emit(self.pose_id)
-        print(f"PoseWidget: Double click on {self.pose_name} (ID: {self.pose_id})")
+        logger.debug("Double click on %s (ID: %s)", self.pose_name, self.pose_id)
         
     def highlight(self):
         """Highlight this widget when its pose is detected"""